@@ -0,0 +1,328 @@
+"""
+Dávkové generování nabídek bez interaktivní konverzace.
+
+Pro každou poptávku z adresáře nebo CSV souboru proběhnou uzly grafu
+``analyze_request``, ``generate_proposal`` a ``create_document`` bez sběru
+doplňujících informací. Poptávky se zpracovávají souběžně
+(BATCH_CONCURRENCY), počet souběžných volání LLM v celém procesu omezuje
+LLM_MAX_CONCURRENCY. Volání OpenAI a Pinecone mají nižší prioritu než
+interaktivní relace (``traffic_priority("batch")``). Chyba jedné poptávky zpracování ostatních nepřeruší.
+Výsledek každé poptávky (stav, cesta k dokumentu, doba běhu uzlů, volání
+LLM a tokeny, chyba) se zapíše jako řádek souhrnu ve formátu JSONL.
+
+Použití:
+    python3 run_cli.py batch data/poptavky --concurrency 8
+    python3 run_cli.py batch poptavky.csv --output-dir data/generated/q4 --max-llm-calls 6
+
+CSV soubor má sloupce ``client_name`` a ``request`` (text poptávky) nebo
+``request_file`` (cesta k souboru, relativně k CSV), volitelně ``id``.
+V adresáři se zpracují soubory .txt, .md, .docx a .pdf; název klienta se
+odvodí z názvu souboru.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.chains.proposal_graph import (
+    Step,
+    analyze_request,
+    create_document,
+    generate_proposal,
+    init_proposal_state
+)
+from app.chains.proposal_schema import get_generation_stats
+from app.utils.config import get_config
+from app.utils.rate_limiter import get_rate_limit_stats, traffic_priority
+from app.utils.tokens import count_tokens
+from app.utils.usage import track_usage
+
+config = get_config()
+
+REQUEST_EXTENSIONS = (".txt", ".md", ".docx", ".pdf")
+
+# Uzly grafu, které se pro každou poptávku spustí v tomto pořadí
+BATCH_NODES = [
+    (Step.ANALYZE_REQUEST, analyze_request),
+    (Step.GENERATE_PROPOSAL, generate_proposal),
+    (Step.CREATE_DOCUMENT, create_document)
+]
+
+def _slug(text: str) -> str:
+    """Vrátí název vhodný pro soubor (bez diakritiky a mezer)."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_").lower() or "poptavka"
+
+def read_request_file(path: str) -> str:
+    """
+    Načte text poptávky ze souboru.
+
+    Args:
+        path: Cesta k souboru (.txt, .md, .docx nebo .pdf)
+
+    Returns:
+        str: Text poptávky
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        from app.utils.import_proposals import extract_text_from_docx
+        return extract_text_from_docx(path)
+    if extension == ".pdf":
+        from app.utils.import_proposals import extract_text_from_pdf
+        return extract_text_from_pdf(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def load_items(source: str) -> List[Dict[str, Any]]:
+    """
+    Načte seznam poptávek ke zpracování.
+
+    Text poptávek ze souborů se načítá až při zpracování, takže nečitelný
+    soubor skončí chybou jen u dané poptávky.
+
+    Args:
+        source: Adresář s poptávkami nebo CSV soubor
+
+    Returns:
+        List[Dict[str, Any]]: Položky s klíči id, client_name, source
+            a client_request (text z CSV) nebo path (soubor s poptávkou)
+    """
+    items = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path) and name.lower().endswith(REQUEST_EXTENSIONS):
+                stem = os.path.splitext(name)[0]
+                items.append({
+                    "id": stem,
+                    "client_name": stem.replace("_", " ").strip(),
+                    "source": path,
+                    "path": path
+                })
+    elif source.lower().endswith(".csv"):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8-sig", newline="") as f:
+            for row_number, row in enumerate(csv.DictReader(f), 1):
+                item = {
+                    "id": (row.get("id") or "").strip() or f"{row_number:04d}",
+                    "client_name": (row.get("client_name") or "").strip(),
+                    "source": f"{source}:{row_number + 1}"
+                }
+                if (row.get("request") or "").strip():
+                    item["client_request"] = row["request"]
+                elif (row.get("request_file") or "").strip():
+                    item["path"] = os.path.join(base_dir, row["request_file"].strip())
+                items.append(item)
+    else:
+        raise ValueError(f"Zdroj {source} není adresář ani CSV soubor")
+
+    # Jedinečná ID (slouží i jako název dokumentu)
+    used: Dict[str, int] = {}
+    for item in items:
+        slug = _slug(item["id"])
+        used[slug] = used.get(slug, 0) + 1
+        item["id"] = slug if used[slug] == 1 else f"{slug}_{used[slug]}"
+    return items
+
+def process_item(item: Dict[str, Any], output_dir: str, verbose: bool = False) -> Dict[str, Any]:
+    """
+    Zpracuje jednu poptávku (analýza, data nabídky, dokument).
+
+    Args:
+        item: Položka z ``load_items``
+        output_dir: Adresář pro vytvořený dokument
+        verbose: Vypsat při chybě celý traceback
+
+    Returns:
+        Dict[str, Any]: Záznam souhrnu s klíči id, source, client_name, status
+            ("ok" nebo "error"), error, document_path, seconds, nodes, usage,
+            request_tokens a started_at
+    """
+    record = {
+        "id": item["id"],
+        "source": item["source"],
+        "client_name": item["client_name"],
+        "status": "error",
+        "error": None,
+        "document_path": None,
+        "seconds": None,
+        "nodes": {},
+        "usage": None,
+        "request_tokens": None,
+        "started_at": datetime.now().isoformat(timespec="seconds")
+    }
+    start = time.perf_counter()
+    with track_usage() as usage, traffic_priority("batch"):
+        try:
+            client_request = item.get("client_request")
+            if client_request is None:
+                client_request = read_request_file(item["path"])
+            if not client_request.strip():
+                raise ValueError("Poptávka je prázdná")
+            if not item["client_name"]:
+                raise ValueError("Chybí název klienta")
+            record["request_tokens"] = count_tokens(client_request)
+
+            state = init_proposal_state(client_request, item["client_name"], session_id=f"batch-{item['id']}")
+            state["output_path"] = os.path.join(output_dir, f"{item['id']}.docx")
+            for step, node in BATCH_NODES:
+                node_start = time.perf_counter()
+                try:
+                    state = node(state)
+                finally:
+                    record["nodes"][step.value] = round(time.perf_counter() - node_start, 3)
+
+            document_path = state.get("document_path")
+            if not document_path or not os.path.exists(document_path):
+                # create_document chybu nevyhazuje, popis je v poslední zprávě
+                raise RuntimeError(state["chat_history"][-1]["content"] if state.get("chat_history")
+                                   else "Dokument nebyl vytvořen")
+            record["document_path"] = document_path
+            record["status"] = "ok"
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            if verbose:
+                traceback.print_exc()
+        record["usage"] = usage.snapshot()
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+def run_batch(source: str, output_dir: Optional[str] = None, concurrency: Optional[int] = None,
+              summary_path: Optional[str] = None, progress=None, verbose: bool = False) -> Dict[str, Any]:
+    """
+    Vygeneruje nabídky pro všechny poptávky ze zdroje.
+
+    Args:
+        source: Adresář s poptávkami nebo CSV soubor
+        output_dir: Adresář pro dokumenty (výchozí BATCH_OUTPUT_DIR)
+        concurrency: Počet souběžně zpracovávaných poptávek (výchozí BATCH_CONCURRENCY)
+        summary_path: Cesta k souhrnu JSONL (výchozí summary.jsonl ve výstupním adresáři)
+        progress: Funkce ``progress(done, total, record)`` volaná po každé poptávce (volitelné)
+        verbose: Vypsat při chybě poptávky celý traceback
+
+    Returns:
+        Dict[str, Any]: Statistika s klíči items, ok, failed, seconds, usage, rate_limits,
+            generation a summary_path
+    """
+    output_dir = output_dir or config.batch_output_dir
+    concurrency = max(1, concurrency or config.batch_concurrency)
+    summary_path = summary_path or os.path.join(output_dir, "summary.jsonl")
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+
+    items = load_items(source)
+    stats = {
+        "items": len(items),
+        "ok": 0,
+        "failed": 0,
+        "seconds": 0.0,
+        "usage": {"calls": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                  "throttle_seconds": 0.0},
+        "summary_path": summary_path
+    }
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    with open(summary_path, "w", encoding="utf-8") as summary, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(process_item, item, output_dir, verbose) for item in items]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            with lock:
+                # Souhrn se zapisuje průběžně, aby zůstal i po přerušení dávky
+                summary.write(json.dumps(record, ensure_ascii=False) + "\n")
+                summary.flush()
+                stats["ok" if record["status"] == "ok" else "failed"] += 1
+                for key in stats["usage"]:
+                    stats["usage"][key] += record["usage"][key]
+            if progress:
+                progress(done, len(items), record)
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["usage"]["throttle_seconds"] = round(stats["usage"]["throttle_seconds"], 3)
+    stats["rate_limits"] = get_rate_limit_stats()
+    stats["generation"] = get_generation_stats()
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Spustí dávkové generování z příkazové řádky.
+
+    Args:
+        argv: Argumenty příkazové řádky (bez názvu příkazu)
+
+    Returns:
+        int: 0 pokud byly zpracovány všechny poptávky, jinak 1
+    """
+    parser = argparse.ArgumentParser(
+        prog="run_cli.py batch",
+        description="Dávkové generování nabídek (analýza, nabídka, DOCX) bez interaktivní konverzace"
+    )
+    parser.add_argument("source", help="Adresář s poptávkami (.txt, .md, .docx, .pdf) nebo CSV soubor")
+    parser.add_argument("--output-dir", "-o", help=f"Adresář pro dokumenty (výchozí {config.batch_output_dir})")
+    parser.add_argument("--summary", help="Cesta k souhrnu JSONL (výchozí summary.jsonl ve výstupním adresáři)")
+    parser.add_argument("--concurrency", "-c", type=int,
+                        help=f"Počet souběžně zpracovávaných poptávek (výchozí {config.batch_concurrency})")
+    parser.add_argument("--max-llm-calls", type=int,
+                        help="Nejvyšší počet souběžných volání LLM v celém procesu (výchozí LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Vypisovat průběh jednotlivých uzlů")
+    args = parser.parse_args(argv)
+
+    from app.cli import check_api_keys
+    if not check_api_keys():
+        return 1
+    if args.max_llm_calls is not None:
+        config.llm_max_concurrency = args.max_llm_calls
+
+    out = sys.stdout
+
+    def progress(done: int, total: int, record: Dict[str, Any]) -> None:
+        line = f"[{done}/{total}] {record['id']}: "
+        if record["status"] == "ok":
+            line += f"{record['document_path']} ({record['seconds']:.1f} s, {record['usage']['total_tokens']} tokenů)"
+        else:
+            line += f"CHYBA {record['error']}"
+        print(line, file=out, flush=True)
+
+    try:
+        if args.verbose:
+            stats = run_batch(args.source, args.output_dir, args.concurrency, args.summary, progress, verbose=True)
+        else:
+            # Výpisy uzlů grafu se souběžných poptávek prolínají, vypisuje se jen průběh
+            with open(os.devnull, "w") as devnull:
+                sys.stdout = devnull
+                try:
+                    stats = run_batch(args.source, args.output_dir, args.concurrency, args.summary, progress)
+                finally:
+                    sys.stdout = out
+    except (OSError, ValueError) as e:
+        print(f"Chyba: {e}")
+        return 1
+
+    usage = stats["usage"]
+    print(f"\nZpracováno {stats['items']} poptávek za {stats['seconds']:.1f} s: "
+          f"{stats['ok']} úspěšně, {stats['failed']} s chybou")
+    print(f"Volání LLM: {usage['calls']} (z cache {usage['cached']}), tokeny: {usage['total_tokens']} "
+          f"({usage['prompt_tokens']} vstup, {usage['completion_tokens']} výstup), "
+          f"čekání na limit rychlosti {usage['throttle_seconds']:.1f} s")
+    for name, limiter in stats["rate_limits"].items():
+        if limiter["throttled"] or limiter["retries"]:
+            print(f"Limiter {name}: zdrženo {limiter['throttled']} z {limiter['requests']} volání "
+                  f"({limiter['throttle_seconds']:.1f} s), opakování {limiter['retries']}, "
+                  f"odpovědí 429 {limiter['rate_limited']}, nejdelší fronta {limiter['max_queue_depth']}")
+    generation = stats["generation"]
+    if generation["responses"]:
+        print(f"Data nabídek: JSON opraven lokálně v {generation['repaired']} z {generation['responses']} odpovědí "
+              f"({generation['repair_rate'] * 100:.0f} %), nenačteno {generation['unparsed']}, "
+              f"dogenerováno {generation['regenerated_sections']} sekcí ({generation['regeneration_rate'] * 100:.0f} % odpovědí)")
+    print(f"Souhrn: {stats['summary_path']}")
+    return 0 if stats["failed"] == 0 else 1
@@ -0,0 +1,281 @@
+"""
+Kompaktní přehled (digest) poptávky klienta.
+
+Dlouhá poptávka se jednou převede na strukturovaný přehled (požadavky,
+moduly, integrace, termíny, počet uživatelů, rozpočet) a ten se vkládá do
+promptů místo celého textu. Přehled se ukládá do stavu relace
+(``ProposalState["request_digest"]``) pod hashem poptávky a v procesu se
+kešuje, takže se pro stejnou poptávku počítá jen jednou.
+
+Velmi dlouhá poptávka (nad ANALYSIS_MAP_REDUCE_TOKENS tokenů), která by se
+nevešla do jednoho promptu, se zpracuje metodou map-reduce: rozdělí se na
+části, přehledy částí se vytvoří souběžně a sloučí do jednoho přehledu.
+"""
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except ImportError:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.utils.config import get_config
+from app.utils.llm_clients import get_chat_model, invoke_llm
+from app.utils.tokens import count_tokens
+
+config = get_config()
+
+# Klíče přehledu a jejich popisky v promptu
+DIGEST_FIELDS = {
+    "shrnuti": "Shrnutí",
+    "pozadavky": "Požadavky",
+    "moduly": "Moduly a funkce",
+    "integrace": "Integrace",
+    "terminy": "Termíny",
+    "pocet_uzivatelu": "Počet uživatelů",
+    "rozpocet": "Rozpočet",
+    "dalsi": "Další omezení"
+}
+
+_lock = threading.Lock()
+_digests: Dict[str, Dict[str, Any]] = {}
+
+def request_hash(client_request: str) -> str:
+    """
+    Vrátí hash textu poptávky.
+
+    Args:
+        client_request: Text poptávky
+
+    Returns:
+        str: SHA-1 hash normalizovaného textu
+    """
+    normalized = " ".join(client_request.split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def build_request_digest(client_request: str) -> Dict[str, Any]:
+    """
+    Vytvoří strukturovaný přehled poptávky jedním voláním LLM.
+
+    Args:
+        client_request: Text poptávky
+
+    Returns:
+        Dict[str, Any]: Přehled s klíči podle DIGEST_FIELDS
+    """
+    llm = get_chat_model(temperature=0, model_kwargs={"response_format": {"type": "json_object"}})
+
+    system_message = SystemMessage(content="""
+    Jsi asistent pro zpracování poptávek na implementaci produktu MidPoint.
+    Převeď poptávku klienta na stručný strukturovaný přehled. Zachovej všechna konkrétní
+    fakta (čísla, termíny, názvy systémů, normy), vynech obecné formulace a opakování.
+
+    Vrať pouze JSON objekt s klíči:
+    - shrnuti: shrnutí poptávky ve 2-3 větách
+    - pozadavky: seznam konkrétních požadavků
+    - moduly: seznam požadovaných modulů a funkcí MidPoint
+    - integrace: seznam systémů k integraci
+    - terminy: seznam termínů a milníků
+    - pocet_uzivatelu: počet uživatelů nebo identit (text)
+    - rozpocet: rozpočet (text)
+    - dalsi: seznam dalších omezení a podmínek (bezpečnost, provoz, licence)
+    Pokud informace v poptávce chybí, použij prázdný seznam nebo prázdný text.
+    """)
+
+    human_message = HumanMessage(content=f"""
+    Poptávka klienta:
+    {client_request}
+    """)
+
+    response = invoke_llm(llm, [system_message, human_message])
+    try:
+        digest = json.loads(response.content)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Přehled poptávky není validní JSON: {e}")
+    if not isinstance(digest, dict):
+        raise ValueError("Přehled poptávky není JSON objekt")
+    return {key: digest.get(key) for key in DIGEST_FIELDS if digest.get(key)}
+
+def split_request(client_request: str, max_tokens: int) -> List[str]:
+    """
+    Rozdělí poptávku na části omezené počtem tokenů.
+
+    Args:
+        client_request: Text poptávky
+        max_tokens: Maximální počet tokenů jedné části
+
+    Returns:
+        List[str]: Části poptávky (dělí se přednostně mezi odstavci)
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens,
+        chunk_overlap=min(200, max_tokens // 10),
+        length_function=count_tokens
+    )
+    return text_splitter.split_text(client_request)
+
+def merge_digests(digests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sloučí přehledy částí poptávky do jednoho přehledu.
+
+    Seznamy se spojí bez duplicit, textové položky (shrnutí, počet
+    uživatelů, rozpočet) se spojí, pokud se v částech liší.
+
+    Args:
+        digests: Přehledy částí v pořadí částí
+
+    Returns:
+        Dict[str, Any]: Sloučený přehled
+    """
+    merged: Dict[str, Any] = {}
+    for key in DIGEST_FIELDS:
+        values = []
+        for digest in digests:
+            value = digest.get(key)
+            for item in value if isinstance(value, list) else [value]:
+                if item and item not in values:
+                    values.append(item)
+        if not values:
+            continue
+        if key == "shrnuti":
+            merged[key] = " ".join(str(v) for v in values)
+        elif all(not isinstance(digest.get(key), list) for digest in digests):
+            merged[key] = "; ".join(str(v) for v in values)
+        else:
+            merged[key] = values
+    return merged
+
+def build_request_digest_map_reduce(client_request: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Vytvoří přehled dlouhé poptávky metodou map-reduce.
+
+    Části poptávky (ANALYSIS_PART_TOKENS tokenů) se zpracují souběžně,
+    nejvýše ANALYSIS_CONCURRENCY volání LLM najednou, a jejich přehledy
+    se sloučí.
+
+    Args:
+        client_request: Text poptávky
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: Sloučený přehled a statistika
+            s klíči parts, elapsed, sequential a speedup (sekundy)
+    """
+    parts = split_request(client_request, config.analysis_part_tokens)
+
+    def map_part(part: str) -> Tuple[Dict[str, Any], float]:
+        start = time.perf_counter()
+        digest = build_request_digest(part)
+        return digest, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(config.analysis_concurrency, len(parts)))) as executor:
+        # Každé vlákno dostane kopii kontextu (priorita volání, počítadlo tokenů)
+        futures = [executor.submit(contextvars.copy_context().run, map_part, part) for part in parts]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    # Doba, kterou by části trvaly jedna po druhé
+    sequential = sum(latency for _, latency in results)
+    stats = {
+        "parts": len(parts),
+        "elapsed": round(elapsed, 2),
+        "sequential": round(sequential, 2),
+        "speedup": round(sequential / elapsed, 2) if elapsed > 0 else 1.0
+    }
+    print(f"Map-reduce analýza poptávky: {stats['parts']} částí za {stats['elapsed']:.1f} s "
+          f"(postupně {stats['sequential']:.1f} s, zrychlení {stats['speedup']:.1f}x)")
+    return merge_digests([digest for digest, _ in results]), stats
+
+def format_digest(digest: Dict[str, Any]) -> str:
+    """
+    Převede přehled poptávky na kompaktní text pro prompt.
+
+    Args:
+        digest: Přehled poptávky
+
+    Returns:
+        str: Jeden řádek na položku přehledu
+    """
+    lines = []
+    for key, label in DIGEST_FIELDS.items():
+        value = digest.get(key)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = "; ".join(str(item) for item in value)
+        lines.append(f"{label}: {value}")
+    return "\n".join(lines)
+
+def get_request_digest(client_request: str,
+                       cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Vrátí přehled poptávky, případně jej vytvoří.
+
+    Krátká poptávka (do REQUEST_DIGEST_MIN_TOKENS tokenů) se nepřevádí,
+    přehled by nic neušetřil. Poptávka nad ANALYSIS_MAP_REDUCE_TOKENS
+    tokenů se zpracuje po částech (viz ``build_request_digest_map_reduce``).
+
+    Args:
+        client_request: Text poptávky
+        cached: Dříve uložený záznam (``state["request_digest"]``)
+
+    Returns:
+        Optional[Dict[str, Any]]: Záznam s klíči hash, digest, tokens,
+            digest_tokens a map_reduce (statistika, nebo None), nebo None
+            pokud se poptávka nepřevádí
+    """
+    tokens = count_tokens(client_request)
+    if tokens <= config.request_digest_min_tokens:
+        return None
+
+    digest_hash = request_hash(client_request)
+    if cached and cached.get("hash") == digest_hash:
+        return cached
+    with _lock:
+        record = _digests.get(digest_hash)
+    if record is not None:
+        return record
+
+    print(f"Vytvářím přehled poptávky ({tokens} tokenů)...")
+    stats = None
+    if tokens > config.analysis_map_reduce_tokens:
+        digest, stats = build_request_digest_map_reduce(client_request)
+    else:
+        digest = build_request_digest(client_request)
+    record = {
+        "hash": digest_hash,
+        "digest": digest,
+        "tokens": tokens,
+        "digest_tokens": count_tokens(format_digest(digest)),
+        "map_reduce": stats
+    }
+    with _lock:
+        _digests[digest_hash] = record
+    return record
+
+def request_prompt_text(client_request: str, record: Optional[Dict[str, Any]],
+                        include_raw: Optional[bool] = None) -> str:
+    """
+    Vrátí poptávku v podobě pro prompt.
+
+    Args:
+        client_request: Text poptávky
+        record: Záznam z ``get_request_digest`` (None = použije se celý text)
+        include_raw: Přidat i původní text poptávky (výchozí REQUEST_INCLUDE_RAW)
+
+    Returns:
+        str: Přehled poptávky, případně doplněný o původní text
+    """
+    if record is None:
+        return client_request
+    include_raw = config.request_include_raw if include_raw is None else include_raw
+    text = f"Přehled poptávky:\n{format_digest(record['digest'])}"
+    if include_raw:
+        text += f"\n\nPůvodní znění poptávky:\n{client_request}"
+    return text
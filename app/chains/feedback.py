@@ -0,0 +1,163 @@
+"""
+Úpravy hotové nabídky podle zpětné vazby uživatele.
+
+Požadavek na změnu ("zkrať harmonogram na 12 týdnů") se týká obvykle
+jedné nebo dvou sekcí. ``affected_sections`` je určí nejdřív lokálně podle
+klíčových slov (bez ohledu na diakritiku, viz ``app.chains.intent``)
+a teprve když žádné nenajde, krátkým voláním LLM. ``revise_proposal_data``
+pak souběžně přepíše jen tyto sekce cílenými prompty; ostatní sekce
+zůstanou beze změny a v dokumentu se nepřepisují.
+"""
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.chains.intent import normalize
+from app.chains.proposal_schema import PROPOSAL_SCHEMA, regenerate_section
+from app.utils.config import get_config
+from app.utils.docx_generator import DOCUMENT_SECTIONS
+from app.utils.json_repair import repair_json
+from app.utils.llm_clients import get_chat_model, invoke_llm
+
+config = get_config()
+
+# Klíčová slova sekcí (po normalizaci)
+SECTION_KEYWORDS = {
+    "introduction": r"uvod\w*",
+    "solution_description": r"reseni|architektur\w*",
+    "scope_of_work": r"rozsah\w*|prac[ei]|modul\w*|integrac\w*|skoleni\w*",
+    "timeline": r"harmonogram\w*|termin\w*|tyden|tydn\w*|mesic\w*|faz[eiy]\w*|casov\w*",
+    "pricing": r"cen[auyeo]\w*|kalkulac\w*|rozpoc\w*|kc|slev\w*|naklad\w*|md|cenov\w*",
+    "contact_info": r"kontakt\w*|e-?mail\w*|telefon\w*",
+}
+
+_SECTION_PATTERNS = {
+    key: re.compile(rf"\b(?:{pattern})\b")
+    for key, pattern in SECTION_KEYWORDS.items()
+}
+
+# Zprávu kratší než tento počet slov bez klíčového slova sekce (např. "ok")
+# nemá smysl posílat LLM, nabídka se neupravuje
+MIN_CLASSIFY_WORDS = 3
+
+# Maximální délka odpovědi při určení sekcí pomocí LLM
+CLASSIFY_MAX_TOKENS = 100
+
+def match_sections(feedback: str) -> List[str]:
+    """
+    Najde sekce, kterých se požadavek týká, podle klíčových slov.
+
+    Args:
+        feedback: Zpráva uživatele
+
+    Returns:
+        List[str]: Klíče sekcí v pořadí dokumentu
+    """
+    normalized = normalize(feedback)
+    return [key for key, _, _ in DOCUMENT_SECTIONS if _SECTION_PATTERNS[key].search(normalized)]
+
+def classify_sections(feedback: str, proposal_data: Dict[str, Any]) -> List[str]:
+    """
+    Určí sekce, kterých se požadavek týká, krátkým voláním LLM.
+
+    Args:
+        feedback: Zpráva uživatele
+        proposal_data: Data nabídky
+
+    Returns:
+        List[str]: Klíče sekcí (prázdný seznam, pokud zpráva nežádá změnu)
+    """
+    llm = get_chat_model(
+        temperature=0,
+        max_tokens=CLASSIFY_MAX_TOKENS,
+        model_kwargs={"response_format": {"type": "json_object"}}
+    )
+    sections = "\n".join(
+        f"- {key}: {PROPOSAL_SCHEMA[key]}" for key, _, _ in DOCUMENT_SECTIONS if key in proposal_data
+    )
+    system_message = SystemMessage(content=f"""
+    Určuješ, kterých sekcí obchodní nabídky se týká požadavek uživatele na úpravu.
+    Sekce nabídky:
+    {sections}
+
+    Vrať JSON ve tvaru {{"sections": ["klíč", ...]}}. Pokud zpráva nežádá žádnou
+    změnu nabídky, vrať prázdný seznam.
+    """)
+    human_message = HumanMessage(content=f"Požadavek uživatele: {feedback}")
+
+    try:
+        data, _ = repair_json(invoke_llm(llm, [system_message, human_message]).content)
+    except ValueError as e:
+        print(f"Chyba při určení upravovaných sekcí: {e}")
+        return []
+    keys = data.get("sections", []) if isinstance(data, dict) else []
+    return [key for key, _, _ in DOCUMENT_SECTIONS if key in keys and key in proposal_data]
+
+def affected_sections(feedback: str, proposal_data: Dict[str, Any]) -> List[str]:
+    """
+    Určí sekce nabídky, kterých se požadavek týká.
+
+    Args:
+        feedback: Zpráva uživatele
+        proposal_data: Data nabídky
+
+    Returns:
+        List[str]: Klíče sekcí v pořadí dokumentu
+    """
+    sections = [key for key in match_sections(feedback) if key in proposal_data]
+    if sections:
+        return sections
+    if len(normalize(feedback).split()) < MIN_CLASSIFY_WORDS:
+        return []
+    return classify_sections(feedback, proposal_data)
+
+def revise_proposal_data(
+    proposal_data: Dict[str, Any],
+    sections: List[str],
+    feedback: str,
+    client_name: str,
+    request_text: str,
+    collected_data: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Souběžně přepíše vybrané sekce nabídky podle požadavku uživatele.
+
+    Sekce, kterou se přepsat nepodaří, si ponechá původní text.
+
+    Args:
+        proposal_data: Data nabídky
+        sections: Klíče sekcí k přepsání
+        feedback: Požadavek uživatele
+        client_name: Název klienta
+        request_text: Poptávka klienta (případně její přehled)
+        collected_data: Shromážděné informace (volitelné)
+
+    Returns:
+        Dict[str, Any]: Data nabídky s přepsanými sekcemi
+    """
+    snapshot = dict(proposal_data)
+
+    def revise(key: str) -> Optional[str]:
+        try:
+            return regenerate_section(key, client_name, request_text, snapshot, collected_data, feedback=feedback) or None
+        except Exception as e:
+            print(f"Chyba při úpravě sekce {key}: {e}")
+            return None
+
+    workers = max(1, min(config.section_concurrency, len(sections)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Každé vlákno dostane kopii kontextu (priorita volání, počítadlo tokenů)
+        futures = {
+            key: executor.submit(contextvars.copy_context().run, revise, key)
+            for key in sections
+        }
+        results = {key: future.result() for key, future in futures.items()}
+
+    revised = dict(proposal_data)
+    for key, text in results.items():
+        if text is not None:
+            revised[key] = text
+    return revised
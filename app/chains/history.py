@@ -0,0 +1,136 @@
+"""
+Historie konverzace v promptech.
+
+Místo posledních N zpráv ve formátovaném JSON se do promptu vkládá průběžné
+shrnutí starších zpráv a poslední zprávy doslovně v kompaktním tvaru
+``U: ...`` / ``A: ...`` v rámci rozpočtu tokenů. Shrnutí se ukládá do
+``ProposalState["history_summary"]`` a doplňuje se po dávkách, takže se
+nepočítá znovu v každém kroku a fakta z počátku konverzace se neztratí.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.utils.config import get_config
+from app.utils.llm_clients import get_chat_model, invoke_llm
+from app.utils.tokens import count_tokens, truncate_tokens
+
+config = get_config()
+
+ROLE_PREFIXES = {"user": "U", "assistant": "A", "system": "S"}
+
+def format_message(message: Dict[str, Any]) -> str:
+    """
+    Převede zprávu na jeden kompaktní řádek.
+
+    Args:
+        message: Zpráva s klíči role a content
+
+    Returns:
+        str: Řádek ve tvaru "U: text" nebo "A: text"
+    """
+    prefix = ROLE_PREFIXES.get(message["role"], message["role"])
+    return f"{prefix}: {' '.join(str(message['content']).split())}"
+
+def format_messages(messages: List[Dict[str, Any]]) -> str:
+    """
+    Převede zprávy na kompaktní text (jedna zpráva na řádek).
+
+    Args:
+        messages: Seznam zpráv
+
+    Returns:
+        str: Zprávy oddělené novým řádkem
+    """
+    return "\n".join(format_message(m) for m in messages)
+
+def summarize_messages(previous: Optional[str], messages: List[Dict[str, Any]]) -> str:
+    """
+    Doplní shrnutí konverzace o další zprávy.
+
+    Args:
+        previous: Dosavadní shrnutí (nebo None)
+        messages: Zprávy, které ve shrnutí ještě nejsou
+
+    Returns:
+        str: Aktualizované shrnutí
+    """
+    llm = get_chat_model(temperature=0, max_tokens=config.history_summary_tokens)
+
+    system_message = SystemMessage(content="""
+    Průběžně shrnuješ konverzaci obchodníka s asistentem při přípravě nabídky na implementaci produktu MidPoint.
+    Doplň dosavadní shrnutí o nové zprávy. Zachovej všechna fakta o požadavcích klienta
+    (počty uživatelů, termíny, moduly, integrované systémy, rozpočet, specifické požadavky) a dohodnutá rozhodnutí.
+    Vynech zdvořilosti a opakované otázky. Vrať pouze stručné shrnutí v bodech.
+    """)
+
+    human_message = HumanMessage(content=f"""
+    Dosavadní shrnutí:
+    {previous or "(zatím žádné)"}
+
+    Nové zprávy (U = uživatel, A = asistent):
+    {format_messages(messages)}
+    """)
+
+    return invoke_llm(llm, [system_message, human_message]).content.strip()
+
+def build_history(state: Dict[str, Any], recent: Optional[int] = None,
+                  budget: Optional[int] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Připraví historii konverzace pro prompt.
+
+    Zprávy, které ještě nejsou ve shrnutí, se vkládají doslovně. Jakmile jich
+    je víc než dvojnásobek ``recent`` (nebo se nevejdou do rozpočtu), starší
+    z nich se přidají do shrnutí jedním voláním LLM a doslovně zůstane
+    posledních ``recent`` zpráv.
+
+    Args:
+        state: Stav s klíči chat_history a history_summary
+        recent: Počet posledních zpráv vkládaných doslovně (výchozí HISTORY_RECENT_MESSAGES)
+        budget: Rozpočet tokenů pro celou historii (výchozí HISTORY_TOKEN_BUDGET)
+
+    Returns:
+        Tuple[str, Optional[Dict[str, Any]]]: Text historie pro prompt a shrnutí
+            pro uložení do ``state["history_summary"]`` (klíče text a upto)
+    """
+    recent = config.history_recent_messages if recent is None else recent
+    budget = config.history_token_budget if budget is None else budget
+    messages = state.get("chat_history") or []
+    summary = state.get("history_summary") or {"text": "", "upto": 0}
+
+    pending = messages[summary["upto"]:]
+    upto = summary["upto"]
+    if len(pending) > 2 * recent or count_tokens(format_messages(pending)) > budget:
+        upto = max(upto, len(messages) - recent)
+    # Nejvýše ``recent`` zpráv mimo shrnutí (např. jedna dlouhá vložená zpráva)
+    # se neshrnuje, ale zkrátí na rozpočet níže
+    if upto > summary["upto"]:
+        try:
+            summary = {
+                "text": summarize_messages(summary["text"], messages[summary["upto"]:upto]),
+                "upto": upto
+            }
+        except Exception as e:
+            # Bez shrnutí se vloží jen zprávy, které se vejdou do rozpočtu
+            print(f"Chyba při shrnování historie konverzace: {e}")
+
+    # Doslovné zprávy od nejnovější, dokud se vejdou do rozpočtu
+    used = count_tokens(summary["text"])
+    lines = []
+    for message in reversed(messages[summary["upto"]:]):
+        line = format_message(message)
+        tokens = count_tokens(line)
+        if used + tokens > budget:
+            if lines:
+                break
+            line = truncate_tokens(line, max(budget - used, 50))
+        lines.append(line)
+        used += tokens
+    lines.reverse()
+
+    parts = []
+    if summary["text"]:
+        parts.append(f"Shrnutí starší části konverzace:\n{summary['text']}")
+    if lines:
+        parts.append("Poslední zprávy (U = uživatel, A = asistent):\n" + "\n".join(lines))
+    return "\n\n".join(parts) or "(zatím žádné zprávy)", summary if summary["text"] else None
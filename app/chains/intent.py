@@ -0,0 +1,166 @@
+"""
+Lokální rozpoznání záměru zprávy uživatele bez volání LLM.
+
+Zpráva se jednou za krok konverzace normalizuje (malá písmena, bez
+diakritiky a interpunkce) a porovná nejdřív s přesnými příkazy a frázemi
+(``exit``, ``pokračuj``, ``vytvoř nabídku``). Pokud se nic neshoduje,
+rozhodne malý bodovací model nad předkompilovanými klíčovými slovy:
+sloveso tvorby a slovo "nabídka" záměr podpoří, zápor, otázka nebo
+dlouhá věcná zpráva jej oslabí. Slova posunu v procesu ("pokračuj",
+"hotovo", "stačí") jsou pokynem jen jako krátká samostatná zpráva; uvnitř
+běžné odpovědi ("Potřebujeme dokončit migraci do června") mají malou váhu. Rozhodnutí se ukládá do
+``ProposalState["intent"]``, takže ho uzly grafu znovu neparsují.
+
+Samotná slova jako "ok" nebo "další" přechod ke generování nespustí.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import get_config
+
+config = get_config()
+
+# Záměry zprávy
+ANSWER = "answer"          # běžná odpověď při sběru informací
+GENERATE = "generate"      # přechod k vytvoření nabídky
+EXIT = "exit"              # ukončení aplikace
+DEBUG = "debug"            # přepnutí debug režimu
+CLEAR = "clear"            # vyčištění obrazovky
+NO_CLEAR = "no_clear"      # režim bez čištění obrazovky
+
+# Příkazy rozhraní (celá zpráva po normalizaci)
+COMMANDS = {
+    "exit": EXIT,
+    "quit": EXIT,
+    "konec": EXIT,
+    "debug": DEBUG,
+    "clear": CLEAR,
+    "no-clear": NO_CLEAR,
+}
+
+# Fráze, které jako celá zpráva znamenají přechod ke generování
+GENERATE_PHRASES = {
+    "vytvor nabidku", "vytvorte nabidku", "vytvorit nabidku",
+    "generuj", "generuj nabidku", "vygeneruj", "vygeneruj nabidku", "vygenerujte nabidku",
+    "udelej nabidku", "priprav nabidku", "pripravte nabidku",
+    "pokracuj", "pokracujte", "pokracovat", "dalsi krok",
+    "hotovo", "dokoncit", "dokonci",
+}
+
+# Krátká samostatná zpráva s pokynem k posunu v procesu (např. "ok, pokračuj prosím")
+PROGRESS_COMMAND = re.compile(
+    r"^(?:(?:ok|dobre|jo|ano|tak|super)\s+)*"
+    r"(?:pokracuj(?:te)?|pokracovat|dalsi krok|hotovo|dokonci(?:t)?|to je vse|to staci|staci)"
+    r"(?:\s+(?:prosim|diky|dekuji))*$"
+)
+
+# Klíčová slova bodovacího modelu (po normalizaci) a jejich váha
+KEYWORD_WEIGHTS = [
+    # Sloveso tvorby
+    (r"(vy)?tvor(te|it)?|(vy)?generuj(te)?|(vy)?generovat|priprav(te|it)?"
+     r"|udelej(te)?|udelat|sestav(te|it)?|napis(te)?|napsat", 2),
+    # Předmět
+    (r"nabidk[auyoe]|nabidce|nabidkou|dokument", 2),
+    # Zdvořilá žádost
+    (r"muzes|muzete|muzeme|prosim|chci|chceme|rad(a|i)? bych", 1),
+    # Slovo posunu v procesu uvnitř delší zprávy (samo generování nespustí)
+    (r"pokracuj(te|me)?|pokracovat|dalsi krok|hotovo|dokonci(t)?|to je vse|to staci|staci", 1),
+    # Zápor nebo odklad
+    (r"ne|nevytvarej(te)?|negeneruj(te)?|nepokracuj(te)?|pockej(te)?|nejdriv|nejprve", -4),
+]
+
+_KEYWORDS = [
+    (re.compile(rf"\b(?:{pattern})\b"), weight)
+    for pattern, weight in KEYWORD_WEIGHTS
+]
+_PUNCTUATION = re.compile(r"[^\w\s-]")
+
+# Zpráva delší než tento počet slov je spíš věcná odpověď než pokyn
+LONG_MESSAGE_WORDS = 12
+
+def normalize(text: str) -> str:
+    """
+    Převede text na malá písmena bez diakritiky, interpunkce a nadbytečných mezer.
+
+    Args:
+        text: Zpráva uživatele
+
+    Returns:
+        str: Normalizovaný text
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_PUNCTUATION.sub(" ", stripped).split())
+
+def classify_intent(text: str, threshold: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Rozpozná záměr zprávy uživatele.
+
+    Args:
+        text: Zpráva uživatele
+        threshold: Nejnižší skóre pro záměr "generate" (výchozí INTENT_GENERATE_THRESHOLD)
+
+    Returns:
+        Dict[str, Any]: Záměr (``intent``), skóre (``score``), shodná klíčová
+            slova (``matched``) a způsob rozhodnutí (``source``: "command",
+            "phrase" nebo "keywords")
+    """
+    threshold = config.intent_generate_threshold if threshold is None else threshold
+    normalized = normalize(text)
+
+    if normalized in COMMANDS:
+        return {"intent": COMMANDS[normalized], "score": 0, "matched": [normalized], "source": "command"}
+    if normalized in GENERATE_PHRASES or PROGRESS_COMMAND.match(normalized):
+        return {"intent": GENERATE, "score": threshold, "matched": [normalized], "source": "phrase"}
+
+    score = 0
+    matched: List[str] = []
+    for pattern, weight in _KEYWORDS:
+        match = pattern.search(normalized)
+        if match:
+            score += weight
+            matched.append(match.group(0))
+    if "?" in text:
+        score -= 1
+    if len(normalized.split()) > LONG_MESSAGE_WORDS:
+        score -= 2
+
+    intent = GENERATE if score >= threshold else ANSWER
+    return {"intent": intent, "score": score, "matched": matched, "source": "keywords"}
+
+# Zprávy s očekávaným záměrem pro kontrolu klasifikátoru (python3 -m app.chains.intent)
+EXAMPLES = [
+    ("ok", ANSWER),
+    ("další", ANSWER),
+    ("Další požadavek je integrace s AD", ANSWER),
+    ("Stačí nám základní reporting.", ANSWER),
+    ("Potřebujeme dokončit migraci do června.", ANSWER),
+    ("Hotovo by to mělo být do konce roku", ANSWER),
+    ("Pokračovat budeme s AD a SAP", ANSWER),
+    ("Implementaci potřebujeme dokončit do konce příštího roku, rozpočet je 2 mil. Kč.", ANSWER),
+    ("Jaká bude cena nabídky?", ANSWER),
+    ("Ještě nevytvářej nabídku", ANSWER),
+    ("vytvoř nabídku", GENERATE),
+    ("Vytvořte nabídku!", GENERATE),
+    ("Pokračuj", GENERATE),
+    ("ok, pokračuj prosím", GENERATE),
+    ("Hotovo.", GENERATE),
+    ("To je vše, připravte nabídku", GENERATE),
+    ("Můžete vytvořit nabídku?", GENERATE),
+    ("konec", EXIT),
+]
+
+def main() -> int:
+    """Ověří klasifikaci zpráv z ``EXAMPLES``; vrátí počet chyb."""
+    failures = 0
+    for text, expected in EXAMPLES:
+        decision = classify_intent(text)
+        if decision["intent"] != expected:
+            failures += 1
+            print(f"CHYBA: {text!r} -> {decision['intent']} (očekáváno {expected}, skóre {decision['score']}, {decision['matched']})")
+    print(f"Zkontrolováno {len(EXAMPLES)} zpráv, chyb: {failures}")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(1 if main() else 0)
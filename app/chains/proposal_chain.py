@@ -2,13 +2,16 @@
 LangChain řetězec pro generování nabídek.
 """
 from typing import Dict, Any, List, Optional
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
+from app.chains.digest import get_request_digest, request_prompt_text
+from app.chains.proposal_schema import complete_proposal_data, parse_proposal_response
 from app.utils.config import get_config
+from app.utils.context_packer import pack_context
+from app.utils.llm_clients import get_chat_model, invoke_llm
 from app.utils.vector_store import similarity_search
 
 config = get_config()
@@ -44,11 +47,8 @@ def get_relevant_context(query: str) -> str:
     """
     documents = similarity_search(query, k=5)
     
-    if not documents:
-        return "Nebyly nalezeny žádné relevantní dokumenty."
-    
-    # Spojení dokumentů do jednoho textu
-    context = "\n\n---\n\n".join([doc.page_content for doc in documents])
+    # Spojení dokumentů do jednoho textu v rozpočtu tokenů
+    context, _ = pack_context(documents, config.context_budget_chain)
     
     return context
 
@@ -79,12 +79,9 @@ def create_proposal_chain():
     Returns:
         Runnable: LangChain řetězec
     """
-    # Vytvoření LLM
-    llm = ChatOpenAI(
-        model=config.model_name,
-        temperature=0.7,
-        openai_api_key=config.openai_api_key
-    )
+    # Sdílená instance LLM; řetězec volá model přímo, ne přes invoke_llm,
+    # proto si ponechává opakování klienta OpenAI
+    llm = get_chat_model(temperature=0.7, max_retries=2)
     
     # Vytvoření promptu
     prompt = ChatPromptTemplate.from_messages([
@@ -111,7 +108,8 @@ def create_proposal_chain():
 def generate_proposal_data(
     client_request: str,
     client_name: str,
-    additional_info: Optional[Dict[str, Any]] = None
+    additional_info: Optional[Dict[str, Any]] = None,
+    include_raw: Optional[bool] = None
 ) -> Dict[str, Any]:
     """
     Generuje data pro vytvoření nabídky.
@@ -120,23 +118,22 @@ def generate_proposal_data(
         client_request: Poptávka klienta
         client_name: Název klienta
         additional_info: Dodatečné informace (volitelné)
+        include_raw: Vložit u dlouhé poptávky i její původní text (výchozí REQUEST_INCLUDE_RAW)
         
     Returns:
         Dict[str, Any]: Data pro vytvoření nabídky
     """
-    # Vytvoření LLM
-    llm = ChatOpenAI(
-        model=config.model_name,
-        temperature=0.2,
-        openai_api_key=config.openai_api_key
-    )
+    # Sdílená instance LLM
+    llm = get_chat_model(temperature=0.2)
     
     # Získání relevantního kontextu
     context = get_relevant_context(client_request)
     
-    # Vytvoření promptu pro generování dat
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """
+    # Dlouhá poptávka se do promptu vkládá jako přehled
+    request_text = request_prompt_text(client_request, get_request_digest(client_request), include_raw)
+    
+    # Vytvoření zpráv pro generování dat
+    system_message = SystemMessage(content="""
         Jsi asistent pro generování strukturovaných dat pro obchodní nabídky na implementaci produktu MidPoint.
         Na základě poptávky klienta a relevantního kontextu vytvoř strukturovaná data pro nabídku.
         
@@ -148,10 +145,10 @@ def generate_proposal_data(
         - timeline: Harmonogram implementace (seznam fází s časovým odhadem)
         - pricing: Cenová kalkulace (tabulka položek s cenami)
         - contact_info: Kontaktní informace
-        """),
-        ("human", f"""
+        """)
+    human_message = HumanMessage(content=f"""
         Poptávka klienta:
-        {client_request}
+        {request_text}
         
         Název klienta: {client_name}
         
@@ -161,25 +158,11 @@ def generate_proposal_data(
         Dodatečné informace:
         {additional_info if additional_info else "Žádné dodatečné informace."}
         """)
-    ])
     
     # Generování dat
-    response = llm.invoke(prompt)
-    
-    # Parsování JSON odpovědi
-    try:
-        import json
-        data = json.loads(response.content)
-        return data
-    except Exception as e:
-        print(f"Chyba při parsování JSON: {e}")
-        # Vrátíme alespoň základní data
-        return {
-            "client_name": client_name,
-            "introduction": "Chyba při generování dat.",
-            "solution_description": "Chyba při generování dat.",
-            "scope_of_work": "Chyba při generování dat.",
-            "timeline": "Chyba při generování dat.",
-            "pricing": "Chyba při generování dat.",
-            "contact_info": "Chyba při generování dat."
-        } 
\ No newline at end of file
+    response = invoke_llm(llm, [system_message, human_message])
+    
+    # Parsování JSON odpovědi (téměř validní JSON se opraví lokálně) a kontrola
+    # proti schématu; chybějící sekce se dogenerují samostatně
+    data = parse_proposal_response(response.content)
+    return complete_proposal_data(data, client_name, request_text, additional_info)
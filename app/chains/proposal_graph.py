@@ -1,14 +1,19 @@
 """
 LangGraph komponenta pro interaktivní generování nabídek.
 """
-from typing import Dict, Any, List, Tuple, Annotated, TypedDict, Optional
+from typing import Dict, Any, Callable, List, Tuple, Annotated, TypedDict, Optional
 from enum import Enum
+import contextvars
+import hashlib
 import json
 import operator
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
+from langchain_core.documents import Document
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
@@ -16,16 +21,36 @@ from langchain_core.runnables import RunnablePassthrough
 # Definice konstant pro END
 END = "end"
 
+from app.chains.digest import get_request_digest, request_prompt_text
+from app.chains.feedback import affected_sections, revise_proposal_data
+from app.chains.history import build_history, format_messages
+from app.chains.intent import GENERATE, classify_intent
+from app.chains.proposal_schema import complete_proposal_data, parse_proposal_response
+from app.chains.speculative import SpeculativeDrafts
+from app.utils.checkpoints import get_checkpoint_store
 from app.utils.config import get_config
+from app.utils.context_packer import pack_context
+from app.utils.json_stream import JsonObjectStream
+from app.utils.llm_clients import cache_tag, get_chat_model, invoke_llm
+from app.utils.streaming import emit_text, get_token_stream, token_stream
 from app.utils.vector_store import similarity_search
-from app.utils.docx_generator import create_proposal_document
+from app.utils.docx_generator import (
+    SECTION_BY_KEY, ProposalDocumentBuilder, create_proposal_document, section_text, update_proposal_document
+)
 
 config = get_config()
 
+# Dokumenty rozpracované během streamování generate_proposal podle ID relace;
+# create_document je dokončí (stav grafu se serializuje, proto ne ve stavu)
+_document_builders: Dict[str, ProposalDocumentBuilder] = {}
+
 # Definice stavů grafu
 class ProposalState(TypedDict):
     """Stav grafu pro generování nabídek."""
     
+    # ID relace (klíč pro checkpointy)
+    session_id: str
+    
     # Vstupní data
     client_request: str
     client_name: str
@@ -34,13 +59,28 @@ class ProposalState(TypedDict):
     current_step: str
     chat_history: List[Dict[str, Any]]
     
+    # Záměr poslední zprávy uživatele (viz app.chains.intent, nastavuje process_user_input)
+    intent: Optional[Dict[str, Any]]
+    
     # Shromážděná data
     collected_data: Dict[str, Any]
     
+    # Kontext z předchozích nabídek sdílený mezi kroky (viz get_context_documents)
+    retrieval: Optional[Dict[str, Any]]
+    
+    # Přehled dlouhé poptávky pro prompty (viz app.chains.digest)
+    request_digest: Optional[Dict[str, Any]]
+    
+    # Průběžné shrnutí starších zpráv konverzace (viz app.chains.history)
+    history_summary: Optional[Dict[str, Any]]
+    
     # Výstupní data
     proposal_data: Optional[Dict[str, Any]]
     document_path: Optional[str]
     
+    # Cesta pro uložení dokumentu (volitelné, jinak data/generated)
+    output_path: Optional[str]
+    
     # Počítadlo kroků pro prevenci nekonečné rekurze
     step_counter: Dict[str, int]
 
@@ -55,6 +95,105 @@ class Step(str, Enum):
     HUMAN_FEEDBACK = "human_feedback"
     END = "end"  # Explicitní konec
 
+# Počet dokumentů, které se z vektorové databáze načítají jednou pro celou relaci
+# (nejvyšší k, které kroky grafu potřebují)
+RETRIEVAL_K = 5
+
+# Položky collected_data, které upřesňují dotaz do vektorové databáze
+RETRIEVAL_FIELDS = ("rozsah_implementace", "integrace", "specificke_pozadavky")
+
+def retrieval_query(state: ProposalState) -> str:
+    """
+    Sestaví dotaz pro vyhledání podobných nabídek.
+    
+    Args:
+        state: Aktuální stav
+        
+    Returns:
+        str: Poptávka klienta doplněná o upřesňující shromážděné informace
+    """
+    collected_data = state.get("collected_data") or {}
+    parts = [state["client_request"]]
+    for field in RETRIEVAL_FIELDS:
+        value = collected_data.get(field)
+        if value:
+            parts.append(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+    return "\n\n".join(parts)
+
+def get_context_documents(state: ProposalState, k: int) -> Tuple[List[Document], Dict[str, Any]]:
+    """
+    Vrátí dokumenty z předchozích nabídek pro aktuální stav.
+    
+    Dokumenty se načtou jednou pro RETRIEVAL_K výsledků a uloží do stavu.
+    Další kroky je převezmou ze stavu; znovu se vyhledává jen tehdy, když
+    se změní dotaz (poptávka nebo upřesňující položky v collected_data).
+    
+    Args:
+        state: Aktuální stav
+        k: Počet požadovaných dokumentů
+        
+    Returns:
+        Tuple[List[Document], Dict[str, Any]]: Dokumenty a hodnota pro state["retrieval"]
+    """
+    query = retrieval_query(state)
+    query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    retrieval = state.get("retrieval")
+    
+    if not retrieval or retrieval.get("query_hash") != query_hash or retrieval.get("k", 0) < k:
+        documents = similarity_search(query, k=max(k, RETRIEVAL_K))
+        retrieval = {
+            "query_hash": query_hash,
+            "k": max(k, RETRIEVAL_K),
+            # Dokumenty se ukládají jako slovníky, aby byl stav serializovatelný
+            "documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        }
+    else:
+        print(f"Používám kontext uložený ve stavu ({len(retrieval['documents'])} dokumentů)")
+    
+    documents = [Document(**doc) for doc in retrieval["documents"][:k]]
+    return documents, retrieval
+
+def get_context_text(state: ProposalState, step: Step, k: int, budget: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Vrátí kontext z předchozích nabídek pro prompt daného kroku.
+    
+    Dokumenty se složí do rozpočtu tokenů (viz ``pack_context``) a přehled
+    vložených a vynechaných úseků se uloží do ``retrieval["packing"]``.
+    
+    Args:
+        state: Aktuální stav
+        step: Krok, pro který se kontext skládá
+        k: Počet požadovaných dokumentů
+        budget: Rozpočet tokenů pro kontext
+        
+    Returns:
+        Tuple[str, Dict[str, Any]]: Text kontextu a hodnota pro state["retrieval"]
+    """
+    documents, retrieval = get_context_documents(state, k)
+    context_text, report = pack_context(documents, budget)
+    packing = {**retrieval.get("packing", {}), step.value: report}
+    return context_text, {**retrieval, "packing": packing}
+
+def get_request_text(state: ProposalState) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Vrátí poptávku klienta pro prompt.
+    
+    Dlouhá poptávka se nahradí přehledem, který se vytvoří jednou a uloží
+    do stavu. Pokud se přehled nepodaří vytvořit, použije se celý text.
+    
+    Args:
+        state: Aktuální stav
+        
+    Returns:
+        Tuple[str, Optional[Dict[str, Any]]]: Text poptávky a hodnota pro state["request_digest"]
+    """
+    try:
+        record = get_request_digest(state["client_request"], state.get("request_digest"))
+    except Exception as e:
+        print(f"Chyba při vytváření přehledu poptávky, používám celý text: {e}")
+        record = None
+    return request_prompt_text(state["client_request"], record), record
+
 # Funkce pro analýzu poptávky
 def analyze_request(state: ProposalState) -> ProposalState:
     """
@@ -66,16 +205,14 @@ def analyze_request(state: ProposalState) -> ProposalState:
     Returns:
         ProposalState: Aktualizovaný stav
     """
-    # Vytvoření LLM
-    llm = ChatOpenAI(
-        model=config.model_name,
-        temperature=0.2,
-        openai_api_key=config.openai_api_key
-    )
+    # Sdílená instance LLM
+    llm = get_chat_model(temperature=0.2)
     
     # Získání relevantního kontextu
-    context = similarity_search(state["client_request"], k=3)
-    context_text = "\n\n---\n\n".join([doc.page_content for doc in context]) if context else "Nebyly nalezeny žádné relevantní dokumenty."
+    context_text, retrieval = get_context_text(state, Step.ANALYZE_REQUEST, 3, config.context_budget_analyze)
+    
+    # Poptávka klienta (u dlouhé poptávky její přehled)
+    request_text, request_digest = get_request_text(state)
     
     # Vytvoření zpráv pro prompt
     system_message = SystemMessage(content="""
@@ -96,7 +233,7 @@ def analyze_request(state: ProposalState) -> ProposalState:
     
     human_message = HumanMessage(content=f"""
     Poptávka klienta:
-    {state["client_request"]}
+    {request_text}
     
     Název klienta: {state["client_name"]}
     
@@ -104,14 +241,21 @@ def analyze_request(state: ProposalState) -> ProposalState:
     {context_text}
     """)
     
-    # Generování analýzy
-    response = llm.invoke([system_message, human_message])
+    # Generování analýzy (shrnutí lze převzít i ze sémantické cache)
+    response = invoke_llm(
+        llm, [system_message, human_message], semantic=Step.ANALYZE_REQUEST.value, stream=True
+    )
     
     # Aktualizace stavu
     new_state = state.copy()
-    new_state["chat_history"] = state.get("chat_history", []) + [
-        {"role": "assistant", "content": response.content}
-    ]
+    new_state["retrieval"] = retrieval
+    new_state["request_digest"] = request_digest
+    message = {"role": "assistant", "content": response.content}
+    tag = cache_tag(response)
+    if tag:
+        # Odpověď z cache označíme kvůli dohledatelnosti
+        message["cache"] = tag
+    new_state["chat_history"] = state.get("chat_history", []) + [message]
     new_state["current_step"] = Step.GATHER_INFORMATION
     
     # Aktualizace počítadla kroků
@@ -121,6 +265,140 @@ def analyze_request(state: ProposalState) -> ProposalState:
     
     return new_state
 
+# Oblasti, které se extrahují z odpovědí uživatele do collected_data
+EXTRACTION_FIELDS = """
+        - rozsah_implementace: Jaké moduly a funkce MidPoint klient požaduje
+        - casovy_ramec: Kdy klient očekává dokončení implementace
+        - integrace: S jakými systémy má být MidPoint integrován
+        - specificke_pozadavky: Jaké má klient specifické požadavky na implementaci
+        - rozpocet: Jaký má klient rozpočet na implementaci
+"""
+
+def _reply_messages(chat_history: List[Dict[str, Any]], collected_data: Dict[str, Any], questions: int,
+                    history: str) -> List[Any]:
+    """Vytvoří zprávy pro odpověď asistenta při sběru informací."""
+    system_message = SystemMessage(content="""
+        Jsi asistent pro sběr informací pro vytvoření nabídky na implementaci produktu MidPoint.
+        Tvým úkolem je zpracovat odpověď uživatele a extrahovat z ní relevantní informace.
+        
+        Odpověz ve dvou částech:
+        1. Potvrzení - potvrď, že jsi pochopil informace od uživatele
+        2. Další otázka - pokud stále chybí nějaké informace, zeptej se na ně
+        
+        Pokud máš všechny potřebné informace nebo jsi již položil několik otázek, informuj uživatele, že může přistoupit k vytvoření nabídky napsáním "vytvoř nabídku" nebo "pokračuj".
+        """)
+    
+    human_message = HumanMessage(content=f"""
+        Historie konverzace:
+        {history}
+        
+        Poslední zpráva od uživatele:
+        {chat_history[-1]["content"]}
+        
+        Dosud shromážděné informace:
+        {json.dumps(collected_data, ensure_ascii=False, separators=(",", ":"))}
+        
+        Počet položených otázek: {questions}
+        """)
+    
+    return [system_message, human_message]
+
+def _extraction_messages(user_message: str) -> List[Any]:
+    """Vytvoří zprávy pro extrakci strukturovaných dat z odpovědi uživatele."""
+    system_message = SystemMessage(content=f"""
+        Jsi asistent pro extrakci strukturovaných dat z textu.
+        Tvým úkolem je extrahovat relevantní informace z odpovědi uživatele a vrátit je ve formátu JSON.
+        
+        Zaměř se na následující oblasti:{EXTRACTION_FIELDS}
+        Vrať pouze JSON objekt s těmito klíči, pokud jsou informace dostupné. Pokud některá informace chybí, nezahrnuj ji do výstupu.
+        """)
+    
+    human_message = HumanMessage(content=f"""
+        Odpověď uživatele:
+        {user_message}
+        """)
+    
+    return [system_message, human_message]
+
+def _parse_extraction(content: str) -> Dict[str, Any]:
+    """Naparsuje JSON s extrahovanými daty, při chybě vrátí prázdný slovník."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        # Pokud se nepodařilo parsovat JSON, ignorujeme
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def gather_turn(chat_history: List[Dict[str, Any]], collected_data: Dict[str, Any],
+                questions: int, mode: Optional[str] = None,
+                history: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Zpracuje jednu odpověď uživatele při sběru informací.
+    
+    Odpověď asistenta i extrakce dat závisí jen na poslední zprávě
+    uživatele, takže je lze získat jedním strukturovaným voláním
+    ("structured") nebo dvěma souběžnými voláními ("parallel") místo
+    dvou volání za sebou ("sequential").
+    
+    Args:
+        chat_history: Historie konverzace (poslední zpráva je od uživatele)
+        collected_data: Dosud shromážděné informace
+        questions: Počet položených otázek
+        mode: Způsob zpracování (výchozí podle konfigurace GATHER_MODE)
+        history: Historie konverzace pro prompt (výchozí posledních
+            HISTORY_RECENT_MESSAGES zpráv, viz ``build_history``)
+        
+    Returns:
+        Tuple[str, Dict[str, Any]]: Odpověď asistenta a extrahovaná data
+    """
+    mode = mode or config.gather_mode
+    if history is None:
+        history = format_messages(chat_history[-config.history_recent_messages:])
+    reply_messages = _reply_messages(chat_history, collected_data, questions, history)
+    
+    if mode == "structured":
+        # Jedno volání v JSON režimu vrátí odpověď i extrahovaná data
+        llm = get_chat_model(temperature=0.2, model_kwargs={"response_format": {"type": "json_object"}})
+        system_message = SystemMessage(content=reply_messages[0].content + f"""
+        Zároveň extrahuj z poslední zprávy uživatele tyto informace:{EXTRACTION_FIELDS}
+        Vrať pouze JSON objekt s klíči:
+        - odpoved: text odpovědi uživateli
+        - data: objekt s extrahovanými informacemi (jen ty, které jsou v odpovědi uživatele dostupné)
+        """)
+        response = invoke_llm(llm, [system_message, reply_messages[1]])
+        result = _parse_extraction(response.content)
+        reply = result.get("odpoved")
+        data = result.get("data")
+        data = data if isinstance(data, dict) else {}
+        if not isinstance(reply, str) or not reply.strip():
+            # Model nevrátil text odpovědi, vygeneruje se běžným (streamovaným) voláním
+            print("Strukturovaná odpověď neobsahuje text pro uživatele, generuji odpověď zvlášť")
+            return invoke_llm(get_chat_model(temperature=0.2), reply_messages, stream=True).content, data
+        emit_text(reply)
+        return reply, data
+    
+    llm = get_chat_model(temperature=0.2)
+    extraction_messages = _extraction_messages(chat_history[-1]["content"])
+    
+    if mode == "parallel":
+        # Obě vlákna dostanou kopii kontextu (streamování, priorita volání, počítadlo tokenů)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            reply_future = executor.submit(
+                contextvars.copy_context().run, invoke_llm, llm, reply_messages, stream=True
+            )
+            extract_future = executor.submit(
+                contextvars.copy_context().run, invoke_llm, llm, extraction_messages, cache=True
+            )
+            response = reply_future.result()
+            extract_response = extract_future.result()
+    else:
+        # Generování odpovědi (text se streamuje do rozhraní)
+        response = invoke_llm(llm, reply_messages, stream=True)
+        # Generování extrakce
+        extract_response = invoke_llm(llm, extraction_messages, cache=True)
+    
+    return response.content, _parse_extraction(extract_response.content)
+
 # Funkce pro sběr informací
 def gather_information(state: ProposalState) -> ProposalState:
     """
@@ -151,99 +429,34 @@ def gather_information(state: ProposalState) -> ProposalState:
     # Pokud máme poslední zprávu od uživatele, zpracujeme ji
     chat_history = state.get("chat_history", [])
     if chat_history and chat_history[-1]["role"] == "user":
-        # Kontrola, zda uživatel chce přejít k vytvoření nabídky
-        last_message = chat_history[-1]["content"].lower().strip()
-        
-        # Seznam frází, které indikují přechod k vytvoření nabídky
-        trigger_phrases = [
-            "vytvoř nabídku", "generuj nabídku", "vytvor nabidku", 
-            "vygeneruj nabídku", "udělej nabídku", "připrav nabídku",
-            "pokračuj", "další krok", "další", "hotovo", "dokončit"
-        ]
-        
-        # Kontrola, zda poslední zpráva obsahuje některou z trigger frází
-        for phrase in trigger_phrases:
-            if phrase in last_message:
-                print(f"Uživatel požádal o vytvoření nabídky: '{phrase}'")
-                new_state["current_step"] = Step.GENERATE_PROPOSAL
-                new_state["chat_history"] = state.get("chat_history", []) + [
-                    {"role": "assistant", "content": "Super, mám dostatek informací k vytvoření nabídky na implementaci produktu MidPoint. Pokračuji v procesu tvorby nabídky."}
-                ]
-                return new_state
-        
-        # Vytvoření LLM
-        llm = ChatOpenAI(
-            model=config.model_name,
-            temperature=0.2,
-            openai_api_key=config.openai_api_key
-        )
-        
-        # Vytvoření zpráv pro prompt
-        system_message = SystemMessage(content="""
-        Jsi asistent pro sběr informací pro vytvoření nabídky na implementaci produktu MidPoint.
-        Tvým úkolem je zpracovat odpověď uživatele a extrahovat z ní relevantní informace.
-        
-        Odpověz ve dvou částech:
-        1. Potvrzení - potvrď, že jsi pochopil informace od uživatele
-        2. Další otázka - pokud stále chybí nějaké informace, zeptej se na ně
-        
-        Pokud máš všechny potřebné informace nebo jsi již položil několik otázek, informuj uživatele, že může přistoupit k vytvoření nabídky napsáním "vytvoř nabídku" nebo "pokračuj".
-        """)
-        
-        human_message = HumanMessage(content=f"""
-        Historie konverzace:
-        {json.dumps(chat_history[-5:], ensure_ascii=False, indent=2)}
-        
-        Poslední zpráva od uživatele:
-        {chat_history[-1]["content"]}
-        
-        Dosud shromážděné informace:
-        {json.dumps(state.get("collected_data", {}), ensure_ascii=False, indent=2)}
-        
-        Počet položených otázek: {step_counter.get(Step.GATHER_INFORMATION, 0)}
-        """)
+        # Záměr zprávy rozpoznaný při jejím přijetí (starší relace jej nemají)
+        intent = state.get("intent") or classify_intent(chat_history[-1]["content"])
+        new_state["intent"] = None
         
-        # Generování odpovědi
-        response = llm.invoke([system_message, human_message])
-        
-        # Extrakce informací z odpovědi uživatele
-        extract_system_message = SystemMessage(content="""
-        Jsi asistent pro extrakci strukturovaných dat z textu.
-        Tvým úkolem je extrahovat relevantní informace z odpovědi uživatele a vrátit je ve formátu JSON.
-        
-        Zaměř se na následující oblasti:
-        - rozsah_implementace: Jaké moduly a funkce MidPoint klient požaduje
-        - casovy_ramec: Kdy klient očekává dokončení implementace
-        - integrace: S jakými systémy má být MidPoint integrován
-        - specificke_pozadavky: Jaké má klient specifické požadavky na implementaci
-        - rozpocet: Jaký má klient rozpočet na implementaci
-        
-        Vrať pouze JSON objekt s těmito klíči, pokud jsou informace dostupné. Pokud některá informace chybí, nezahrnuj ji do výstupu.
-        """)
+        if intent["intent"] == GENERATE:
+            print(f"Uživatel požádal o vytvoření nabídky: {intent['matched']}")
+            new_state["current_step"] = Step.GENERATE_PROPOSAL
+            new_state["chat_history"] = state.get("chat_history", []) + [
+                {"role": "assistant", "content": "Super, mám dostatek informací k vytvoření nabídky na implementaci produktu MidPoint. Pokračuji v procesu tvorby nabídky."}
+            ]
+            return new_state
         
-        extract_human_message = HumanMessage(content=f"""
-        Odpověď uživatele:
-        {chat_history[-1]["content"]}
-        """)
+        # Historie pro prompt: shrnutí starších zpráv a poslední zprávy doslovně
+        history, new_state["history_summary"] = build_history(state)
         
-        # Generování extrakce
-        extract_response = llm.invoke([extract_system_message, extract_human_message])
+        # Odpověď uživateli a extrakce dat (způsob podle GATHER_MODE)
+        response_content, extracted_data = gather_turn(
+            chat_history,
+            state.get("collected_data", {}),
+            step_counter.get(Step.GATHER_INFORMATION, 0),
+            history=history
+        )
         
-        try:
-            # Parsování JSON odpovědi
-            extracted_data = json.loads(extract_response.content)
-            
-            # Aktualizace shromážděných dat
-            collected_data = state.get("collected_data", {})
-            collected_data.update(extracted_data)
-            new_state["collected_data"] = collected_data
-        except:
-            # Pokud se nepodařilo parsovat JSON, ignorujeme
-            pass
+        if extracted_data:
+            # Aktualizace shromážděných dat (nový slovník, předchozí stav může být v checkpointu)
+            new_state["collected_data"] = {**state.get("collected_data", {}), **extracted_data}
         
         # Přidání odpovědi do historie
-        response_content = response.content
-        
         # Pokud jsme již položili několik otázek, přidáme explicitní výzvu k vytvoření nabídky
         if step_counter.get(Step.GATHER_INFORMATION, 0) >= 3:
             if "vytvoř nabídku" not in response_content.lower() and "pokračuj" not in response_content.lower():
@@ -252,32 +465,34 @@ def gather_information(state: ProposalState) -> ProposalState:
         new_state["chat_history"] = chat_history + [
             {"role": "assistant", "content": response_content}
         ]
+        
+        # Návrh nabídky na pozadí, zatímco uživatel píše další odpověď
+        _speculative_drafts.maybe_start(new_state)
     
     return new_state
 
-# Funkce pro generování nabídky
-def generate_proposal(state: ProposalState) -> ProposalState:
+# Generování dat nabídky (sdílené s návrhy na pozadí, viz app.chains.speculative)
+def generate_proposal_fields(state: ProposalState, on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
     """
-    Generuje data pro nabídku.
+    Vygeneruje data nabídky bez změny stavu.
     
     Args:
         state: Aktuální stav
+        on_section: Funkce ``on_section(klíč, hodnota)`` volaná pro každou dokončenou sekci
         
     Returns:
-        ProposalState: Aktualizovaný stav
+        Dict[str, Any]: Položky stavu ``proposal_data``, ``retrieval``,
+            ``request_digest`` a ``history_summary``
     """
-    print("Začínám generovat nabídku...")
-    
-    # Vytvoření LLM
-    llm = ChatOpenAI(
-        model=config.model_name,
-        temperature=0.2,
-        openai_api_key=config.openai_api_key
-    )
+    # Sdílená instance LLM
+    llm = get_chat_model(temperature=0.2)
     
     # Získání relevantního kontextu
-    context = similarity_search(state["client_request"], k=5)
-    context_text = "\n\n---\n\n".join([doc.page_content for doc in context]) if context else "Nebyly nalezeny žádné relevantní dokumenty."
+    context_text, retrieval = get_context_text(state, Step.GENERATE_PROPOSAL, 5, config.context_budget_generate)
+    request_text, request_digest = get_request_text(state)
+    
+    # Historie konverzace: shrnutí starších zpráv a poslední zprávy doslovně
+    history, history_summary = build_history(state)
     
     # Vytvoření zpráv pro prompt
     system_message = SystemMessage(content="""
@@ -298,68 +513,100 @@ def generate_proposal(state: ProposalState) -> ProposalState:
     
     human_message = HumanMessage(content=f"""
     Poptávka klienta:
-    {state["client_request"]}
+    {request_text}
     
     Název klienta: {state["client_name"]}
     
     Shromážděné informace:
-    {json.dumps(state.get("collected_data", {}), ensure_ascii=False, indent=2)}
+    {json.dumps(state.get("collected_data", {}), ensure_ascii=False, separators=(",", ":"))}
     
     Historie konverzace:
-    {json.dumps(state.get("chat_history", [])[-10:], ensure_ascii=False, indent=2)}
+    {history}
     
     Relevantní kontext z předchozích nabídek:
     {context_text}
     """)
     
-    # Generování dat
-    print("Generuji data pro nabídku...")
-    response = llm.invoke([system_message, human_message])
-    print(f"Odpověď od LLM: {response.content[:500]}...")  # Zobrazíme jen prvních 500 znaků
+    # Odpověď se parsuje průběžně a každá dokončená sekce se hned předá dál
+    sections = JsonObjectStream()
     
-    # Parsování JSON odpovědi
-    try:
-        # Pokusíme se najít JSON v odpovědi (může být obklopen dalším textem)
-        import re
-        json_match = re.search(r'({[\s\S]*})', response.content)
-        if json_match:
-            json_str = json_match.group(1)
-            print(f"Nalezen JSON v odpovědi: {json_str[:200]}...")  # Zobrazíme jen prvních 200 znaků
-            proposal_data = json.loads(json_str)
-        else:
-            print("JSON nebyl nalezen v odpovědi, zkouším parsovat celou odpověď")
-            proposal_data = json.loads(response.content)
-        
-        # Kontrola, zda obsahuje všechny požadované klíče
-        required_keys = ["client_name", "introduction", "solution_description", "scope_of_work", "timeline", "pricing", "contact_info"]
-        missing_keys = [key for key in required_keys if key not in proposal_data]
-        
-        if missing_keys:
-            print(f"Chybí klíče v datech: {missing_keys}")
-            # Doplníme chybějící klíče
-            for key in missing_keys:
-                if key == "client_name":
-                    proposal_data[key] = state["client_name"]
-                else:
-                    proposal_data[key] = f"Chybí informace pro {key}"
-    except Exception as e:
-        print(f"Chyba při parsování JSON: {e}")
-        # Pokud se nepodařilo parsovat JSON, použijeme celou odpověď jako text
-        proposal_data = {
-            "client_name": state["client_name"],
-            "introduction": "Úvod nabídky",
-            "solution_description": response.content,
-            "scope_of_work": "Rozsah prací",
-            "timeline": "Harmonogram implementace",
-            "pricing": "Cenová kalkulace",
-            "contact_info": "Kontaktní informace"
-        }
+    def on_token(token: str) -> None:
+        for key, value in sections.feed(token):
+            if on_section:
+                on_section(key, value)
+    
+    with token_stream(on_token):
+        response = invoke_llm(llm, [system_message, human_message], stream=True)
     
-    print(f"Vygenerovaná data pro nabídku: {json.dumps(proposal_data, ensure_ascii=False)[:500]}...")  # Zobrazíme jen prvních 500 znaků
+    # Parsování JSON odpovědi (téměř validní JSON se opraví lokálně) a kontrola
+    # proti schématu; chybějící sekce se dogenerují samostatně
+    proposal_data = parse_proposal_response(response.content, sections.data)
+    proposal_data = complete_proposal_data(
+        proposal_data, state["client_name"], request_text, state.get("collected_data"), on_section=on_section
+    )
+    
+    return {
+        "proposal_data": proposal_data,
+        "retrieval": retrieval,
+        "request_digest": request_digest,
+        "history_summary": history_summary
+    }
+
+# Návrhy nabídky generované na pozadí během sběru informací (SPECULATIVE_DRAFT)
+_speculative_drafts = SpeculativeDrafts(generate_proposal_fields)
+
+# Funkce pro generování nabídky
+def generate_proposal(state: ProposalState) -> ProposalState:
+    """
+    Generuje data pro nabídku.
+    
+    Pokud pro aktuální data existuje návrh vygenerovaný na pozadí,
+    použije se místo nového generování.
+    
+    Args:
+        state: Aktuální stav
+        
+    Returns:
+        ProposalState: Aktualizovaný stav
+    """
+    print("Začínám generovat nabídku...")
+    
+    # Každá dokončená sekce se hned předá rozhraní (on_section) a zapíše
+    # do rozpracovaného dokumentu
+    outer_stream = get_token_stream()
+    session_id = state.get("session_id")
+    builder = None
+    if session_id:
+        _document_builders.pop(session_id, None)
+    
+    def publish(key: str, value: Any) -> None:
+        nonlocal builder
+        print(f"Dokončena sekce nabídky: {key}")
+        if outer_stream is not None:
+            outer_stream.on_section(key, value)
+        if session_id:
+            if builder is None:
+                builder = ProposalDocumentBuilder()
+            builder.add_section(key, value)
+    
+    fields = _speculative_drafts.take(state)
+    if fields is not None:
+        # Shrnutí historie v návrhu je starší než shrnutí v aktuálním stavu
+        fields = {**fields, "history_summary": state.get("history_summary")}
+        for key, value in fields["proposal_data"].items():
+            publish(key, value)
+    else:
+        print("Generuji data pro nabídku...")
+        fields = generate_proposal_fields(state, on_section=publish)
+    
+    if builder is not None:
+        _document_builders[session_id] = builder
+    
+    print(f"Vygenerovaná data pro nabídku: {json.dumps(fields['proposal_data'], ensure_ascii=False)[:500]}...")  # Zobrazíme jen prvních 500 znaků
     
     # Aktualizace stavu
     new_state = state.copy()
-    new_state["proposal_data"] = proposal_data
+    new_state.update(fields)
     new_state["current_step"] = Step.CREATE_DOCUMENT
     new_state["chat_history"] = state.get("chat_history", []) + [
         {"role": "assistant", "content": "Nabídka byla vygenerována. Nyní vytvářím dokument..."}
@@ -405,15 +652,18 @@ def create_document(state: ProposalState) -> ProposalState:
     # Vytvoření dokumentu
     print(f"Vytvářím dokument s daty: {json.dumps(state['proposal_data'], ensure_ascii=False)[:200]}...")  # Zobrazíme jen prvních 200 znaků
     try:
-        from app.utils.docx_generator import create_proposal_document
-        
         # Kontrola, zda všechny hodnoty v proposal_data jsou řetězce
         proposal_data = state["proposal_data"].copy()
         for key, value in proposal_data.items():
             if not isinstance(value, str):
-                proposal_data[key] = str(value)
+                proposal_data[key] = section_text(value)
         
-        document_path = create_proposal_document(proposal_data)
+        # Dokument rozpracovaný během generování se jen dokončí
+        builder = _document_builders.pop(state.get("session_id") or "", None)
+        if builder is not None:
+            document_path = builder.finish(proposal_data, output_path=state.get("output_path"))
+        else:
+            document_path = create_proposal_document(proposal_data, output_path=state.get("output_path"))
         print(f"Dokument byl vytvořen na cestě: {document_path}")
         
         # Kontrola, zda byl dokument skutečně vytvořen
@@ -428,7 +678,7 @@ def create_document(state: ProposalState) -> ProposalState:
             os.makedirs(os.path.dirname(document_path), exist_ok=True)
             
             # Zkusíme znovu vytvořit dokument
-            document_path = create_proposal_document(proposal_data)
+            document_path = create_proposal_document(proposal_data, output_path=state.get("output_path"))
             print(f"Druhý pokus o vytvoření dokumentu: {document_path}")
             
             if not os.path.exists(document_path):
@@ -453,107 +703,118 @@ def create_document(state: ProposalState) -> ProposalState:
         ]
         return new_state
 
-# Funkce pro rozhodnutí o dalším kroku
-def decide_next_step(state: ProposalState) -> str:
+# Funkce pro zpracování zpětné vazby k hotové nabídce
+def human_feedback(state: ProposalState) -> ProposalState:
     """
-    Rozhoduje o dalším kroku na základě aktuálního stavu.
+    Upraví hotovou nabídku podle zpětné vazby uživatele.
+    
+    Přepíšou se jen sekce, kterých se požadavek týká, a v dokumentu se
+    přepíše jen jejich text. Pokud nabídka ještě nevznikla (např. po chybě
+    při generování), zpráva se zpracuje při sběru informací; žádost
+    o vytvoření nabídky ji vygeneruje znovu celou.
     
     Args:
         state: Aktuální stav
         
     Returns:
-        str: Další krok
+        ProposalState: Aktualizovaný stav
     """
-    current_step = state.get("current_step", Step.ANALYZE_REQUEST)
-    step_counter = state.get("step_counter", {})
+    new_state = state.copy()
+    chat_history = state.get("chat_history", [])
+    if not chat_history or chat_history[-1]["role"] != "user":
+        return new_state
     
-    print(f"Rozhoduji o dalším kroku. Aktuální krok: {current_step}, počítadla: {step_counter}")
+    proposal_data = state.get("proposal_data")
+    if not proposal_data:
+        new_state["current_step"] = Step.GATHER_INFORMATION
+        return new_state
     
-    # Kontrola počtu opakování - prevence nekonečné rekurze
-    for step, count in step_counter.items():
-        if count > 20:  # Maximální počet opakování jednoho kroku
-            print(f"Překročen maximální počet opakování kroku {step}, přecházím na END")
-            return Step.END
-    
-    # Pokud jsme ve fázi sběru informací a máme poslední zprávu od uživatele
-    if current_step == Step.GATHER_INFORMATION:
-        chat_history = state.get("chat_history", [])
-        
-        # Pokud nemáme historii nebo poslední zpráva není od uživatele, zůstáváme ve stejném kroku
-        if not chat_history or chat_history[-1]["role"] != "user":
-            print("Poslední zpráva není od uživatele, zůstáváme ve fázi sběru informací")
-            return Step.GATHER_INFORMATION
-        
-        # Kontrola, zda uživatel chce přejít k vytvoření nabídky
-        last_message = chat_history[-1]["content"].lower().strip()
-        print(f"Poslední zpráva od uživatele: '{last_message}'")
-        
-        # Přímá kontrola na přesnou shodu s příkazem
-        if last_message == "vytvoř nabídku":
-            print("Přesná shoda s příkazem 'vytvoř nabídku', přecházím na GENERATE_PROPOSAL")
-            return Step.GENERATE_PROPOSAL
-        
-        trigger_phrases = [
-            "vytvoř nabídku", "generuj nabídku", "vytvor nabidku", 
-            "vygeneruj nabídku", "udělej nabídku", "připrav nabídku",
-            "pokračuj", "další krok", "další", "hotovo", "dokončit",
-            "ano", "souhlasím", "ok", "dobře", "v pořádku"
+    # Žádost o novou nabídku (např. po chybě při vytváření dokumentu) vygeneruje nabídku znovu
+    intent = state.get("intent") or classify_intent(chat_history[-1]["content"])
+    if intent["intent"] == GENERATE:
+        print(f"Uživatel požádal o nové vygenerování nabídky: {intent['matched']}")
+        new_state["intent"] = None
+        new_state["current_step"] = Step.GENERATE_PROPOSAL
+        return new_state
+    
+    # Aktualizace počítadla kroků
+    step_counter = new_state.get("step_counter", {})
+    step_counter[Step.HUMAN_FEEDBACK] = step_counter.get(Step.HUMAN_FEEDBACK, 0) + 1
+    new_state["step_counter"] = step_counter
+    new_state["intent"] = None
+    
+    feedback = chat_history[-1]["content"]
+    sections = affected_sections(feedback, proposal_data)
+    if not sections:
+        new_state["chat_history"] = chat_history + [
+            {"role": "assistant", "content": "Nepoznal jsem, kterou část nabídky mám upravit. Napište prosím, čeho se změna týká (např. harmonogram, cena, rozsah prací)."}
         ]
-        
-        # Přímé porovnání s trigger_phrases
-        for phrase in trigger_phrases:
-            if phrase in last_message:
-                print(f"Nalezena trigger fráze: '{phrase}', přecházím na GENERATE_PROPOSAL")
-                return Step.GENERATE_PROPOSAL
-        
-        # Kontrola jednoduchých příkazů
-        simple_commands = ["vytvoř", "generuj", "vytvor", "vygeneruj", "udělej", "připrav"]
-        for cmd in simple_commands:
-            if cmd in last_message and ("nabídku" in last_message or "nabidku" in last_message):
-                print(f"Nalezen příkaz: '{cmd}' + 'nabídku', přecházím na GENERATE_PROPOSAL")
-                return Step.GENERATE_PROPOSAL
-        
-        # Kontrola počtu otázek - po 5 otázkách automaticky přejdeme k vytvoření nabídky
-        question_count = step_counter.get(Step.GATHER_INFORMATION, 0)
-        if question_count >= 5:
-            print(f"Dosažen maximální počet otázek ({question_count}), přecházím na GENERATE_PROPOSAL")
-            return Step.GENERATE_PROPOSAL
-        
-        # Jinak zůstáváme ve fázi sběru informací
-        return Step.GATHER_INFORMATION
-    
-    # Pokud jsme ve fázi generování nabídky, přejdeme k vytvoření dokumentu
-    elif current_step == Step.GENERATE_PROPOSAL:
-        print("Jsme ve fázi generování nabídky, přecházím k vytvoření dokumentu")
-        return Step.CREATE_DOCUMENT
-    
-    # Pokud jsme ve fázi vytváření dokumentu, přejdeme k interakci s uživatelem
-    elif current_step == Step.CREATE_DOCUMENT:
-        print("Jsme ve fázi vytváření dokumentu, přecházím k interakci s uživatelem")
-        return Step.HUMAN_FEEDBACK
-    
-    # Pokud jsme ve fázi analýzy poptávky, přejdeme ke sběru informací
-    elif current_step == Step.ANALYZE_REQUEST:
-        print("Jsme ve fázi analýzy poptávky, přecházím ke sběru informací")
-        return Step.GATHER_INFORMATION
-    
-    # Pokud jsme ve fázi interakce s uživatelem, zůstáváme v ní
-    elif current_step == Step.HUMAN_FEEDBACK:
-        print("Jsme ve fázi interakce s uživatelem, zůstáváme v ní")
-        return Step.HUMAN_FEEDBACK
-    
-    # Pokud jsme v neznámém stavu, přejdeme k interakci s uživatelem
-    else:
-        print(f"Neznámý stav: {current_step}, přecházím k interakci s uživatelem")
-        return Step.HUMAN_FEEDBACK
+        return new_state
+    
+    titles = ", ".join(SECTION_BY_KEY[key][1] for key in sections)
+    print(f"Upravuji sekce nabídky: {titles}")
+    request_text, request_digest = get_request_text(state)
+    revised = revise_proposal_data(
+        proposal_data, sections, feedback, state["client_name"], request_text, state.get("collected_data")
+    )
+    changed = [key for key in sections if revised.get(key) != proposal_data.get(key)]
+    if not changed:
+        new_state["chat_history"] = chat_history + [
+            {"role": "assistant", "content": f"Sekce {titles} se nepodařilo upravit. Zkuste prosím požadavek zopakovat."}
+        ]
+        return new_state
+    
+    # V dokumentu se přepíše jen text upravených sekcí
+    document_path = update_proposal_document(
+        state.get("document_path"), revised, changed, output_path=state.get("output_path")
+    )
+    print(f"Upraveno {len(changed)} z {len(SECTION_BY_KEY)} sekcí, dokument uložen na: {document_path}")
+    
+    new_state["request_digest"] = request_digest
+    new_state["proposal_data"] = revised
+    new_state["document_path"] = document_path
+    new_state["chat_history"] = chat_history + [
+        {"role": "assistant", "content": f"Upravil jsem sekce {', '.join(SECTION_BY_KEY[key][1] for key in changed)}. Upravený dokument je uložen na: {document_path}."}
+    ]
+    return new_state
+
+# Přechody (dokončený uzel, další krok), po kterých graf pokračuje bez čekání
+# na uživatele. Po ostatních přechodech se běh zastaví a čeká na vstup.
+AUTO_TRANSITIONS = {
+    (Step.GATHER_INFORMATION, Step.GENERATE_PROPOSAL),
+    (Step.GENERATE_PROPOSAL, Step.CREATE_DOCUMENT),
+    (Step.CREATE_DOCUMENT, Step.GENERATE_PROPOSAL),
+    (Step.HUMAN_FEEDBACK, Step.GATHER_INFORMATION),
+    (Step.HUMAN_FEEDBACK, Step.GENERATE_PROPOSAL),
+}
 
 # Jednoduchá implementace grafu bez závislosti na LangGraph
 class SimpleStateGraph:
-    """Jednoduchá implementace grafu stavů bez závislosti na LangGraph."""
+    """
+    Jednoduchý executor grafu stavů bez závislosti na LangGraph.
+    
+    Uzly se spouštějí ve smyčce. Každý uzel nastaví ``current_step`` na krok,
+    který po něm má následovat, a tabulka přechodů rozhodne, zda se pokračuje
+    hned, nebo se čeká na vstup uživatele. Po každém uzlu se stav uloží do
+    úložiště checkpointů a zaznamená se doba běhu uzlu.
+    """
     
-    def __init__(self):
+    def __init__(self, checkpointer=None, max_steps: Optional[int] = None, verbose: bool = False):
+        """
+        Vytvoří graf.
+        
+        Args:
+            checkpointer: Úložiště checkpointů (``CheckpointStore``), volitelné
+            max_steps: Maximální počet uzlů v jednom běhu (výchozí GRAPH_MAX_STEPS)
+            verbose: Vypisovat průběh běhu
+        """
         self.nodes = {}
         self.entry_point = None
+        self.transitions = set(AUTO_TRANSITIONS)
+        self.checkpointer = checkpointer
+        self.max_steps = max_steps or config.graph_max_steps
+        self.verbose = verbose
+        self.last_timings: List[Tuple[str, float]] = []
     
     def add_node(self, name, function):
         """Přidá uzel do grafu."""
@@ -563,132 +824,124 @@ class SimpleStateGraph:
         """Nastaví počáteční uzel."""
         self.entry_point = name
     
-    def invoke(self, state):
-        """Spustí graf s daným stavem."""
-        current_step = state.get("current_step", self.entry_point)
-        print(f"Aktuální krok: {current_step}")
+    def add_transition(self, source, target):
+        """Přidá přechod, po kterém graf pokračuje bez čekání na uživatele."""
+        self.transitions.add((source, target))
+    
+    def _log(self, message: str):
+        """Vypíše zprávu v podrobném režimu."""
+        if self.verbose:
+            print(message)
+    
+    def _checkpoint(self, node: str, state):
+        """Uloží stav po dokončení uzlu (node je název kroku)."""
+        if self.checkpointer is None or not state.get("session_id"):
+            return
+        try:
+            self.checkpointer.put(state["session_id"], node, state)
+        except Exception as e:
+            print(f"Chyba při ukládání checkpointu: {e}")
+    
+    def invoke(self, state, on_token=None):
+        """
+        Spustí graf s daným stavem.
         
-        # Kontrola počtu rekurzivních volání
-        recursion_count = state.get("_recursion_count", 0) + 1
-        state["_recursion_count"] = recursion_count
+        Args:
+            state: Stav grafu
+            on_token: Příjemce průběžně generovaného textu odpovědí asistenta
+                (``TokenStream`` nebo funkce ``on_token(token)``), volitelné
+                
+        Returns:
+            Aktualizovaný stav
+        """
+        if on_token is not None:
+            with token_stream(on_token):
+                return self.invoke(state)
         
-        # Pokud je krok END, vrátíme stav beze změny
-        if current_step == Step.END or current_step == "end":
-            print("Dosažen koncový stav, ukončuji.")
-            state["current_step"] = "end"
-            return state
+        state = dict(state)
+        timings: List[Tuple[str, float]] = []
+        self.last_timings = timings
         
-        # Spustíme funkci pro aktuální krok
-        if current_step in self.nodes:
+        for _ in range(self.max_steps):
+            current_step = state.get("current_step") or self.entry_point
+            step_name = getattr(current_step, "value", current_step)
+            
+            if current_step == Step.END or current_step == "end":
+                self._log("Dosažen koncový stav, ukončuji.")
+                state["current_step"] = "end"
+                return state
+            
+            node = self.nodes.get(current_step)
+            if node is None:
+                print(f"Neznámý krok: {step_name}, přecházím na HUMAN_FEEDBACK")
+                state["current_step"] = Step.HUMAN_FEEDBACK
+                state["chat_history"] = state.get("chat_history", []) + [
+                    {"role": "assistant", "content": f"Neznámý krok {step_name}. Můžete mi poskytnout další informace?"}
+                ]
+                return state
+            
+            self._log(f"Spouštím uzel: {step_name}")
+            start = time.perf_counter()
             try:
-                print(f"Spouštím funkci pro krok: {current_step}")
-                
-                # Kontrola, zda poslední zpráva od uživatele obsahuje příkaz k vytvoření nabídky
-                if current_step == Step.GATHER_INFORMATION:
-                    chat_history = state.get("chat_history", [])
-                    if chat_history and chat_history[-1]["role"] == "user":
-                        last_message = chat_history[-1]["content"].lower().strip()
-                        if "vytvoř nabídku" in last_message or "vytvor nabidku" in last_message:
-                            print("Detekován příkaz k vytvoření nabídky, přecházím na GENERATE_PROPOSAL")
-                            state["current_step"] = Step.GENERATE_PROPOSAL
-                            state["chat_history"] = state.get("chat_history", []) + [
-                                {"role": "assistant", "content": "Super, mám dostatek informací k vytvoření nabídky na implementaci produktu MidPoint. Pokračuji v procesu tvorby nabídky."}
-                            ]
-                            # Spustíme funkci pro generování nabídky
-                            state = self.nodes[Step.GENERATE_PROPOSAL](state)
-                            print(f"Funkce pro krok {Step.GENERATE_PROPOSAL} dokončena.")
-                            print(f"Nový stav po generování nabídky: current_step={state['current_step']}")
-                            
-                            # Pokud se stav změnil na CREATE_DOCUMENT, spustíme funkci pro vytvoření dokumentu
-                            if state["current_step"] == Step.CREATE_DOCUMENT:
-                                print("Stav změněn na CREATE_DOCUMENT, pokračuji ve vytváření dokumentu")
-                                state = self.nodes[Step.CREATE_DOCUMENT](state)
-                                print(f"Funkce pro krok {Step.CREATE_DOCUMENT} dokončena.")
-                                print(f"Nový stav po vytvoření dokumentu: current_step={state['current_step']}")
-                            
-                            return state
-                
-                # Spuštění funkce pro aktuální krok
-                state = self.nodes[current_step](state)
-                print(f"Funkce pro krok {current_step} dokončena.")
-                print(f"Nový stav: current_step={state['current_step']}")
-                
-                # Kontrola, zda se stav změnil na GENERATE_PROPOSAL
-                if state["current_step"] == Step.GENERATE_PROPOSAL and current_step == Step.GATHER_INFORMATION:
-                    print("Stav změněn na GENERATE_PROPOSAL, pokračuji v generování nabídky")
-                    state = self.nodes[Step.GENERATE_PROPOSAL](state)
-                    print(f"Funkce pro krok {Step.GENERATE_PROPOSAL} dokončena.")
-                    print(f"Nový stav po generování nabídky: current_step={state['current_step']}")
-                    
-                    # Pokud se stav změnil na CREATE_DOCUMENT, spustíme funkci pro vytvoření dokumentu
-                    if state["current_step"] == Step.CREATE_DOCUMENT:
-                        print("Stav změněn na CREATE_DOCUMENT, pokračuji ve vytváření dokumentu")
-                        state = self.nodes[Step.CREATE_DOCUMENT](state)
-                        print(f"Funkce pro krok {Step.CREATE_DOCUMENT} dokončena.")
-                        print(f"Nový stav po vytvoření dokumentu: current_step={state['current_step']}")
-                    
-                    return state
-                
-                # Kontrola, zda se stav změnil na CREATE_DOCUMENT
-                if state["current_step"] == Step.CREATE_DOCUMENT and current_step == Step.GENERATE_PROPOSAL:
-                    print("Stav změněn na CREATE_DOCUMENT, pokračuji ve vytváření dokumentu")
-                    state = self.nodes[Step.CREATE_DOCUMENT](state)
-                    print(f"Funkce pro krok {Step.CREATE_DOCUMENT} dokončena.")
-                    print(f"Nový stav po vytvoření dokumentu: current_step={state['current_step']}")
-                    return state
-                
+                state = node(state)
             except Exception as e:
-                print(f"Chyba při spuštění funkce pro krok {current_step}: {e}")
-                import traceback
-                traceback.print_exc()
-                # V případě chyby přejdeme na další krok
-                next_step = decide_next_step(state)
-                if next_step == current_step:
-                    # Pokud by další krok byl stejný, přejdeme na HUMAN_FEEDBACK, abychom zabránili zacyklení
-                    state["current_step"] = Step.HUMAN_FEEDBACK
-                    state["chat_history"] = state.get("chat_history", []) + [
-                        {"role": "assistant", "content": f"Při zpracování kroku {current_step} došlo k chybě: {e}. Můžete mi poskytnout další informace?"}
-                    ]
-                    return state
-                else:
-                    state["current_step"] = next_step
-                    return self.invoke(state)
-        else:
-            print(f"Neznámý krok: {current_step}, přecházím na HUMAN_FEEDBACK")
-            state["current_step"] = Step.HUMAN_FEEDBACK
-            state["chat_history"] = state.get("chat_history", []) + [
-                {"role": "assistant", "content": f"Neznámý krok {current_step}. Můžete mi poskytnout další informace?"}
-            ]
-            return state
-        
-        # Rozhodneme o dalším kroku
-        next_step = decide_next_step(state)
-        print(f"Další krok: {next_step}")
-        
-        # Pokud je další krok END, vrátíme stav
-        if next_step == Step.END or next_step == "end":
-            print("Další krok je END, ukončuji.")
-            state["current_step"] = "end"
-            return state
-        
-        # Pokud je další krok stejný jako aktuální, vrátíme stav
-        if next_step == current_step:
-            print(f"Další krok je stejný jako aktuální ({current_step}), vracím stav.")
-            return state
-        
-        # Kontrola počtu rekurzivních volání
-        if recursion_count > 10:  # Omezení počtu rekurzivních volání
-            print(f"Dosažen maximální počet rekurzivních volání ({recursion_count}), ukončuji.")
-            state["current_step"] = Step.HUMAN_FEEDBACK
-            state["chat_history"] = state.get("chat_history", []) + [
-                {"role": "assistant", "content": "Dosažen maximální počet kroků. Můžete mi poskytnout další informace?"}
-            ]
-            return state
+                print(f"Chyba při spuštění funkce pro krok {step_name}: {e}")
+                if self.verbose:
+                    import traceback
+                    traceback.print_exc()
+                # Po chybě čekáme na uživatele, abychom zabránili zacyklení
+                state = dict(state)
+                state["current_step"] = Step.HUMAN_FEEDBACK
+                state["chat_history"] = state.get("chat_history", []) + [
+                    {"role": "assistant", "content": f"Při zpracování kroku {step_name} došlo k chybě: {e}. Můžete mi poskytnout další informace?"}
+                ]
+                return state
+            finally:
+                elapsed = time.perf_counter() - start
+                timings.append((step_name, elapsed))
+                self._log(f"Uzel {step_name} dokončen za {elapsed:.2f} s")
+            
+            self._checkpoint(step_name, state)
+            
+            next_step = state.get("current_step")
+            if (current_step, next_step) not in self.transitions:
+                self._log(f"Čekám na vstup uživatele (další krok: {getattr(next_step, 'value', next_step)})")
+                return state
+            self._log(f"Přecházím z kroku {step_name} na krok {getattr(next_step, 'value', next_step)}")
+        
+        print(f"Dosažen maximální počet kroků ({self.max_steps}), čekám na uživatele.")
+        state["current_step"] = Step.HUMAN_FEEDBACK
+        state["chat_history"] = state.get("chat_history", []) + [
+            {"role": "assistant", "content": "Dosažen maximální počet kroků. Můžete mi poskytnout další informace?"}
+        ]
+        return state
+    
+    def resume(self, session_id: str, on_token=None):
+        """
+        Naváže na relaci od posledního checkpointu.
+        
+        Pokud byl běh přerušen uprostřed automatických přechodů (např. při
+        vytváření dokumentu), pokračuje od prvního nedokončeného uzlu.
+        Jinak vrátí uložený stav, který čeká na vstup uživatele.
+        
+        Args:
+            session_id: ID relace
+            on_token: Příjemce průběžně generovaného textu (volitelné)
+            
+        Returns:
+            Stav relace, nebo None pokud pro relaci neexistuje checkpoint
+        """
+        if self.checkpointer is None:
+            return None
+        checkpoint = self.checkpointer.get_latest(session_id)
+        if checkpoint is None:
+            return None
         
-        # Jinak nastavíme další krok a spustíme znovu
-        print(f"Přecházím z kroku {current_step} na krok {next_step}")
-        state["current_step"] = next_step
-        return self.invoke(state)
+        state = checkpoint["state"]
+        if (checkpoint["node"], state.get("current_step")) in self.transitions:
+            print(f"Navazuji na přerušený běh po uzlu {checkpoint['node']}")
+            return self.invoke(state, on_token=on_token)
+        return state
 
 # Vytvoření grafu
 def create_proposal_graph():
@@ -698,15 +951,15 @@ def create_proposal_graph():
     Returns:
         SimpleStateGraph: Graf pro generování nabídek
     """
-    # Vytvoření grafu
-    workflow = SimpleStateGraph()
+    # Vytvoření grafu se stavem ukládaným po každém uzlu
+    workflow = SimpleStateGraph(checkpointer=get_checkpoint_store())
     
     # Definice uzlů
     workflow.add_node(Step.ANALYZE_REQUEST, analyze_request)
     workflow.add_node(Step.GATHER_INFORMATION, gather_information)
     workflow.add_node(Step.GENERATE_PROPOSAL, generate_proposal)
     workflow.add_node(Step.CREATE_DOCUMENT, create_document)
-    workflow.add_node(Step.HUMAN_FEEDBACK, lambda x: x)  # Pouze předání stavu
+    workflow.add_node(Step.HUMAN_FEEDBACK, human_feedback)
     
     # Nastavení počátečního uzlu
     workflow.set_entry_point(Step.ANALYZE_REQUEST)
@@ -714,36 +967,82 @@ def create_proposal_graph():
     return workflow
 
 # Funkce pro inicializaci stavu
-def init_proposal_state(client_request: str, client_name: str) -> ProposalState:
+def init_proposal_state(client_request: str, client_name: str, session_id: Optional[str] = None) -> ProposalState:
     """
     Inicializuje stav pro generování nabídky.
     
     Args:
         client_request: Poptávka klienta
         client_name: Název klienta
+        session_id: ID relace (výchozí nově vygenerované)
         
     Returns:
         ProposalState: Inicializovaný stav
     """
     return {
+        "session_id": session_id or uuid.uuid4().hex[:12],
         "client_request": client_request,
         "client_name": client_name,
         "current_step": Step.ANALYZE_REQUEST,
         "chat_history": [],
+        "intent": None,
         "collected_data": {},
+        "retrieval": None,
+        "request_digest": None,
+        "history_summary": None,
         "proposal_data": None,
         "document_path": None,
+        "output_path": None,
         "step_counter": {}  # Počítadlo kroků pro prevenci nekonečné rekurze
     }
 
+# Funkce pro obnovení relace
+def restore_session(graph: SimpleStateGraph, session_id: str, store, on_token=None) -> Optional[ProposalState]:
+    """
+    Obnoví relaci z úložiště relací, případně z checkpointů grafu.
+    
+    Relace se ukládá po každém kroku konverzace, checkpoint po každém uzlu.
+    Pokud je checkpoint novější (proces spadl uprostřed běhu grafu), naváže
+    se od posledního dokončeného uzlu. Pokud uložená relace končí
+    nezpracovanou zprávou uživatele, zpracuje se.
+    
+    Args:
+        graph: Graf pro generování nabídek
+        session_id: ID relace
+        store: Úložiště relací (``SessionStore``)
+        on_token: Příjemce průběžně generovaného textu (volitelné)
+        
+    Returns:
+        Optional[ProposalState]: Obnovený stav, nebo None pokud relace neexistuje
+    """
+    record = store.load(session_id)
+    checkpoint = graph.checkpointer.get_latest(session_id) if graph.checkpointer else None
+    
+    if checkpoint and (record is None or checkpoint["created"] > record["updated"]):
+        return graph.resume(session_id, on_token=on_token)
+    if record is None:
+        return None
+    
+    state = record["state"]
+    chat_history = state.get("chat_history") or []
+    if chat_history and chat_history[-1]["role"] == "user":
+        print("Zpracovávám poslední nezpracovanou zprávu relace")
+        return graph.invoke(state, on_token=on_token)
+    return state
+
 # Funkce pro zpracování vstupu uživatele
-def process_user_input(state: ProposalState, user_input: str) -> ProposalState:
+def process_user_input(state: ProposalState, user_input: str,
+                       intent: Optional[Dict[str, Any]] = None) -> ProposalState:
     """
     Zpracovává vstup uživatele.
     
+    Záměr zprávy se rozpozná jednou zde a uloží do stavu, uzly grafu
+    jej jen čtou.
+    
     Args:
         state: Aktuální stav
         user_input: Vstup uživatele
+        intent: Již rozpoznaný záměr zprávy (výchozí ``classify_intent``)
         
     Returns:
         ProposalState: Aktualizovaný stav
@@ -753,5 +1052,6 @@ def process_user_input(state: ProposalState, user_input: str) -> ProposalState:
     new_state["chat_history"] = state.get("chat_history", []) + [
         {"role": "user", "content": user_input}
     ]
+    new_state["intent"] = intent or classify_intent(user_input)
     
     return new_state 
\ No newline at end of file
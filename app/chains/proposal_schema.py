@@ -0,0 +1,283 @@
+"""
+Schéma dat nabídky, oprava odpovědi a dogenerování chybějících sekcí.
+
+Odpověď ``generate_proposal`` a ``generate_proposal_data`` se načte přes
+``repair_json`` (lokální oprava téměř validního JSON bez dalšího volání
+LLM) a zkontroluje proti ``PROPOSAL_SCHEMA``. Sekce, která chybí nebo je
+prázdná, se dogeneruje samostatně krátkým cíleným promptem; zbytek nabídky
+se negeneruje znovu. Podíl opravených odpovědí a dogenerovaných sekcí
+vrací ``get_generation_stats``.
+"""
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.utils.config import get_config
+from app.utils.docx_generator import section_text
+from app.utils.json_repair import repair_json
+from app.utils.llm_clients import get_chat_model, invoke_llm
+from app.utils.tokens import truncate_tokens
+
+config = get_config()
+
+# Klíče dat nabídky a jejich popis (stejný jako v promptech generování)
+PROPOSAL_SCHEMA = {
+    "client_name": "Název klienta",
+    "introduction": "Úvod nabídky (1-2 odstavce)",
+    "solution_description": "Popis řešení MidPoint (3-5 odstavců)",
+    "scope_of_work": "Rozsah prací (seznam položek s popisem)",
+    "timeline": "Harmonogram implementace (seznam fází s časovým odhadem)",
+    "pricing": "Cenová kalkulace (tabulka položek s cenami)",
+    "contact_info": "Kontaktní informace"
+}
+
+# Text, kterým se dřív doplňovaly chybějící sekce (počítá se jako prázdná sekce)
+MISSING_PLACEHOLDER = "Chybí informace pro"
+
+# Rozpočet tokenů pro ukázku ostatních sekcí v promptu dogenerování
+OTHER_SECTION_TOKENS = 150
+
+class GenerationStats:
+    """Počítadla oprav odpovědí a dogenerovaných sekcí za dobu běhu procesu."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.repaired = 0
+        self.unparsed = 0
+        self.regenerated_responses = 0
+        self.regenerated_sections = 0
+        self.failed_sections = 0
+        self.fixes: Dict[str, int] = {}
+
+    def record_parse(self, fixes: Optional[List[str]]) -> None:
+        """
+        Zaznamená načtení jedné odpovědi.
+
+        Args:
+            fixes: Provedené opravy (prázdný seznam = validní JSON, None = nešlo opravit)
+        """
+        with self._lock:
+            self.responses += 1
+            if fixes is None:
+                self.unparsed += 1
+                return
+            if fixes:
+                self.repaired += 1
+            for fix in fixes:
+                self.fixes[fix] = self.fixes.get(fix, 0) + 1
+
+    def record_regenerated(self, sections: int, failed: int) -> None:
+        """Zaznamená dogenerované sekce jedné odpovědi."""
+        with self._lock:
+            if sections:
+                self.regenerated_responses += 1
+            self.regenerated_sections += sections
+            self.failed_sections += failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vrátí aktuální hodnoty počítadel včetně podílu oprav a dogenerování."""
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "repaired": self.repaired,
+                "unparsed": self.unparsed,
+                "repair_rate": round(self.repaired / self.responses, 3) if self.responses else 0.0,
+                "regenerated_responses": self.regenerated_responses,
+                "regenerated_sections": self.regenerated_sections,
+                "failed_sections": self.failed_sections,
+                "regeneration_rate": round(self.regenerated_responses / self.responses, 3) if self.responses else 0.0,
+                "fixes": dict(self.fixes)
+            }
+
+generation_stats = GenerationStats()
+
+def get_generation_stats() -> Dict[str, Any]:
+    """
+    Vrátí statistiku oprav a dogenerování za dobu běhu procesu.
+
+    Returns:
+        Dict[str, Any]: Počet odpovědí, opravených a nenačtených odpovědí, odpovědí
+            s dogenerovanými sekcemi, počty sekcí, podíly a počty oprav podle druhu
+    """
+    return generation_stats.snapshot()
+
+def parse_proposal_response(content: str, partial: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Načte data nabídky z odpovědi LLM, případně po lokální opravě JSON.
+
+    Args:
+        content: Odpověď modelu
+        partial: Sekce dokončené při streamování (použijí se, pokud JSON nejde opravit)
+
+    Returns:
+        Dict[str, Any]: Data nabídky (mohou být neúplná)
+    """
+    try:
+        data, fixes = repair_json(content)
+        if not isinstance(data, dict):
+            raise ValueError("Odpověď není JSON objekt")
+    except ValueError as e:
+        print(f"Chyba při parsování JSON: {e}")
+        generation_stats.record_parse(None)
+        return dict(partial or {})
+
+    generation_stats.record_parse(fixes)
+    if fixes:
+        print(f"JSON odpovědi opraven lokálně: {', '.join(fixes)}")
+    return data
+
+def validate_proposal_data(data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Zkontroluje data nabídky proti schématu.
+
+    Hodnoty, které nejsou text (seznam, slovník), se převedou na text
+    přímo v ``data``.
+
+    Args:
+        data: Data nabídky
+
+    Returns:
+        Dict[str, str]: Chybné klíče a popis problému ("chybí" nebo "prázdná")
+    """
+    problems = {}
+    for key in PROPOSAL_SCHEMA:
+        if key not in data:
+            problems[key] = "chybí"
+            continue
+        text = section_text(data[key])
+        data[key] = text
+        if not text.strip() or text.startswith(MISSING_PLACEHOLDER):
+            problems[key] = "prázdná"
+    return problems
+
+def regenerate_section(
+    key: str,
+    client_name: str,
+    request_text: str,
+    data: Dict[str, Any],
+    collected_data: Optional[Dict[str, Any]] = None,
+    feedback: Optional[str] = None
+) -> str:
+    """
+    Vygeneruje jednu sekci nabídky krátkým cíleným promptem.
+
+    Args:
+        key: Klíč sekce ze schématu
+        client_name: Název klienta
+        request_text: Poptávka klienta (případně její přehled)
+        data: Ostatní sekce nabídky (pro návaznost)
+        collected_data: Shromážděné informace (volitelné)
+        feedback: Požadavek uživatele na úpravu; sekce se pak přepíše
+            ze svého současného textu v ``data`` (volitelné)
+
+    Returns:
+        str: Text sekce
+    """
+    llm = get_chat_model(temperature=0.2, max_tokens=config.section_regenerate_max_tokens)
+    other_sections = "\n".join(
+        f"{name}: {truncate_tokens(section_text(data[name]), OTHER_SECTION_TOKENS)}"
+        for name in PROPOSAL_SCHEMA
+        if name not in (key, "client_name") and data.get(name)
+    )
+    instruction = revision = ""
+    if feedback:
+        instruction = "\n    Uprav současný text sekce podle požadavku na úpravu, ostatní obsah zachovej."
+        revision = f"""Současný text sekce:
+    {section_text(data.get(key))}
+
+    Požadavek na úpravu:
+    {feedback}
+    """
+
+    system_message = SystemMessage(content=f"""
+    Jsi asistent pro psaní obchodních nabídek na implementaci produktu MidPoint.
+    Napiš pouze sekci nabídky: {PROPOSAL_SCHEMA[key]}.
+    Vrať jen text sekce bez nadpisu a bez dalšího vysvětlení.{instruction}
+    """)
+    human_message = HumanMessage(content=f"""
+    Poptávka klienta:
+    {request_text}
+
+    Název klienta: {client_name}
+
+    Shromážděné informace:
+    {json.dumps(collected_data or {}, ensure_ascii=False, separators=(",", ":"))}
+
+    Ostatní sekce nabídky:
+    {other_sections or "Žádné"}
+    """ + revision)
+    return invoke_llm(llm, [system_message, human_message]).content.strip()
+
+def complete_proposal_data(
+    data: Dict[str, Any],
+    client_name: str,
+    request_text: str,
+    collected_data: Optional[Dict[str, Any]] = None,
+    on_section: Optional[Callable[[str, Any], None]] = None
+) -> Dict[str, Any]:
+    """
+    Doplní data nabídky podle schématu.
+
+    Chybějící název klienta se doplní ze vstupu, chybějící nebo prázdné
+    sekce se souběžně dogenerují (REGENERATE_MISSING_SECTIONS). Sekce,
+    kterou se dogenerovat nepodaří, dostane zástupný text.
+
+    Args:
+        data: Data nabídky z ``parse_proposal_response``
+        client_name: Název klienta
+        request_text: Poptávka klienta (případně její přehled)
+        collected_data: Shromážděné informace (volitelné)
+        on_section: Funkce ``on_section(klíč, text)`` volaná pro každou doplněnou sekci
+
+    Returns:
+        Dict[str, Any]: Úplná data nabídky
+    """
+    data = dict(data)
+    problems = validate_proposal_data(data)
+    if "client_name" in problems:
+        data["client_name"] = client_name
+        problems.pop("client_name")
+    if not problems:
+        generation_stats.record_regenerated(0, 0)
+        return data
+
+    print(f"Chybné sekce v datech nabídky: {problems}")
+    results: Dict[str, Optional[str]] = {key: None for key in problems}
+    if config.regenerate_missing_sections:
+        snapshot = dict(data)
+
+        def regenerate(key: str) -> Optional[str]:
+            try:
+                return regenerate_section(key, client_name, request_text, snapshot, collected_data) or None
+            except Exception as e:
+                print(f"Chyba při dogenerování sekce {key}: {e}")
+                return None
+
+        workers = max(1, min(config.section_concurrency, len(problems)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Každé vlákno dostane kopii kontextu (priorita volání, počítadlo tokenů)
+            futures = {
+                key: executor.submit(contextvars.copy_context().run, regenerate, key)
+                for key in problems
+            }
+            results = {key: future.result() for key, future in futures.items()}
+
+    failed = 0
+    for key in PROPOSAL_SCHEMA:
+        if key not in results:
+            continue
+        if results[key] is None:
+            failed += 1
+            data[key] = f"{MISSING_PLACEHOLDER} {key}"
+        else:
+            data[key] = results[key]
+            print(f"Sekce {key} dogenerována")
+        if on_section:
+            on_section(key, data[key])
+    generation_stats.record_regenerated(len(results) - failed, failed)
+    return data
@@ -0,0 +1,221 @@
+"""
+Spekulativní generování návrhu nabídky na pozadí během sběru informací.
+
+Většinu času relace se čeká, až uživatel napíše odpověď. Jakmile
+``collected_data`` obsahuje alespoň SPECULATIVE_MIN_FIELDS vyplněných
+položek, spustí se na pozadí generování dat nabídky se stávajícími daty
+(s nižší prioritou než interaktivní volání). Když uživatel požádá
+o vytvoření nabídky, použije se hotový (nebo dobíhající) návrh, pokud se od
+jeho spuštění podstatně nezměnily vstupy: poptávka, název klienta
+a shromážděná data. Jinak se nabídka vygeneruje znovu.
+
+Návrh, jehož výsledek se nepoužije, je zbytečné volání; po
+SPECULATIVE_MAX_WASTED zbytečných voláních se v relaci další návrhy
+nespouštějí. Návrhy se drží jen v paměti procesu.
+"""
+import contextvars
+import copy
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.config import get_config
+from app.utils.rate_limiter import traffic_priority
+from app.utils.streaming import token_stream
+
+config = get_config()
+
+def draft_fingerprint(state: Dict[str, Any]) -> str:
+    """
+    Vrátí otisk vstupů, na kterých návrh nabídky podstatně závisí.
+
+    Historie konverzace do otisku nepatří; fakta z ní se promítají
+    do shromážděných dat.
+
+    Args:
+        state: Stav grafu
+
+    Returns:
+        str: Hash poptávky, názvu klienta a shromážděných dat
+    """
+    material = {
+        "client_request": state.get("client_request", ""),
+        "client_name": state.get("client_name", ""),
+        "collected_data": state.get("collected_data") or {},
+    }
+    payload = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def filled_fields(collected_data: Optional[Dict[str, Any]]) -> int:
+    """Vrátí počet vyplněných položek shromážděných dat."""
+    return sum(1 for value in (collected_data or {}).values() if value not in (None, "", [], {}))
+
+class SpeculativeStats:
+    """Počítadla spekulativních návrhů za dobu běhu procesu."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.cancelled = 0
+        self.capped = 0
+        self.failed = 0
+        self.saved_seconds = 0.0
+
+    def record(self, counter: str, seconds: float = 0.0) -> None:
+        """Zvýší počítadlo ``counter`` (u použitých návrhů přičte ušetřený čas)."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.saved_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vrátí aktuální hodnoty počítadel včetně podílu použitých návrhů."""
+        with self._lock:
+            finished = self.used + self.wasted
+            return {
+                "started": self.started,
+                "used": self.used,
+                "wasted": self.wasted,
+                "cancelled": self.cancelled,
+                "capped": self.capped,
+                "failed": self.failed,
+                "hit_rate": round(self.used / finished, 3) if finished else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2)
+            }
+
+speculative_stats = SpeculativeStats()
+
+def get_speculative_stats() -> Dict[str, Any]:
+    """
+    Vrátí statistiku spekulativních návrhů za dobu běhu procesu.
+
+    Returns:
+        Dict[str, Any]: Počet spuštěných, použitých, zbytečných, zrušených
+            (před spuštěním) a neúspěšných návrhů, počet návrhů nespuštěných
+            kvůli limitu, podíl použitých návrhů a čas ušetřený čekáním
+    """
+    return speculative_stats.snapshot()
+
+class SpeculativeDrafts:
+    """Návrhy nabídek generované na pozadí podle ID relace."""
+
+    def __init__(self, generate: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """
+        Args:
+            generate: Funkce, která ze stavu vygeneruje položky stavu s daty nabídky
+        """
+        self._generate = generate
+        self._lock = threading.Lock()
+        self._drafts: Dict[str, Dict[str, Any]] = {}
+        self._wasted: Dict[str, int] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _submit(self, state: Dict[str, Any], draft: Dict[str, Any]) -> Future:
+        """Spustí generování návrhu ve vlákně na pozadí; čas dokončení zapíše do ``draft``."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative")
+
+        def run() -> Dict[str, Any]:
+            # Návrh se nestreamuje do rozhraní a ustoupí interaktivním voláním
+            try:
+                with token_stream(None), traffic_priority("batch"):
+                    return self._generate(state)
+            finally:
+                draft["finished"] = time.time()
+
+        return self._executor.submit(contextvars.copy_context().run, run)
+
+    def _discard(self, session_id: str, draft: Dict[str, Any]) -> None:
+        """Zahodí návrh; pokud už běžel, započítá se jako zbytečné volání."""
+        if draft["future"].cancel():
+            speculative_stats.record("cancelled")
+            return
+        speculative_stats.record("wasted")
+        self._wasted[session_id] = self._wasted.get(session_id, 0) + 1
+
+    def maybe_start(self, state: Dict[str, Any]) -> bool:
+        """
+        Spustí návrh na pozadí, pokud je zapnutý a od posledního návrhu se změnila data.
+
+        Args:
+            state: Stav grafu po zpracování odpovědi uživatele
+
+        Returns:
+            bool: True, pokud se spustil nový návrh
+        """
+        session_id = state.get("session_id")
+        if not config.speculative_draft or not session_id:
+            return False
+        if filled_fields(state.get("collected_data")) < config.speculative_min_fields:
+            return False
+
+        fingerprint = draft_fingerprint(state)
+        with self._lock:
+            draft = self._drafts.get(session_id)
+            if draft and draft["fingerprint"] == fingerprint:
+                return False
+            if draft:
+                del self._drafts[session_id]
+                self._discard(session_id, draft)
+            if self._wasted.get(session_id, 0) >= config.speculative_max_wasted:
+                speculative_stats.record("capped")
+                return False
+
+            snapshot = dict(state)
+            snapshot["collected_data"] = copy.deepcopy(state.get("collected_data") or {})
+            draft = {"fingerprint": fingerprint, "started": time.time(), "finished": None}
+            draft["future"] = self._submit(snapshot, draft)
+            self._drafts[session_id] = draft
+        speculative_stats.record("started")
+        print(f"Spuštěn návrh nabídky na pozadí (relace {session_id})")
+        return True
+
+    def take(self, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Vrátí návrh pro relaci, pokud odpovídá aktuálním datům.
+
+        Dobíhající návrh se dočká. Návrh pro jiná data se zahodí.
+
+        Args:
+            state: Stav grafu při přechodu ke generování nabídky
+
+        Returns:
+            Optional[Dict[str, Any]]: Položky stavu s daty nabídky, nebo None
+        """
+        session_id = state.get("session_id")
+        if not session_id:
+            return None
+        with self._lock:
+            draft = self._drafts.pop(session_id, None)
+            if draft is None:
+                return None
+            if draft["fingerprint"] != draft_fingerprint(state):
+                print("Data se od spuštění návrhu nabídky změnila, generuji znovu")
+                self._discard(session_id, draft)
+                return None
+
+        requested = time.time()
+        try:
+            result = draft["future"].result()
+        except Exception as e:
+            print(f"Chyba při generování návrhu nabídky na pozadí: {e}")
+            speculative_stats.record("failed")
+            with self._lock:
+                self._wasted[session_id] = self._wasted.get(session_id, 0) + 1
+            return None
+        # Ušetřený čas: část generování, která proběhla před žádostí o nabídku
+        saved = min(draft["finished"], requested) - draft["started"]
+        speculative_stats.record("used", max(0.0, saved))
+        print(f"Použit návrh nabídky vygenerovaný na pozadí (ušetřeno {max(0.0, saved):.1f} s)")
+        return result
+
+    def discard(self, session_id: str) -> None:
+        """Zahodí návrh relace (např. při ukončení relace)."""
+        with self._lock:
+            draft = self._drafts.pop(session_id, None)
+            if draft:
+                self._discard(session_id, draft)
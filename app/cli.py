@@ -8,15 +8,25 @@ import argparse
 from pathlib import Path
 import json
 from typing import Dict, Any, Optional
+import threading
 import time
 
+from app.chains import intent as intents
 from app.chains.proposal_graph import (
     create_proposal_graph,
     init_proposal_state,
     process_user_input,
+    restore_session,
     Step
 )
+from app.chains.proposal_schema import get_generation_stats
+from app.chains.speculative import get_speculative_stats
 from app.utils.config import get_config
+from app.utils.docx_generator import SECTION_BY_KEY
+from app.utils.llm_clients import get_cache_stats
+from app.utils.rate_limiter import get_rate_limit_stats
+from app.utils.session_store import get_session_store
+from app.utils.streaming import TokenStream
 
 config = get_config()
 
@@ -38,10 +48,168 @@ def print_chat_history(chat_history):
         if message["role"] == "user":
             print(f"\n👤 Vy: {message['content']}")
         else:
-            print(f"\n🤖 Asistent: {message['content']}")
+            label = "Asistent"
+            if message.get("cache"):
+                tag = message["cache"]
+                label += f" (z cache: {tag['cache']}"
+                if "similarity" in tag:
+                    label += f", podobnost {tag['similarity']:.2f}"
+                label += ")"
+            print(f"\n🤖 {label}: {message['content']}")
+
+class StreamPrinter(TokenStream):
+    """Průběžně vypisuje odpověď asistenta a dokončené sekce nabídky do terminálu."""
+    
+    def __init__(self):
+        self.started = threading.Event()
+        self.text = ""
+    
+    def on_start(self):
+        # Ukončení animace načítání před prvním tokenem
+        self.started.set()
+        sys.stdout.write("\r" + " " * 20 + "\r\n🤖 Asistent: ")
+        sys.stdout.flush()
+    
+    def on_token(self, token):
+        self.text += token
+        sys.stdout.write(token)
+        sys.stdout.flush()
+    
+    def on_end(self):
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    
+    def on_section(self, key, value):
+        if key not in SECTION_BY_KEY:
+            return
+        if not self.started.is_set():
+            self.started.set()
+            sys.stdout.write("\r" + " " * 20 + "\r\n📝 Generuji nabídku:\n")
+        sys.stdout.write(f"   ✓ {SECTION_BY_KEY[key][1]}\n")
+        sys.stdout.flush()
+
+def run_graph_in_thread(run, debug_mode, printer=None):
+    """
+    Spustí běh grafu v samostatném vlákně a do prvního streamovaného tokenu zobrazuje animaci.
+    
+    Args:
+        run: Funkce bez argumentů, která vrací nový stav
+        debug_mode: V debug režimu se animace nezobrazuje
+        printer: Příjemce streamovaných tokenů (volitelné)
+        
+    Returns:
+        Nový stav grafu
+    """
+    animation = "|/-\\"
+    idx = 0
+    result = {"state": None, "error": None}
+    
+    def target():
+        try:
+            result["state"] = run()
+        except Exception as e:
+            result["error"] = e
+    
+    thread = threading.Thread(target=target)
+    thread.start()
+    
+    # Animace během zpracování (do prvního streamovaného tokenu)
+    while thread.is_alive():
+        if not debug_mode and not (printer and printer.started.is_set()):
+            sys.stdout.write("\rZpracovávám " + animation[idx % len(animation)])
+            sys.stdout.flush()
+            idx += 1
+        time.sleep(0.1)
+    
+    thread.join()
+    
+    # Kontrola výsledku
+    if result["error"]:
+        raise result["error"]
+    return result["state"]
+
+def save_session(store, state):
+    """Uloží stav relace; chyba při ukládání konverzaci nepřeruší."""
+    try:
+        store.save(state["session_id"], state, kind="cli", title=state.get("client_name"))
+    except Exception as e:
+        print(f"Chyba při ukládání relace: {e}")
+
+def print_timings(graph):
+    """Vytiskne dobu běhu jednotlivých uzlů posledního běhu grafu."""
+    if graph.last_timings:
+        print("Doba běhu uzlů: " + ", ".join(f"{node} {seconds:.2f} s" for node, seconds in graph.last_timings))
+
+def print_cache_stats():
+    """Vytiskne statistiku cache odpovědí LLM, pokud byla cache použita."""
+    stats = get_cache_stats()
+    if not stats["lookups"]:
+        return
+    print(
+        f"\nCache LLM: {stats['exact_hits']} přesných a {stats['semantic_hits']} sémantických zásahů "
+        f"z {stats['lookups']} volání (hit rate {stats['hit_rate'] * 100:.0f} %), "
+        f"ušetřeno přibližně {stats['saved_latency']:.1f} s"
+    )
+
+def print_rate_limit_stats():
+    """Vytiskne statistiku limiterů rychlosti, pokud některé volání čekalo nebo se opakovalo."""
+    for name, stats in get_rate_limit_stats().items():
+        if not stats["throttled"] and not stats["retries"]:
+            continue
+        print(
+            f"Limit rychlosti {name}: zdrženo {stats['throttled']} z {stats['requests']} volání "
+            f"celkem {stats['throttle_seconds']:.1f} s, opakování {stats['retries']} "
+            f"(odpovědí 429: {stats['rate_limited']})"
+        )
+
+def print_generation_stats():
+    """Vytiskne podíl opravených odpovědí a dogenerovaných sekcí, pokud se generovala nabídka."""
+    stats = get_generation_stats()
+    if not stats["repaired"] and not stats["regenerated_sections"] and not stats["unparsed"]:
+        return
+    print(
+        f"Data nabídky: opraveno {stats['repaired']} z {stats['responses']} odpovědí "
+        f"({stats['repair_rate'] * 100:.0f} %), dogenerováno {stats['regenerated_sections']} sekcí "
+        f"v {stats['regenerated_responses']} odpovědích ({stats['regeneration_rate'] * 100:.0f} %)"
+    )
+
+def print_speculative_stats():
+    """Vytiskne výsledky návrhů nabídky na pozadí, pokud se nějaký spustil."""
+    stats = get_speculative_stats()
+    if not stats["started"]:
+        return
+    print(
+        f"Návrhy na pozadí: spuštěno {stats['started']}, použito {stats['used']}, "
+        f"zbytečných {stats['wasted']}, neúspěšných {stats['failed']}, "
+        f"nespuštěno kvůli limitu {stats['capped']}, ušetřeno {stats['saved_seconds']:.1f} s"
+    )
+
+def check_api_keys() -> bool:
+    """
+    Zkontroluje, že jsou nastaveny potřebné API klíče.
+    
+    Náhradní poskytovatelé a lokální vektorové úložiště klíče nepotřebují.
+    
+    Returns:
+        bool: True, pokud jsou klíče nastaveny
+    """
+    uses_openai = config.llm_provider != "fake" or config.embedding_provider != "fake"
+    if uses_openai and not config.openai_api_key:
+        print("Chyba: Není nastaven OpenAI API klíč. Nastavte proměnnou prostředí OPENAI_API_KEY.")
+        return False
+    
+    if config.vector_store != "local" and (not config.pinecone_api_key or not config.pinecone_environment):
+        print("Chyba: Nejsou nastaveny Pinecone API klíč nebo prostředí. Nastavte proměnné prostředí PINECONE_API_KEY a PINECONE_ENVIRONMENT.")
+        return False
+    return True
 
 def main():
     """Hlavní funkce CLI aplikace."""
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # Dávkové generování nabídek bez konverzace (viz app.batch)
+        from app.batch import main as batch_main
+        return batch_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(description="BidMaster CLI - Generátor obchodních nabídek")
     parser.add_argument(
         "--client-request", "-r",
@@ -61,19 +229,57 @@ def main():
         action="store_true",
         help="Nezačíná s prázdnou obrazovkou po každém kroku"
     )
+    parser.add_argument(
+        "--llm-cache",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Zapne (nebo vypne) perzistentní cache odpovědí LLM (výchozí podle proměnné LLM_CACHE)"
+    )
+    parser.add_argument(
+        "--semantic-cache",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Zapne (nebo vypne) sémantickou cache pro analýzu poptávky (výchozí podle proměnné LLM_SEMANTIC_CACHE)"
+    )
+    parser.add_argument(
+        "--raw-request",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Vkládá do promptů i celý text dlouhé poptávky, nejen její přehled (výchozí podle proměnné REQUEST_INCLUDE_RAW)"
+    )
+    parser.add_argument(
+        "--speculative",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Generuje návrh nabídky na pozadí už během sběru informací (výchozí podle proměnné SPECULATIVE_DRAFT)"
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Vypíše odpověď asistenta až po jejím dokončení"
+    )
+    parser.add_argument(
+        "--session-id", "--resume",
+        dest="session_id",
+        metavar="ID_RELACE",
+        help="Naváže na uloženou relaci (pokud neexistuje, založí novou s tímto ID)"
+    )
     args = parser.parse_args()
 
+    if args.llm_cache is not None:
+        config.llm_cache_enabled = args.llm_cache
+    if args.semantic_cache is not None:
+        config.llm_semantic_cache_enabled = args.semantic_cache
+    if args.raw_request is not None:
+        config.request_include_raw = args.raw_request
+    if args.speculative is not None:
+        config.speculative_draft = args.speculative
+
     # Nastavení debug režimu
     debug_mode = args.debug
     no_clear_mode = args.no_clear
 
-    # Kontrola API klíčů
-    if not config.openai_api_key:
-        print("Chyba: Není nastaven OpenAI API klíč. Nastavte proměnnou prostředí OPENAI_API_KEY.")
-        return 1
-    
-    if not config.pinecone_api_key or not config.pinecone_environment:
-        print("Chyba: Nejsou nastaveny Pinecone API klíč nebo prostředí. Nastavte proměnné prostředí PINECONE_API_KEY a PINECONE_ENVIRONMENT.")
+    if not check_api_keys():
         return 1
 
     clear_screen()
@@ -82,96 +288,103 @@ def main():
     # Informace o použitém modelu
     print(f"\nPoužitý model: {config.model_name}")
     print(f"Embedding model: {config.embedding_model}")
-
-    # Získání poptávky klienta
-    client_request = ""
-    if args.client_request:
-        try:
-            with open(args.client_request, "r", encoding="utf-8") as f:
-                client_request = f.read()
-            print(f"\nPoptávka načtena ze souboru: {args.client_request}")
-        except Exception as e:
-            print(f"Chyba při čtení souboru s poptávkou: {e}")
-            return 1
-    else:
-        print("\nZadejte poptávku klienta (ukončete prázdným řádkem):")
-        lines = []
-        while True:
-            line = input()
-            if not line:
-                break
-            lines.append(line)
-        client_request = "\n".join(lines)
-
-    # Získání názvu klienta
-    client_name = args.client_name if args.client_name else input("\nZadejte název klienta: ")
-
-    if not client_request or not client_name:
-        print("Chyba: Poptávka klienta a název klienta jsou povinné.")
-        return 1
+    if config.llm_provider == "fake" or config.embedding_provider == "fake" or config.vector_store == "local":
+        print(f"Offline náhrady: LLM={config.llm_provider}, embeddings={config.embedding_provider}, "
+              f"vektorové úložiště={config.vector_store}")
+    if config.llm_cache_enabled:
+        print(f"Cache odpovědí LLM: {config.llm_cache_path}")
+    if config.llm_semantic_cache_enabled:
+        print(f"Sémantická cache LLM: {config.llm_semantic_cache_path} (práh {config.llm_semantic_cache_threshold})")
 
     # Vytvoření grafu
     print("\nInicializace grafu pro generování nabídek...")
     graph = create_proposal_graph()
+    graph.verbose = debug_mode
+    printer = None
+    session_store = get_session_store()
+    state = None
     
-    # Inicializace stavu
-    state = init_proposal_state(client_request, client_name)
-    
-    # Spuštění prvního kroku (analýza poptávky)
-    print("\nAnalýza poptávky klienta...")
-    print("Prosím, počkejte...")
+    if args.session_id:
+        # Navázání na uloženou relaci (případně od posledního checkpointu)
+        try:
+            printer = None if args.no_stream else StreamPrinter()
+            state = run_graph_in_thread(
+                lambda: restore_session(graph, args.session_id, session_store, on_token=printer),
+                debug_mode,
+                printer
+            )
+        except Exception as e:
+            print(f"\nChyba při navazování na relaci: {e}")
+            return 1
+        if state is None:
+            print(f"\nRelace {args.session_id} neexistuje, zakládám novou.")
+        else:
+            save_session(session_store, state)
+            print(f"\nNavázáno na relaci {state['session_id']} (krok {state['current_step']}).")
     
-    try:
-        # Animace načítání
-        animation = "|/-\\"
-        idx = 0
-        start_time = time.time()
-        
-        # Spuštění grafu v samostatném vlákně
-        import threading
-        result = {"state": None, "error": None}
-        
-        def run_graph():
+    if state is None:
+        # Získání poptávky klienta
+        client_request = ""
+        if args.client_request:
             try:
-                result["state"] = graph.invoke(state)
+                with open(args.client_request, "r", encoding="utf-8") as f:
+                    client_request = f.read()
+                print(f"\nPoptávka načtena ze souboru: {args.client_request}")
             except Exception as e:
-                result["error"] = e
-        
-        thread = threading.Thread(target=run_graph)
-        thread.start()
-        
-        # Animace během zpracování
-        while thread.is_alive():
-            if not debug_mode:  # Animace pouze pokud není debug režim
-                sys.stdout.write("\rZpracovávám " + animation[idx % len(animation)])
-                sys.stdout.flush()
-                idx += 1
-            time.sleep(0.1)
-        
-        thread.join()
+                print(f"Chyba při čtení souboru s poptávkou: {e}")
+                return 1
+        else:
+            print("\nZadejte poptávku klienta (ukončete prázdným řádkem):")
+            lines = []
+            while True:
+                line = input()
+                if not line:
+                    break
+                lines.append(line)
+            client_request = "\n".join(lines)
+
+        # Získání názvu klienta
+        client_name = args.client_name if args.client_name else input("\nZadejte název klienta: ")
+
+        if not client_request or not client_name:
+            print("Chyba: Poptávka klienta a název klienta jsou povinné.")
+            return 1
         
-        # Kontrola výsledku
-        if result["error"]:
-            raise result["error"]
+        # Inicializace stavu
+        state = init_proposal_state(client_request, client_name, session_id=args.session_id)
+        save_session(session_store, state)
+        print(f"\nID relace: {state['session_id']} (pro navázání použijte --session-id {state['session_id']})")
         
-        state = result["state"]
+        # Spuštění prvního kroku (analýza poptávky)
+        print("\nAnalýza poptávky klienta...")
+        print("Prosím, počkejte...")
         
-        elapsed_time = time.time() - start_time
-        print(f"\rAnalýza dokončena za {elapsed_time:.2f} sekund.")
-    except Exception as e:
-        print(f"\nChyba při analýze poptávky: {e}")
-        if debug_mode:
-            import traceback
-            traceback.print_exc()
-        return 1
+        try:
+            start_time = time.time()
+            printer = None if args.no_stream else StreamPrinter()
+            state = run_graph_in_thread(lambda: graph.invoke(state, on_token=printer), debug_mode, printer)
+            
+            save_session(session_store, state)
+            
+            elapsed_time = time.time() - start_time
+            print(f"\rAnalýza dokončena za {elapsed_time:.2f} sekund.")
+            if debug_mode:
+                print_timings(graph)
+        except Exception as e:
+            print(f"\nChyba při analýze poptávky: {e}")
+            if debug_mode:
+                import traceback
+                traceback.print_exc()
+            return 1
     
-    # Zobrazení výsledku analýzy
+    # Zobrazení výsledku analýzy (streamovanou analýzu v režimu bez čištění neopakujeme)
     if not no_clear_mode:
         clear_screen()
         print_header()
-    print("\n=== Výsledek analýzy ===")
-    print_chat_history(state["chat_history"])
-    print("\n=== Konec analýzy ===")
+    if not (no_clear_mode and printer and printer.text):
+        print("\n=== Výsledek analýzy ===")
+        print_chat_history(state["chat_history"])
+        print("\n=== Konec analýzy ===")
     print("\nNyní můžete začít interaktivní konverzaci s asistentem.")
     print("Pro ukončení aplikace napište 'exit', 'quit' nebo 'konec'.")
     print("Pro přepnutí debug režimu napište 'debug'.")
@@ -183,73 +396,63 @@ def main():
             # Získání vstupu od uživatele
             user_input = input("\n👤 Vy: ")
             
+            # Záměr zprávy se rozpozná jednou (příkazy i přechod ke generování)
+            intent = intents.classify_intent(user_input)
+            
             # Kontrola speciálních příkazů
-            if user_input.lower() in ["exit", "quit", "konec"]:
+            if intent["intent"] == intents.EXIT:
+                print_cache_stats()
+                print_rate_limit_stats()
+                print_generation_stats()
+                print_speculative_stats()
                 print("\nUkončuji aplikaci...")
                 return 0
             
-            if user_input.lower() == "debug":
+            if intent["intent"] == intents.DEBUG:
                 debug_mode = not debug_mode
+                graph.verbose = debug_mode
                 print(f"\nDebug režim {'zapnut' if debug_mode else 'vypnut'}")
                 continue
                 
-            if user_input.lower() == "clear":
+            if intent["intent"] == intents.CLEAR:
                 no_clear_mode = False
                 clear_screen()
                 print_header()
                 print_chat_history(state["chat_history"])
                 continue
                 
-            if user_input.lower() == "no-clear":
+            if intent["intent"] == intents.NO_CLEAR:
                 no_clear_mode = True
                 print("\nRežim bez čištění obrazovky zapnut.")
                 continue
             
-            # Zpracování vstupu uživatele
-            state = process_user_input(state, user_input)
+            # Zpracování vstupu uživatele (zprávu uložíme ještě před během grafu)
+            state = process_user_input(state, user_input, intent)
+            save_session(session_store, state)
             
-            # Animace načítání během zpracování
+            # Spuštění grafu v samostatném vlákně s animací načítání
             print("Zpracovávám odpověď...")
-            animation = "|/-\\"
-            idx = 0
             start_time = time.time()
-            
-            # Spuštění grafu v samostatném vlákně
-            result = {"state": None, "error": None}
-            
-            def run_graph():
-                try:
-                    result["state"] = graph.invoke(state)
-                except Exception as e:
-                    result["error"] = e
-            
-            thread = threading.Thread(target=run_graph)
-            thread.start()
-            
-            # Animace během zpracování
-            while thread.is_alive():
-                if not debug_mode:  # Animace pouze pokud není debug režim
-                    sys.stdout.write("\rZpracovávám " + animation[idx % len(animation)])
-                    sys.stdout.flush()
-                    idx += 1
-                time.sleep(0.1)
-            
-            thread.join()
-            
-            # Kontrola výsledku
-            if result["error"]:
-                print(f"\nChyba při zpracování: {result['error']}")
+            printer = None if args.no_stream else StreamPrinter()
+            try:
+                state = run_graph_in_thread(lambda: graph.invoke(state, on_token=printer), debug_mode, printer)
+            except Exception as e:
+                print(f"\nChyba při zpracování: {e}")
                 if debug_mode:
                     import traceback
                     traceback.print_exc()
                 # Pokračujeme i přes chybu
                 continue
-            
-            state = result["state"]
+            save_session(session_store, state)
             
             elapsed_time = time.time() - start_time
             if debug_mode:
                 print(f"\rOdpověď zpracována za {elapsed_time:.2f} sekund.")
+                print_timings(graph)
+                print_cache_stats()
+                print_rate_limit_stats()
+                print_generation_stats()
+                print_speculative_stats()
             
             # Zobrazení odpovědi
             if not no_clear_mode:
@@ -257,10 +460,16 @@ def main():
                 print_header()
                 print_chat_history(state["chat_history"])
             else:
-                # Zobrazíme pouze poslední zprávu
+                # Zobrazíme pouze poslední zprávu, u streamované odpovědi jen její nevypsaný zbytek
                 last_message = state["chat_history"][-1]
                 if last_message["role"] == "assistant":
-                    print(f"\n🤖 Asistent: {last_message['content']}")
+                    streamed = printer.text if printer else ""
+                    if streamed and last_message["content"].startswith(streamed):
+                        rest = last_message["content"][len(streamed):]
+                        if rest.strip():
+                            print(rest.strip())
+                    else:
+                        print(f"\n🤖 Asistent: {last_message['content']}")
             
             # Pokud byl vygenerován dokument, informujeme uživatele
             if state.get("document_path") and state["current_step"] == Step.HUMAN_FEEDBACK:
@@ -298,6 +507,10 @@ def main():
         print(f"\n📄 Dokument byl vygenerován a uložen na: {state['document_path']}")
         print("\nMůžete dokument otevřít a prohlédnout si výslednou nabídku.")
     
+    print_cache_stats()
+    print_rate_limit_stats()
+    print_generation_stats()
+    print_speculative_stats()
     return 0
 
 if __name__ == "__main__":
@@ -23,6 +23,14 @@ class Config:
     pinecone_api_key: str = os.getenv("PINECONE_API_KEY", "")
     pinecone_environment: str = os.getenv("PINECONE_ENVIRONMENT", "gcp-starter")
     pinecone_index_name: str = os.getenv("PINECONE_INDEX_NAME", "bidmaster")
+    # Adresa služby místo cloudu Pinecone (např. http://localhost:5080 pro app.utils.pinecone_local)
+    pinecone_controller_host: str = os.getenv("PINECONE_CONTROLLER_HOST", "")
+    
+    # OCR pro naskenované PDF
+    ocr_lang: str = os.getenv("OCR_LANG", "ces+eng")
+    ocr_dpi: int = int(os.getenv("OCR_DPI", "300"))
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+    ocr_cache_dir: str = os.getenv("OCR_CACHE_DIR", "data/cache/ocr")
     
     # Aplikace
     debug: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
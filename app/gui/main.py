@@ -1,22 +1,36 @@
 import streamlit as st
 from pathlib import Path
 import json
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 import sys
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from datetime import date, datetime
 from docx import Document
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 # Přidání root adresáře do PYTHONPATH
 root_dir = str(Path(__file__).parent.parent.parent)
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
-from app.utils.import_proposals import import_proposals, load_document
+from app.utils.import_proposals import import_proposals, load_document, extract_text_from_pdf
 from app.utils.search_proposals import search_proposals
+from app.chains.digest import get_request_digest, request_prompt_text
 from app.proposal_graph import SimpleStateGraph, Step, ProposalState
+from app.utils.llm_clients import get_chat_model, invoke_llm
+from app.utils.config import get_config
+from app.utils.context_packer import pack_context
+from app.utils.session_store import get_session_store
+from app.utils.streaming import token_stream
+
+config = get_config()
 
 # Konfigurace stránky
 st.set_page_config(
@@ -71,9 +85,12 @@ def initialize_session_state():
     if 'graph' not in st.session_state:
         st.session_state.graph = SimpleStateGraph()
     if 'llm' not in st.session_state:
-        st.session_state.llm = ChatOpenAI(temperature=0.7)
+        st.session_state.llm = get_chat_model(temperature=0.7)
     if 'log' not in st.session_state:
         st.session_state.log = []
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex[:12]
+        st.session_state.session_saved = None
 
 def add_log(message: str):
     """Přidá zprávu do logu."""
@@ -92,8 +109,38 @@ def render_chat_message(message: dict):
     elif role == "system":
         st.markdown(f'<div class="chat-message system-message">ℹ️ {content}</div>', unsafe_allow_html=True)
 
-def get_next_question(state: ProposalState) -> str:
-    """Získá další otázku od chatbota."""
+def stream_text(llm, messages) -> Iterator[str]:
+    """
+    Vrací text odpovědi LLM po částech pro ``st.write_stream``.
+
+    Volání běží přes ``invoke_llm`` (limiter rychlosti, opakování po 429,
+    interaktivní priorita) ve vedlejším vlákně a tokeny se do hlavního
+    vlákna Streamlitu předávají frontou.
+    """
+    tokens: "queue.Queue" = queue.Queue()
+    done = object()
+    errors = []
+
+    def run():
+        try:
+            with token_stream(tokens.put):
+                invoke_llm(llm, messages, stream=True)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            tokens.put(done)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    while True:
+        token = tokens.get()
+        if token is done:
+            break
+        yield token
+    if errors:
+        raise errors[0]
+
+def get_next_question(state: ProposalState, stream: bool = False) -> str:
+    """Získá další otázku od chatbota (volitelně s průběžným vykreslením)."""
     messages = [
         SystemMessage(content="""Jsi asistent pro analýzu poptávek na implementaci MidPoint.
         Tvým úkolem je získat všechny potřebné informace pro vytvoření nabídky.
@@ -124,10 +171,22 @@ def get_next_question(state: ProposalState) -> str:
     """
     messages.append(HumanMessage(content=f"Na základě těchto informací: {context}\nJaká je tvá další otázka?"))
     
-    response = st.session_state.llm.invoke(messages)
-    return response.content
+    if stream:
+        return st.write_stream(stream_text(st.session_state.llm, messages))
+    
+    return invoke_llm(st.session_state.llm, messages).content
+
+def get_similar_context(state: ProposalState) -> str:
+    """Vrátí text podobných nabídek pro poptávku klienta."""
+    if not state.client_request:
+        return ""
+    similar_proposals = search_proposals(state.client_request)
+    if not similar_proposals:
+        return ""
+    context, _ = pack_context(similar_proposals[:3], config.context_budget_generate)
+    return context
 
-def generate_solution_description(state: ProposalState) -> str:
+def generate_solution_description(state: ProposalState, llm=None, context: Optional[str] = None) -> str:
     """Generuje sekci s popisem řešení."""
     system_prompt = """Jsi profesionální business konzultant s rozsáhlými znalostmi v oblasti implementace MidPoint.
     Tvým úkolem je vytvořit profesionální popis řešení pro obchodní nabídku, který bude:
@@ -138,12 +197,9 @@ def generate_solution_description(state: ProposalState) -> str:
     - Přehledně strukturovaný s odstavci
     """
     
-    # Hledání relevantního kontextu
-    context = ""
-    if state.client_request:
-        similar_proposals = search_proposals(state.client_request)
-        if similar_proposals:
-            context = "\n".join([p["content"] for p in similar_proposals[:3]])
+    # Kontext předaný z create_proposal_document, jinak se dohledá
+    if context is None:
+        context = get_similar_context(state)
     
     solution_prompt = f"""Vytvoř profesionální "Popis řešení" pro nabídku implementace MidPoint.
     
@@ -169,11 +225,9 @@ def generate_solution_description(state: ProposalState) -> str:
         HumanMessage(content=solution_prompt)
     ]
     
-    add_log("Generuji popis řešení...")
-    response = st.session_state.llm.invoke(messages)
-    return response.content
+    return invoke_llm(llm or st.session_state.llm, messages).content
 
-def generate_scope_of_work(state: ProposalState) -> str:
+def generate_scope_of_work(state: ProposalState, llm=None, context: Optional[str] = None) -> str:
     """Generuje sekci s rozsahem prací."""
     system_prompt = """Jsi profesionální business konzultant s rozsáhlými znalostmi v oblasti implementace MidPoint.
     Tvým úkolem je vytvořit profesionální popis rozsahu prací pro obchodní nabídku, který bude:
@@ -184,12 +238,9 @@ def generate_scope_of_work(state: ProposalState) -> str:
     - Přehledně strukturovaný s nadpisy a odstavci
     """
     
-    # Hledání relevantního kontextu
-    context = ""
-    if state.client_request:
-        similar_proposals = search_proposals(state.client_request)
-        if similar_proposals:
-            context = "\n".join([p["content"] for p in similar_proposals[:3]])
+    # Kontext předaný z create_proposal_document, jinak se dohledá
+    if context is None:
+        context = get_similar_context(state)
     
     scope_prompt = f"""Vytvoř profesionální sekci "Rozsah prací" pro nabídku implementace MidPoint.
     
@@ -216,11 +267,9 @@ def generate_scope_of_work(state: ProposalState) -> str:
         HumanMessage(content=scope_prompt)
     ]
     
-    add_log("Generuji rozsah prací...")
-    response = st.session_state.llm.invoke(messages)
-    return response.content
+    return invoke_llm(llm or st.session_state.llm, messages).content
 
-def generate_timeline(state: ProposalState) -> str:
+def generate_timeline(state: ProposalState, llm=None, context: Optional[str] = None) -> str:
     """Generuje sekci s harmonogramem."""
     system_prompt = """Jsi profesionální business konzultant s rozsáhlými znalostmi v oblasti implementace MidPoint.
     Tvým úkolem je vytvořit profesionální harmonogram pro obchodní nabídku, který bude:
@@ -231,12 +280,9 @@ def generate_timeline(state: ProposalState) -> str:
     - Přehledně strukturovaný s nadpisy a odstavci
     """
     
-    # Hledání relevantního kontextu
-    context = ""
-    if state.client_request:
-        similar_proposals = search_proposals(state.client_request)
-        if similar_proposals:
-            context = "\n".join([p["content"] for p in similar_proposals[:3]])
+    # Kontext předaný z create_proposal_document, jinak se dohledá
+    if context is None:
+        context = get_similar_context(state)
     
     timeline_prompt = f"""Vytvoř profesionální sekci "Harmonogram" pro nabídku implementace MidPoint.
     
@@ -264,11 +310,9 @@ def generate_timeline(state: ProposalState) -> str:
         HumanMessage(content=timeline_prompt)
     ]
     
-    add_log("Generuji harmonogram...")
-    response = st.session_state.llm.invoke(messages)
-    return response.content
+    return invoke_llm(llm or st.session_state.llm, messages).content
 
-def generate_pricing(state: ProposalState) -> str:
+def generate_pricing(state: ProposalState, llm=None, context: Optional[str] = None) -> str:
     """Generuje sekci s cenovou nabídkou."""
     system_prompt = """Jsi profesionální business konzultant s rozsáhlými znalostmi v oblasti implementace MidPoint.
     Tvým úkolem je vytvořit profesionální cenovou nabídku pro obchodní nabídku, která bude:
@@ -279,12 +323,9 @@ def generate_pricing(state: ProposalState) -> str:
     - Přehledně strukturovaná s nadpisy a odstavci
     """
     
-    # Hledání relevantního kontextu
-    context = ""
-    if state.client_request:
-        similar_proposals = search_proposals(state.client_request)
-        if similar_proposals:
-            context = "\n".join([p["content"] for p in similar_proposals[:3]])
+    # Kontext předaný z create_proposal_document, jinak se dohledá
+    if context is None:
+        context = get_similar_context(state)
     
     pricing_prompt = f"""Vytvoř profesionální sekci "Cenová nabídka" pro implementaci MidPoint.
     
@@ -313,9 +354,69 @@ def generate_pricing(state: ProposalState) -> str:
         HumanMessage(content=pricing_prompt)
     ]
     
-    add_log("Generuji cenovou nabídku...")
-    response = st.session_state.llm.invoke(messages)
-    return response.content
+    return invoke_llm(llm or st.session_state.llm, messages).content
+
+# Sekce nabídky v pořadí, v jakém se vkládají do dokumentu
+PROPOSAL_SECTIONS = [
+    ("2. Popis řešení", generate_solution_description),
+    ("3. Rozsah prací", generate_scope_of_work),
+    ("4. Harmonogram", generate_timeline),
+    ("5. Cenová nabídka", generate_pricing),
+]
+
+def generate_sections(state: ProposalState) -> Dict[str, str]:
+    """
+    Vygeneruje sekce nabídky souběžně.
+    
+    Sekce jsou na sobě nezávislé, takže celková doba odpovídá přibližně
+    nejpomalejší z nich. Vlákna nemají přístup k ``st.session_state``,
+    proto se jim LLM i kontext podobných nabídek předávají explicitně
+    a stav sekcí se vykresluje jen v hlavním vlákně.
+    
+    Args:
+        state: Stav nabídky
+        
+    Returns:
+        Dict[str, str]: Text sekcí podle nadpisu
+    """
+    llm = st.session_state.llm
+    context = get_similar_context(state)
+    results = {}
+    errors = {}
+    
+    with st.status("Generuji sekce nabídky...", expanded=True) as status:
+        placeholders = {}
+        for title, _ in PROPOSAL_SECTIONS:
+            placeholders[title] = st.empty()
+            placeholders[title].markdown(f"⏳ {title}")
+        
+        start = time.perf_counter()
+        workers = max(1, min(config.section_concurrency, len(PROPOSAL_SECTIONS)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for title, generate in PROPOSAL_SECTIONS:
+                add_log(f"Generuji sekci {title}...")
+                # Kopie kontextu předá vláknu prioritu volání a počítadlo tokenů
+                futures[executor.submit(contextvars.copy_context().run, generate, state, llm, context)] = title
+            
+            for future in as_completed(futures):
+                title = futures[future]
+                elapsed = time.perf_counter() - start
+                try:
+                    results[title] = future.result()
+                    placeholders[title].markdown(f"✅ {title} ({elapsed:.1f} s)")
+                except Exception as e:
+                    errors[title] = e
+                    placeholders[title].markdown(f"❌ {title}: {e}")
+        
+        total = time.perf_counter() - start
+        if errors:
+            status.update(label="Generování sekcí selhalo", state="error")
+            raise next(iter(errors.values()))
+        status.update(label=f"Sekce vygenerovány za {total:.1f} s", state="complete")
+    
+    add_log(f"Sekce nabídky vygenerovány za {total:.1f} s")
+    return results
 
 def create_proposal_document(state: ProposalState) -> str:
     """Vytvoří dokument s nabídkou na základě získaných informací a uloží jej do adresáře generated_proposals."""
@@ -334,37 +435,14 @@ def create_proposal_document(state: ProposalState) -> str:
         date_str = now.strftime("%d.%m.%Y")
         doc.add_paragraph(f'Datum: {date_str}')
         
-        # ===== SEKCE 1: POPIS ŘEŠENÍ =====
-        doc.add_heading('2. Popis řešení', level=1)
-        solution_text = generate_solution_description(state)
-        # Rozdělení textu na odstavce a přidání každého zvlášť
-        for paragraph in solution_text.split('\n\n'):
-            if paragraph.strip():  # Přidá pouze neprázdné odstavce
-                doc.add_paragraph(paragraph.strip())
-        
-        # ===== SEKCE 2: ROZSAH PRACÍ =====
-        doc.add_heading('3. Rozsah prací', level=1)
-        scope_text = generate_scope_of_work(state)
-        # Rozdělení textu na odstavce a přidání každého zvlášť
-        for paragraph in scope_text.split('\n\n'):
-            if paragraph.strip():
-                doc.add_paragraph(paragraph.strip())
-        
-        # ===== SEKCE 3: HARMONOGRAM =====
-        doc.add_heading('4. Harmonogram', level=1)
-        timeline_text = generate_timeline(state)
-        # Rozdělení textu na odstavce a přidání každého zvlášť
-        for paragraph in timeline_text.split('\n\n'):
-            if paragraph.strip():
-                doc.add_paragraph(paragraph.strip())
-        
-        # ===== SEKCE 4: CENOVÁ NABÍDKA =====
-        doc.add_heading('5. Cenová nabídka', level=1)
-        pricing_text = generate_pricing(state)
-        # Rozdělení textu na odstavce a přidání každého zvlášť
-        for paragraph in pricing_text.split('\n\n'):
-            if paragraph.strip():
-                doc.add_paragraph(paragraph.strip())
+        # ===== SEKCE 1-4: generují se souběžně, do dokumentu se vkládají v pořadí =====
+        sections = generate_sections(state)
+        for title, _ in PROPOSAL_SECTIONS:
+            doc.add_heading(title, level=1)
+            # Rozdělení textu na odstavce a přidání každého zvlášť
+            for paragraph in sections[title].split('\n\n'):
+                if paragraph.strip():  # Přidá pouze neprázdné odstavce
+                    doc.add_paragraph(paragraph.strip())
         
         # Uložení dokumentu
         # Vytvoření složky pro vygenerované nabídky, pokud neexistuje
@@ -385,6 +463,63 @@ def create_proposal_document(state: ProposalState) -> str:
         add_log(f"Chyba při generování dokumentu: {str(e)}")
         return None
 
+def session_payload() -> dict:
+    """
+    Vrátí stav relace GUI v podobě serializovatelné do JSON.
+    
+    Returns:
+        dict: Aktuální krok, historie chatu a stav nabídky
+    """
+    proposal = asdict(st.session_state.proposal_state)
+    if isinstance(proposal.get("deadline"), date):
+        proposal["deadline"] = proposal["deadline"].isoformat()
+    return {
+        "current_step": getattr(st.session_state.current_step, "value", st.session_state.current_step),
+        "chat_history": st.session_state.chat_history,
+        "proposal_state": proposal
+    }
+
+def save_session():
+    """Uloží relaci GUI, pokud se od posledního uložení změnila."""
+    payload = session_payload()
+    if payload["current_step"] == Step.ANALYZE_REQUEST.value and not payload["chat_history"]:
+        return
+    serialized = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    if serialized == st.session_state.session_saved:
+        return
+    title = st.session_state.proposal_state.client_request.strip().splitlines()[0][:60] \
+        if st.session_state.proposal_state.client_request.strip() else None
+    try:
+        get_session_store().save(st.session_state.session_id, payload, kind="gui", title=title)
+        st.session_state.session_saved = serialized
+    except Exception as e:
+        add_log(f"Chyba při ukládání relace: {str(e)}")
+
+def load_session(session_id: str) -> bool:
+    """
+    Načte uloženou relaci GUI do ``st.session_state``.
+    
+    Args:
+        session_id: ID relace
+        
+    Returns:
+        bool: True pokud byla relace načtena
+    """
+    record = get_session_store().load(session_id)
+    if record is None:
+        return False
+    payload = record["state"]
+    proposal = dict(payload.get("proposal_state") or {})
+    if proposal.get("deadline"):
+        proposal["deadline"] = date.fromisoformat(proposal["deadline"])
+    step = payload.get("current_step")
+    st.session_state.current_step = Step(step) if step in Step._value2member_map_ else step
+    st.session_state.chat_history = payload.get("chat_history") or []
+    st.session_state.proposal_state = ProposalState(**proposal)
+    st.session_state.session_id = session_id
+    st.session_state.session_saved = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return True
+
 def render_sidebar():
     """Vykreslení postranního panelu."""
     with st.sidebar:
@@ -397,6 +532,8 @@ def render_sidebar():
             st.session_state.current_step = Step.ANALYZE_REQUEST
             st.session_state.chat_history = []
             st.session_state.proposal_state = ProposalState()
+            st.session_state.session_id = uuid.uuid4().hex[:12]
+            st.session_state.session_saved = None
             add_log("Zahájena nová nabídka")
         
         if st.button("Import nabídek"):
@@ -409,9 +546,27 @@ def render_sidebar():
         
         st.markdown("---")
         
+        # Uložené relace
+        st.subheader("Relace")
+        sessions = get_session_store().list_sessions(kind="gui")
+        if sessions:
+            labels = {
+                s["session_id"]: f"{s['title']} ({datetime.fromtimestamp(s['updated']).strftime('%d.%m. %H:%M')})"
+                for s in sessions
+            }
+            selected = st.selectbox("Uložené relace", list(labels), format_func=labels.get)
+            if st.button("Načíst relaci") and load_session(selected):
+                add_log(f"Načtena relace {selected}")
+                st.rerun()
+        else:
+            st.caption("Žádné uložené relace")
+        
+        st.markdown("---")
+        
         # Status
         st.subheader("Status")
         st.write(f"Aktuální krok: {st.session_state.current_step}")
+        st.write(f"ID relace: {st.session_state.session_id}")
         
         # Log
         st.subheader("Log")
@@ -447,7 +602,10 @@ def render_analyze_request():
             if file_path.suffix.lower() == '.txt':
                 with open(file_path, 'r', encoding='utf-8') as f:
                     file_content = f.read()
-            elif file_path.suffix.lower() in ['.pdf', '.docx']:
+            elif file_path.suffix.lower() == '.pdf':
+                # Naskenované poptávky bez textové vrstvy se rozpoznají pomocí OCR
+                file_content = extract_text_from_pdf(str(file_path))
+            elif file_path.suffix.lower() == '.docx':
                 documents = load_document(str(file_path))
                 file_content = "\n\n".join([doc.page_content for doc in documents])
             elif file_path.suffix.lower() == '.json':
@@ -497,10 +655,26 @@ def render_analyze_request():
             st.session_state.proposal_state.modules = modules
             st.session_state.current_step = Step.GATHER_INFORMATION
             
+            # Dlouhou poptávku nahradíme v konverzaci přehledem
+            # (velmi dlouhou poptávku zpracujeme po částech souběžně)
+            request_text = client_request
+            try:
+                with st.spinner("Zpracovávám poptávku..."):
+                    record = get_request_digest(client_request)
+                request_text = request_prompt_text(client_request, record)
+                if record and record["map_reduce"]:
+                    stats = record["map_reduce"]
+                    add_log(
+                        f"Poptávka zpracována po {stats['parts']} částech za {stats['elapsed']:.1f} s "
+                        f"(zrychlení {stats['speedup']:.1f}x)"
+                    )
+            except Exception as e:
+                add_log(f"Chyba při vytváření přehledu poptávky: {str(e)}")
+            
             # Přidání první zprávy do historie
             st.session_state.chat_history.append({
                 "role": "user",
-                "content": client_request
+                "content": request_text
             })
             
             add_log("Poptávka byla analyzována")
@@ -515,12 +689,13 @@ def render_gather_information():
     
     # Získání další otázky od chatbota
     if not st.session_state.chat_history or st.session_state.chat_history[-1]["role"] == "user":
-        next_question = get_next_question(st.session_state.proposal_state)
+        # Otázka se vykresluje průběžně, po dokončení se uloží do historie
+        st.markdown("🤖 **Asistent**:")
+        next_question = get_next_question(st.session_state.proposal_state, stream=True)
         st.session_state.chat_history.append({
             "role": "assistant",
             "content": next_question
         })
-        render_chat_message(st.session_state.chat_history[-1])
     
     # Formulář pro odpověď
     with st.form("gather_info_form"):
@@ -647,6 +822,8 @@ def render_search():
 def main():
     """Hlavní funkce aplikace."""
     initialize_session_state()
+    # Uložení stavu z předchozího běhu skriptu (běh ukončený st.rerun se jinak neuloží)
+    save_session()
     render_sidebar()
     
     # Vykreslení hlavního obsahu podle aktuálního kroku
@@ -660,6 +837,8 @@ def main():
         render_import()
     elif st.session_state.current_step == "SEARCH":
         render_search()
+    
+    save_session()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Úložiště checkpointů stavu grafu.
+
+Executor grafu po každém dokončeném uzlu uloží stav pod ID relace
+(``state["session_id"]``). Pokud proces spadne uprostřed běhu (např. při
+vytváření dokumentu), lze navázat od posledního dokončeného uzlu a znovu
+neplatit za všechna předchozí volání LLM.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import get_config
+
+config = get_config()
+
+def _dumps(state: Dict[str, Any]) -> str:
+    """Serializuje stav do kompaktního JSON."""
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=str)
+
+class CheckpointStore:
+    """Rozhraní úložiště checkpointů."""
+
+    def put(self, thread_id: str, node: str, state: Dict[str, Any]) -> None:
+        """
+        Uloží stav po dokončení uzlu.
+
+        Args:
+            thread_id: ID relace
+            node: Název dokončeného uzlu
+            state: Stav po dokončení uzlu
+        """
+        raise NotImplementedError
+
+    def get_latest(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Vrátí poslední checkpoint relace.
+
+        Args:
+            thread_id: ID relace
+
+        Returns:
+            Optional[Dict[str, Any]]: Checkpoint s klíči node, state a created, nebo None
+        """
+        raise NotImplementedError
+
+    def list(self, thread_id: str) -> List[Dict[str, Any]]:
+        """
+        Vrátí přehled checkpointů relace (bez stavu), od nejstaršího.
+
+        Args:
+            thread_id: ID relace
+
+        Returns:
+            List[Dict[str, Any]]: Checkpointy s klíči node a created
+        """
+        raise NotImplementedError
+
+    def delete(self, thread_id: str) -> None:
+        """
+        Smaže checkpointy relace.
+
+        Args:
+            thread_id: ID relace
+        """
+        raise NotImplementedError
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Checkpointy v paměti procesu (pro testování a GUI)."""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._checkpoints: Dict[str, List[Dict[str, Any]]] = {}
+
+    def put(self, thread_id: str, node: str, state: Dict[str, Any]) -> None:
+        # Stav se ukládá jako JSON, aby pozdější změny stavu checkpoint neovlivnily
+        checkpoint = {"node": str(node), "state": _dumps(state), "created": time.time()}
+        with self._lock:
+            checkpoints = self._checkpoints.setdefault(thread_id, [])
+            checkpoints.append(checkpoint)
+            del checkpoints[:-self.keep]
+
+    def get_latest(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            checkpoints = self._checkpoints.get(thread_id)
+            if not checkpoints:
+                return None
+            checkpoint = checkpoints[-1]
+        return {**checkpoint, "state": json.loads(checkpoint["state"])}
+
+    def list(self, thread_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"node": c["node"], "created": c["created"]}
+                for c in self._checkpoints.get(thread_id, [])
+            ]
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._checkpoints.pop(thread_id, None)
+
+class SqliteCheckpointStore(CheckpointStore):
+    """Checkpointy v SQLite, přežijí restart procesu."""
+
+    def __init__(self, path: str, keep: int = 20):
+        """
+        Otevře (případně vytvoří) úložiště.
+
+        Args:
+            path: Cesta k SQLite databázi
+            keep: Počet posledních checkpointů, které se pro relaci uchovávají
+        """
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id TEXT NOT NULL,
+                node TEXT NOT NULL,
+                state TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_thread ON checkpoints(thread_id, id)")
+        self._conn.commit()
+
+    def put(self, thread_id: str, node: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO checkpoints (thread_id, node, state, created) VALUES (?, ?, ?, ?)",
+                (thread_id, str(node), _dumps(state), time.time())
+            )
+            # Starší checkpointy relace nad limit se mažou
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND id NOT IN "
+                "(SELECT id FROM checkpoints WHERE thread_id = ? ORDER BY id DESC LIMIT ?)",
+                (thread_id, thread_id, self.keep)
+            )
+            self._conn.commit()
+
+    def get_latest(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT node, state, created FROM checkpoints WHERE thread_id = ? ORDER BY id DESC LIMIT 1",
+                (thread_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        node, state, created = row
+        return {"node": node, "state": json.loads(state), "created": created}
+
+    def list(self, thread_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT node, created FROM checkpoints WHERE thread_id = ? ORDER BY id",
+                (thread_id,)
+            ).fetchall()
+        return [{"node": node, "created": created} for node, created in rows]
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+def get_checkpoint_store(kind: Optional[str] = None) -> Optional[CheckpointStore]:
+    """
+    Vytvoří úložiště checkpointů podle konfigurace.
+
+    Args:
+        kind: "sqlite", "memory" nebo "none" (výchozí podle CHECKPOINT_STORE)
+
+    Returns:
+        Optional[CheckpointStore]: Úložiště checkpointů, nebo None pokud je vypnuté
+    """
+    kind = (kind or config.checkpoint_store).lower()
+    if kind == "sqlite":
+        return SqliteCheckpointStore(config.checkpoint_path, config.checkpoint_keep)
+    if kind == "memory":
+        return MemoryCheckpointStore(config.checkpoint_keep)
+    return None
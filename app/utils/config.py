@@ -23,6 +23,113 @@ class Config(BaseModel):
     model_name: str = os.getenv("MODEL_NAME", "gpt-4-turbo")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
     
+    # Poskytovatelé modelů a vektorové úložiště: "openai"/"fake" a "pinecone"/"local"
+    # (deterministické náhrady bez přístupu k síti, viz app/utils/fake_providers.py)
+    llm_provider: str = os.getenv("LLM_PROVIDER", "openai")
+    embedding_provider: str = os.getenv("EMBEDDING_PROVIDER", "openai")
+    vector_store: str = os.getenv("VECTOR_STORE", "pinecone")
+    # Adresář lokálního NumPy úložiště (VECTOR_STORE=local)
+    local_vector_store_path: str = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/local_vector_store")
+    fake_llm_latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+    fake_llm_latency_jitter: float = float(os.getenv("FAKE_LLM_LATENCY_JITTER", "0"))
+    fake_llm_seed: int = int(os.getenv("FAKE_LLM_SEED", "0"))
+    fake_llm_script: str = os.getenv("FAKE_LLM_SCRIPT", "")
+    fake_embedding_dimension: int = int(os.getenv("FAKE_EMBEDDING_DIMENSION", "256"))
+    
+    # Sdílený HTTP pool pro OpenAI
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_max_keepalive: int = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "120"))
+    # Nejvyšší počet souběžných volání LLM v procesu (0 = bez omezení)
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+    
+    # Sdílený limiter volání OpenAI a Pinecone: požadavky a tokeny za minutu
+    # pro každý model (0 = bez omezení), výjimky pro jednotlivé modely nebo
+    # službu "pinecone" jako JSON {"gpt-4o": {"rpm": 500, "tpm": 30000}}
+    rate_limit_rpm: int = int(os.getenv("RATE_LIMIT_RPM", "0"))
+    rate_limit_tpm: int = int(os.getenv("RATE_LIMIT_TPM", "0"))
+    rate_limits: str = os.getenv("RATE_LIMITS", "")
+    # Opakování po odpovědi 429 nebo dočasné chybě (čekání v sekundách)
+    rate_limit_max_retries: int = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+    rate_limit_backoff_base: float = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+    rate_limit_backoff_max: float = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+    
+    # Cache odpovědí LLM (ve výchozím stavu vypnutá)
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE", "False").lower() in ("true", "1", "t")
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", "data/cache/llm_cache.sqlite")
+    llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    # Volání s teplotou do této hodnoty se kešují automaticky
+    llm_cache_max_temperature: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+    # Sémantická cache pro kroky označené jako bezpečné (ve výchozím stavu vypnutá)
+    llm_semantic_cache_enabled: bool = os.getenv("LLM_SEMANTIC_CACHE", "False").lower() in ("true", "1", "t")
+    llm_semantic_cache_path: str = os.getenv("LLM_SEMANTIC_CACHE_PATH", "data/cache/llm_semantic")
+    llm_semantic_cache_threshold: float = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    llm_semantic_cache_max_entries: int = int(os.getenv("LLM_SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+    # Nejkratší interval mezi zápisy sémantické cache na disk v sekundách (0 = po každém uložení)
+    llm_semantic_cache_save_interval: float = float(os.getenv("LLM_SEMANTIC_CACHE_SAVE_INTERVAL", "30"))
+    
+    # Zpracování odpovědi uživatele při sběru informací:
+    # "structured" (jedno volání), "parallel" (dvě souběžná volání) nebo "sequential"
+    gather_mode: str = os.getenv("GATHER_MODE", "parallel")
+    
+    # Nejnižší skóre lokálního rozpoznání záměru, od kterého zpráva uživatele
+    # znamená přechod k vytvoření nabídky (viz app.chains.intent)
+    intent_generate_threshold: int = int(os.getenv("INTENT_GENERATE_THRESHOLD", "4"))
+    
+    # Executor grafu: maximální počet uzlů v jednom běhu a úložiště checkpointů
+    # ("sqlite", "memory" nebo "none")
+    graph_max_steps: int = int(os.getenv("GRAPH_MAX_STEPS", "10"))
+    checkpoint_store: str = os.getenv("CHECKPOINT_STORE", "sqlite")
+    checkpoint_path: str = os.getenv("CHECKPOINT_PATH", "data/checkpoints.sqlite")
+    checkpoint_keep: int = int(os.getenv("CHECKPOINT_KEEP", "20"))
+    
+    # Historie konverzace v promptech: počet posledních zpráv doslovně, rozpočet
+    # tokenů pro celou historii a maximální délka průběžného shrnutí starších zpráv
+    history_recent_messages: int = int(os.getenv("HISTORY_RECENT_MESSAGES", "6"))
+    history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+    history_summary_tokens: int = int(os.getenv("HISTORY_SUMMARY_TOKENS", "400"))
+    
+    # Poptávka delší než tento počet tokenů se v promptech nahradí přehledem;
+    # REQUEST_INCLUDE_RAW přidá do promptů i její původní text
+    request_digest_min_tokens: int = int(os.getenv("REQUEST_DIGEST_MIN_TOKENS", "1000"))
+    request_include_raw: bool = os.getenv("REQUEST_INCLUDE_RAW", "False").lower() in ("true", "1", "t")
+    
+    # Poptávka delší než ANALYSIS_MAP_REDUCE_TOKENS se analyzuje po částech
+    # (ANALYSIS_PART_TOKENS tokenů) s nejvýše ANALYSIS_CONCURRENCY souběžnými voláními
+    analysis_map_reduce_tokens: int = int(os.getenv("ANALYSIS_MAP_REDUCE_TOKENS", "12000"))
+    analysis_part_tokens: int = int(os.getenv("ANALYSIS_PART_TOKENS", "6000"))
+    analysis_concurrency: int = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+    
+    # Dávkové generování nabídek (run_cli.py batch): počet souběžně
+    # zpracovávaných poptávek a adresář pro dokumenty a souhrn
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    batch_output_dir: str = os.getenv("BATCH_OUTPUT_DIR", "data/generated/batch")
+    
+    # Chybějící nebo prázdné sekce dat nabídky se dogenerují cíleným krátkým
+    # promptem (SECTION_REGENERATE_MAX_TOKENS tokenů odpovědi) místo zástupného textu
+    regenerate_missing_sections: bool = os.getenv("REGENERATE_MISSING_SECTIONS", "True").lower() in ("true", "1", "t")
+    section_regenerate_max_tokens: int = int(os.getenv("SECTION_REGENERATE_MAX_TOKENS", "800"))
+    
+    # Návrh nabídky na pozadí během sběru informací: spustí se, jakmile je vyplněno
+    # SPECULATIVE_MIN_FIELDS položek collected_data; po SPECULATIVE_MAX_WASTED
+    # nepoužitých návrzích se v relaci další nespouštějí
+    speculative_draft: bool = os.getenv("SPECULATIVE_DRAFT", "False").lower() in ("true", "1", "t")
+    speculative_min_fields: int = int(os.getenv("SPECULATIVE_MIN_FIELDS", "3"))
+    speculative_max_wasted: int = int(os.getenv("SPECULATIVE_MAX_WASTED", "2"))
+    
+    # Rozpočet tokenů pro kontext z předchozích nabídek podle kroku
+    context_budget_analyze: int = int(os.getenv("CONTEXT_BUDGET_ANALYZE", "1500"))
+    context_budget_generate: int = int(os.getenv("CONTEXT_BUDGET_GENERATE", "3000"))
+    context_budget_chain: int = int(os.getenv("CONTEXT_BUDGET_CHAIN", "2000"))
+    
+    # Adresář s uloženými relacemi (konverzacemi nad nabídkou)
+    session_dir: str = os.getenv("SESSION_DIR", "data/sessions")
+    
+    # Maximální počet souběžně generovaných sekcí nabídky v GUI
+    section_concurrency: int = int(os.getenv("SECTION_CONCURRENCY", "4"))
+    
     # Konfigurace chunků pro RAG
     chunk_size: int = int(os.getenv("CHUNK_SIZE", "1000"))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
@@ -0,0 +1,135 @@
+"""
+Skládání kontextu z nalezených chunků do rozpočtu tokenů.
+
+Chunky ze stejného zdroje se sousedními ``chunk_id`` se spojí do jednoho
+úseku (překryv vzniklý při dělení textu se vloží jen jednou). Úseky se pak
+podle relevance (pořadí výsledků vyhledávání) přidávají do promptu, dokud
+se vejdou do rozpočtu. Co se nevešlo, se zaznamená do přehledu.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.utils.tokens import count_tokens, truncate_tokens
+
+SEPARATOR = "\n\n---\n\n"
+EMPTY_CONTEXT = "Nebyly nalezeny žádné relevantní dokumenty."
+
+# Kratší shoda na hranici chunků se nepovažuje za překryv, ale za náhodu
+MIN_OVERLAP_CHARS = 5
+
+# Úsek, ze kterého by po zkrácení zbylo méně tokenů, se do kontextu nevkládá
+MIN_SPAN_TOKENS = 50
+
+def _join_overlapping(first: str, second: str) -> str:
+    """Spojí dva navazující chunky, překryv na hranici vloží jen jednou."""
+    for size in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+def merge_chunks(documents: List[Document]) -> List[Dict[str, Any]]:
+    """
+    Spojí sousední chunky ze stejného zdroje do úseků.
+
+    Args:
+        documents: Dokumenty seřazené podle relevance
+
+    Returns:
+        List[Dict[str, Any]]: Úseky s klíči source, chunks, rank a text,
+            seřazené podle relevance (rank nejrelevantnějšího chunku)
+    """
+    groups: Dict[Any, List[Tuple[int, Document]]] = {}
+    spans = []
+    for rank, doc in enumerate(documents):
+        source = doc.metadata.get("source")
+        chunk_id = doc.metadata.get("chunk_id")
+        if source is None or not isinstance(chunk_id, (int, float)):
+            spans.append({"source": source, "chunks": [], "rank": rank, "text": doc.page_content})
+            continue
+        groups.setdefault(source, []).append((rank, doc))
+
+    for source, items in groups.items():
+        items.sort(key=lambda item: item[1].metadata["chunk_id"])
+        span = None
+        for rank, doc in items:
+            chunk_id = int(doc.metadata["chunk_id"])
+            if span is not None and chunk_id == span["chunks"][-1]:
+                # Duplicitní výsledek téhož chunku
+                span["rank"] = min(span["rank"], rank)
+                continue
+            if span is not None and chunk_id == span["chunks"][-1] + 1:
+                span["text"] = _join_overlapping(span["text"], doc.page_content)
+                span["chunks"].append(chunk_id)
+                span["rank"] = min(span["rank"], rank)
+                continue
+            span = {"source": source, "chunks": [chunk_id], "rank": rank, "text": doc.page_content}
+            spans.append(span)
+
+    spans.sort(key=lambda s: s["rank"])
+    return spans
+
+def _span_header(span: Dict[str, Any]) -> str:
+    """Vrátí krátké označení zdroje úseku."""
+    if not span["source"]:
+        return ""
+    chunks = span["chunks"]
+    if not chunks:
+        part = ""
+    elif len(chunks) == 1:
+        part = f", část {chunks[0] + 1}"
+    else:
+        part = f", části {chunks[0] + 1}-{chunks[-1] + 1}"
+    return f"[{os.path.basename(str(span['source']))}{part}]\n"
+
+def pack_context(documents: List[Document], budget: int,
+                 model: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Složí kontext z dokumentů do rozpočtu tokenů.
+
+    Úseky se přidávají podle relevance. Úsek, který se už nevejde, se
+    přeskočí a zkusí se další (kratší). Pokud se nevejde ani nejrelevantnější
+    úsek, vloží se zkrácený.
+
+    Args:
+        documents: Nalezené dokumenty seřazené podle relevance
+        budget: Rozpočet tokenů pro kontext
+        model: Název modelu pro počítání tokenů (výchozí z konfigurace)
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: Text kontextu a přehled s klíči budget,
+            tokens, included a dropped (úseky se zdrojem, chunky a počtem tokenů)
+    """
+    report = {"budget": budget, "tokens": 0, "included": [], "dropped": []}
+    if not documents:
+        return EMPTY_CONTEXT, report
+
+    separator_tokens = count_tokens(SEPARATOR, model)
+    parts = []
+    used = 0
+    for span in merge_chunks(documents):
+        text = _span_header(span) + span["text"]
+        tokens = count_tokens(text, model)
+        cost = tokens + (separator_tokens if parts else 0)
+        summary = {"source": span["source"], "chunks": span["chunks"], "tokens": tokens}
+
+        if used + cost > budget:
+            remaining = budget - used - (separator_tokens if parts else 0)
+            if parts or remaining < MIN_SPAN_TOKENS:
+                report["dropped"].append(summary)
+                continue
+            # Nejrelevantnější úsek se vloží alespoň zkrácený
+            text = truncate_tokens(text, remaining, model)
+            tokens = cost = count_tokens(text, model)
+            summary = {**summary, "tokens": tokens, "truncated": True}
+
+        parts.append(text)
+        used += cost
+        report["included"].append(summary)
+
+    report["tokens"] = used
+    if report["dropped"]:
+        print(f"Kontext: vloženo {len(report['included'])} úseků ({used}/{budget} tokenů), "
+              f"vynecháno {len(report['dropped'])}")
+    return SEPARATOR.join(parts) if parts else EMPTY_CONTEXT, report
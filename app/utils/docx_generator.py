@@ -1,14 +1,53 @@
 """
 Utilita pro generování DOCX dokumentů.
+
+Dokument lze vytvořit najednou (``create_proposal_document``) nebo postupně
+po sekcích, jak přicházejí ze streamované odpovědi LLM
+(``ProposalDocumentBuilder``). Po úpravě několika sekcí se v uloženém
+dokumentu přepíše jen jejich text (``update_proposal_document``).
 """
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, List
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
 from datetime import datetime
 
+# Sekce nabídky v pořadí dokumentu: klíč dat, nadpis a zda začíná na nové straně
+DOCUMENT_SECTIONS: List[Tuple[str, str, bool]] = [
+    ("introduction", "1. Úvod", True),
+    ("solution_description", "2. Popis řešení", True),
+    ("scope_of_work", "3. Rozsah prací", False),
+    ("timeline", "4. Harmonogram", False),
+    ("pricing", "5. Cenová nabídka", False),
+    ("contact_info", "6. Kontaktní informace", True)
+]
+SECTION_BY_KEY = {section[0]: section for section in DOCUMENT_SECTIONS}
+
+def section_text(value: Any) -> str:
+    """
+    Převede hodnotu sekce z odpovědi LLM na text dokumentu.
+    
+    Seznamy se vypíšou po řádcích a slovníky jako řádky ``klíč: hodnota``,
+    místo reprezentace Pythonu.
+    
+    Args:
+        value: Hodnota sekce
+        
+    Returns:
+        str: Text sekce
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(f"{key}: {section_text(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return "\n".join(section_text(item) for item in value)
+    return str(value)
+
 def create_proposal_document(
     data: Dict[str, Any],
     template_path: Optional[str] = None,
@@ -25,17 +64,82 @@ def create_proposal_document(
     Returns:
         str: Cesta k vytvořenému dokumentu
     """
-    # Pokud je zadána cesta k šabloně a šablona existuje, použijeme ji
-    if template_path and os.path.exists(template_path):
-        doc = Document(template_path)
-    else:
-        # Jinak vytvoříme nový dokument
-        doc = Document()
-        setup_document_styles(doc)
+    doc = new_document(template_path)
     
     # Vyplnění dokumentu daty
     fill_document_with_data(doc, data)
     
+    return save_document(doc, data, output_path)
+
+def update_proposal_document(
+    document_path: Optional[str],
+    data: Dict[str, Any],
+    keys: List[str],
+    output_path: Optional[str] = None
+) -> str:
+    """
+    Přepíše v uloženém dokumentu text vybraných sekcí.
+    
+    Ostatní obsah dokumentu se převezme beze změny. Pokud dokument
+    neexistuje, v dokumentu chybí nadpis některé sekce nebo se změnil
+    název klienta na titulní straně, vytvoří se dokument znovu celý.
+    
+    Args:
+        document_path: Cesta k dříve vytvořenému dokumentu
+        data: Data nabídky (včetně upravených sekcí)
+        keys: Klíče upravených sekcí
+        output_path: Cesta pro uložení upraveného dokumentu (volitelné)
+        
+    Returns:
+        str: Cesta k upravenému dokumentu
+    """
+    if not document_path or not os.path.exists(document_path) or "client_name" in keys:
+        return create_proposal_document(data, output_path=output_path)
+    
+    doc = Document(document_path)
+    paragraphs = doc.paragraphs
+    headings = {p.text: i for i, p in enumerate(paragraphs)}
+    for key in keys:
+        index = headings.get(SECTION_BY_KEY[key][1])
+        if index is None or index + 1 >= len(paragraphs):
+            print(f"V dokumentu chybí sekce {key}, vytvářím dokument znovu")
+            return create_proposal_document(data, output_path=output_path)
+        # Text sekce je odstavec hned za jejím nadpisem (viz add_section)
+        paragraphs[index + 1].text = section_text(data.get(key))
+    
+    return save_document(doc, data, output_path)
+
+def new_document(template_path: Optional[str] = None) -> Document:
+    """
+    Vytvoří prázdný dokument ze šablony nebo s výchozími styly.
+    
+    Args:
+        template_path: Cesta k šabloně (volitelné)
+        
+    Returns:
+        Document: Dokument
+    """
+    # Pokud je zadána cesta k šabloně a šablona existuje, použijeme ji
+    if template_path and os.path.exists(template_path):
+        return Document(template_path)
+    
+    # Jinak vytvoříme nový dokument
+    doc = Document()
+    setup_document_styles(doc)
+    return doc
+
+def save_document(doc: Document, data: Dict[str, Any], output_path: Optional[str] = None) -> str:
+    """
+    Uloží dokument nabídky.
+    
+    Args:
+        doc: Dokument
+        data: Data nabídky (název klienta pro výchozí název souboru)
+        output_path: Cesta pro uložení dokumentu (volitelné)
+        
+    Returns:
+        str: Cesta k uloženému dokumentu
+    """
     # Pokud není zadána cesta pro uložení, vytvoříme ji
     if not output_path:
         client_name = data.get("client_name", "klient").replace(" ", "_")
@@ -112,49 +216,109 @@ def fill_document_with_data(doc: Document, data: Dict[str, Any]) -> None:
     add_title_page(doc, data)
     
     # Přidání obsahu
-    doc.add_page_break()
-    p = doc.add_paragraph("Obsah")
-    p.style = 'CustomHeading1'
-    doc.add_paragraph("Tento obsah bude automaticky vygenerován při otevření dokumentu.")
+    add_table_of_contents(doc)
     
-    # Přidání úvodu
-    doc.add_page_break()
-    p = doc.add_paragraph("1. Úvod")
-    p.style = 'CustomHeading1'
-    
-    p = doc.add_paragraph(data.get("introduction", ""))
+    # Přidání sekcí nabídky
+    for key, _, _ in DOCUMENT_SECTIONS:
+        add_section(doc, key, data.get(key, ""))
+
+def add_table_of_contents(doc: Document) -> None:
+    """
+    Přidá stranu s obsahem.
     
-    # Přidání popisu řešení
+    Args:
+        doc: Dokument
+    """
     doc.add_page_break()
-    p = doc.add_paragraph("2. Popis řešení")
+    p = doc.add_paragraph("Obsah")
     p.style = 'CustomHeading1'
+    doc.add_paragraph("Tento obsah bude automaticky vygenerován při otevření dokumentu.")
+
+def add_section(doc: Document, key: str, text: str) -> None:
+    """
+    Přidá sekci nabídky (nadpis a text).
     
-    p = doc.add_paragraph(data.get("solution_description", ""))
-    
-    # Přidání rozsahu prací
-    p = doc.add_paragraph("3. Rozsah prací")
+    Args:
+        doc: Dokument
+        key: Klíč sekce z DOCUMENT_SECTIONS
+        text: Text sekce
+    """
+    _, title, page_break = SECTION_BY_KEY[key]
+    if page_break:
+        doc.add_page_break()
+    p = doc.add_paragraph(title)
     p.style = 'CustomHeading1'
     
-    p = doc.add_paragraph(data.get("scope_of_work", ""))
-    
-    # Přidání harmonogramu
-    p = doc.add_paragraph("4. Harmonogram")
-    p.style = 'CustomHeading1'
+    doc.add_paragraph(text)
+
+class ProposalDocumentBuilder:
+    """
+    Postupné sestavení dokumentu nabídky ze sekcí, jak přicházejí.
     
-    p = doc.add_paragraph(data.get("timeline", ""))
+    Sekce se do dokumentu zapisují v pořadí DOCUMENT_SECTIONS; sekce, která
+    dorazí dřív než předchozí, počká. Titulní strana se zapíše po příchodu
+    názvu klienta. ``finish`` doplní zbývající sekce a dokument uloží.
+    """
     
-    # Přidání cenové nabídky
-    p = doc.add_paragraph("5. Cenová nabídka")
-    p.style = 'CustomHeading1'
+    def __init__(self, template_path: Optional[str] = None):
+        self.template_path = template_path
+        self.doc = new_document(template_path)
+        # Hodnoty přijatých klíčů (převedené na text)
+        self.data: Dict[str, str] = {}
+        self.written = 0
+        self.title_written = False
     
-    p = doc.add_paragraph(data.get("pricing", ""))
+    def add_section(self, key: str, value: Any) -> None:
+        """
+        Přijme hotovou sekci a zapíše do dokumentu vše, co už zapsat lze.
+        
+        Args:
+            key: Klíč sekce (nebo client_name)
+            value: Hodnota z odpovědi LLM
+        """
+        self.data[key] = section_text(value)
+        self._write_ready(self.data)
     
-    # Přidání kontaktních informací
-    doc.add_page_break()
-    p = doc.add_paragraph("6. Kontaktní informace")
-    p.style = 'CustomHeading1'
+    def _write_ready(self, data: Dict[str, Any]) -> None:
+        """Zapíše titulní stranu a sekce, jejichž předchozí sekce už jsou zapsané."""
+        if not self.title_written:
+            if "client_name" not in data:
+                return
+            add_title_page(self.doc, data)
+            add_table_of_contents(self.doc)
+            self.title_written = True
+        while self.written < len(DOCUMENT_SECTIONS):
+            key = DOCUMENT_SECTIONS[self.written][0]
+            if key not in data:
+                return
+            add_section(self.doc, key, data[key])
+            self.written += 1
     
-    p = doc.add_paragraph(data.get("contact_info", ""))
+    def finish(self, data: Dict[str, Any], output_path: Optional[str] = None) -> str:
+        """
+        Dokončí a uloží dokument.
+        
+        Pokud se finální data liší od už zapsaných sekcí (např. doplněné
+        chybějící klíče), dokument se vytvoří znovu celý.
+        
+        Args:
+            data: Finální data nabídky
+            output_path: Cesta pro uložení dokumentu (volitelné)
+            
+        Returns:
+            str: Cesta k vytvořenému dokumentu
+        """
+        written_keys = ["client_name", "logo_path", "date", "version"] if self.title_written else []
+        written_keys += [key for key, _, _ in DOCUMENT_SECTIONS[:self.written]]
+        if any(data.get(key) != self.data.get(key) for key in written_keys):
+            print("Data nabídky se od streamovaných sekcí liší, vytvářím dokument znovu")
+            return create_proposal_document(data, self.template_path, output_path)
+        
+        remaining = {key: "" for key, _, _ in DOCUMENT_SECTIONS}
+        remaining.update(data)
+        remaining.setdefault("client_name", "klienta")
+        self._write_ready(remaining)
+        return save_document(self.doc, data, output_path)
 
 def add_title_page(doc: Document, data: Dict[str, Any]) -> None:
     """
@@ -0,0 +1,217 @@
+"""
+Deterministické náhrady LLM a embedding modelu bez volání API.
+
+Volí se v konfiguraci (``LLM_PROVIDER=fake``, ``EMBEDDING_PROVIDER=fake``)
+a umožňují spustit celý tok CLI bez přístupu k síti, například v CI nebo
+v benchmarcích. Odpověď i simulovaná latence závisí jen na promptu a na
+``FAKE_LLM_SEED``, takže opakované běhy dávají stejné výsledky.
+
+Odpovědi vznikají ze šablon podle kroku, který se pozná ze systémové
+zprávy (analýza poptávky, sběr informací, extrakce JSON, data nabídky,
+dogenerování sekce nabídky, přehled poptávky, shrnutí historie). Šablony lze předběhnout skriptem
+(``FAKE_LLM_SCRIPT``): JSON soubor se seznamem pravidel
+``{"match": "text v promptu", "response": "odpověď nebo JSON objekt"}``,
+použije se první pravidlo, jehož ``match`` se v promptu vyskytuje.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+# Otázky, které náhradní model klade při sběru informací
+FAKE_QUESTIONS = [
+    "Kolik uživatelů a identit bude MidPoint spravovat?",
+    "S jakými systémy má být MidPoint integrován (AD, HR systém, SAP)?",
+    "Do kdy potřebujete implementaci dokončit?",
+    "Jaký je orientační rozpočet projektu?",
+    "Máte specifické požadavky na schvalovací workflow nebo audit?"
+]
+
+def load_script(path: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Načte skript odpovědí náhradního modelu.
+
+    Args:
+        path: Cesta k JSON souboru se seznamem pravidel (prázdná = bez skriptu)
+
+    Returns:
+        List[Dict[str, Any]]: Pravidla s klíči match a response
+    """
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Skript {path} musí obsahovat seznam pravidel")
+    return rules
+
+def _snippet(text: str, length: int = 200) -> str:
+    """Vrátí začátek textu bez nadbytečných mezer."""
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[:length].rstrip() + "..."
+
+class FakeChatModel(BaseChatModel):
+    """
+    Náhradní chat model s deterministickými odpověďmi a latencí.
+
+    Latence má log-normální rozdělení s mediánem ``latency_ms`` a parametrem
+    ``latency_jitter`` (0 = konstantní latence). Při streamování připadne
+    polovina latence na první token a zbytek se rozloží mezi další úseky.
+    """
+
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    model_kwargs: Dict[str, Any] = Field(default_factory=dict)
+    latency_ms: float = 0.0
+    latency_jitter: float = 0.0
+    seed: int = 0
+    script: List[Dict[str, Any]] = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "bidmaster-fake"
+
+    def _prompt_key(self, messages: List[BaseMessage]) -> str:
+        """Vrátí hash promptu (základ pro odpověď i latenci)."""
+        payload = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False)
+        return hashlib.sha1(f"{self.seed}:{payload}".encode("utf-8")).hexdigest()
+
+    def _latency(self, key: str) -> float:
+        """Vrátí simulovanou latenci v sekundách."""
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.latency_jitter <= 0:
+            return self.latency_ms / 1000
+        return self.latency_ms * random.Random(key).lognormvariate(0.0, self.latency_jitter) / 1000
+
+    def _respond(self, messages: List[BaseMessage], key: str) -> str:
+        """Vrátí text odpovědi podle skriptu nebo šablon."""
+        system = "\n".join(str(m.content) for m in messages if m.type == "system")
+        human = "\n".join(str(m.content) for m in messages if m.type != "system")
+
+        for rule in self.script:
+            if rule.get("match", "") in system + human:
+                response = rule["response"]
+                return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+        json_mode = (self.model_kwargs.get("response_format") or {}).get("type") == "json_object"
+        if json_mode or "JSON" in system:
+            return json.dumps(self._json_answer(system, human, key), ensure_ascii=False)
+        return self._text_answer(system, human, key)
+
+    def _text_answer(self, system: str, human: str, key: str) -> str:
+        """Šablona textové odpovědi."""
+        if "Chybějící informace" in system:
+            return (
+                f"1. Shrnutí poptávky\n{_snippet(human, 300)}\n\n"
+                "2. Chybějící informace\n"
+                "- Počet uživatelů a identit\n- Integrované systémy\n- Požadovaný termín dokončení\n- Rozpočet"
+            )
+        if "Napiš pouze sekci" in system:
+            section = system.split("Napiš pouze sekci nabídky:")[-1].split("\n")[0].strip(" .")
+            return f"{section}: {_snippet(human.split('Poptávka klienta:')[-1], 150)}"
+        if "shrnuješ konverzaci" in system:
+            return f"- {_snippet(human, 300)}"
+        question = FAKE_QUESTIONS[int(key[:8], 16) % len(FAKE_QUESTIONS)]
+        return f"Děkuji, informace jsem si poznamenal.\n\n{question}"
+
+    def _json_answer(self, system: str, human: str, key: str) -> Dict[str, Any]:
+        """Šablona JSON odpovědi."""
+        if "client_name" in system and "introduction" in system:
+            match = re.search(r"Název klienta:\s*(.+)", human)
+            client_name = match.group(1).strip() if match else "Klient"
+            request = human.split("Poptávka klienta:")[-1].split("Název klienta:")[0]
+            return {
+                "client_name": client_name,
+                "introduction": f"Děkujeme za poptávku společnosti {client_name}. {_snippet(request, 150)}",
+                "solution_description": "MidPoint zajistí centrální správu identit, rolí a přístupových oprávnění.",
+                "scope_of_work": "1. Analýza\n2. Instalace a konfigurace\n3. Integrace\n4. Školení",
+                "timeline": "Analýza: 2 týdny\nImplementace: 8 týdnů\nTestování a nasazení: 4 týdny",
+                "pricing": "Analýza: 200 000 Kč\nImplementace: 1 200 000 Kč\nŠkolení: 100 000 Kč",
+                "contact_info": "BidMaster, obchod@example.com"
+            }
+        if "Určuješ, kterých sekcí" in system:
+            return {"sections": re.findall(r"- (\w+):", system)[:1]}
+        if "odpoved" in system:
+            return {
+                "odpoved": self._text_answer("", human, key),
+                "data": {"specificke_pozadavky": _snippet(human.split("Poslední zpráva od uživatele:")[-1], 100)}
+            }
+        if "shrnuti" in system and "pozadavky" in system:
+            lines = [line.strip() for line in human.splitlines() if len(line.strip()) > 20]
+            return {
+                "shrnuti": _snippet(human.replace("Poptávka klienta:", ""), 200),
+                "pozadavky": [_snippet(line, 120) for line in lines[1:4]],
+                "moduly": [],
+                "integrace": [],
+                "terminy": [],
+                "pocet_uzivatelu": "",
+                "rozpocet": "",
+                "dalsi": []
+            }
+        if "rozsah_implementace" in system:
+            return {"specificke_pozadavky": _snippet(human.replace("Odpověď uživatele:", ""), 100)}
+        return {}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        key = self._prompt_key(messages)
+        content = self._respond(messages, key)
+        time.sleep(self._latency(key))
+        message = AIMessage(content=content, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = self._prompt_key(messages)
+        content = self._respond(messages, key)
+        latency = self._latency(key)
+        pieces = re.findall(r"\S+\s*|\s+", content) or [content]
+
+        time.sleep(latency / 2)
+        for piece in pieces:
+            time.sleep(latency / 2 / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministický embedding model bez volání API.
+
+    Text se rozdělí na slova, každé slovo se zahashuje do jedné z ``dimension``
+    přihrádek a výsledný vektor se normalizuje. Podobné texty tak mají
+    podobné vektory, což stačí pro vyhledávání v testech a měření režie.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,160 @@
+"""
+Žurnál importu nabídek pro navázání přerušeného importu.
+
+Žurnál je JSONL soubor, do kterého se po každé úspěšně uložené dávce
+zapíše záznam (a provede fsync). Při opakovaném spuštění s ``--resume``
+se přeskočí soubory a dávky, které už jsou ve vektorové databázi.
+Protože ID vektorů jsou deterministická (hash obsahu souboru + pořadí
+chunku), je opakovaný upsert stejné dávky neškodný.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+# Výchozí adresář pro žurnály importu
+JOURNAL_DIR = "data/import_journal"
+
+def file_sha1(file_path: str) -> str:
+    """
+    Spočítá SHA-1 hash obsahu souboru.
+
+    Args:
+        file_path: Cesta k souboru
+
+    Returns:
+        str: Hexadecimální hash obsahu
+    """
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_chunk_id(file_hash: str, chunk_index: int) -> str:
+    """
+    Vytvoří deterministické ID vektoru pro chunk souboru.
+
+    Args:
+        file_hash: Hash obsahu souboru
+        chunk_index: Pořadí chunku v souboru
+
+    Returns:
+        str: ID vektoru
+    """
+    return f"{file_hash[:20]}-{chunk_index:05d}"
+
+def default_journal_path(source: str, namespace: Optional[str]) -> str:
+    """
+    Vrátí výchozí cestu k žurnálu pro daný zdroj a namespace.
+
+    Args:
+        source: Adresář nebo soubor, ze kterého se importuje
+        namespace: Cílový namespace
+
+    Returns:
+        str: Cesta k souboru žurnálu
+    """
+    key = f"{os.path.abspath(source)}|{namespace or ''}"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(JOURNAL_DIR, f"import_{name}.jsonl")
+
+class ImportJournal:
+    """Append-only žurnál dokončených souborů a dávek importu."""
+
+    def __init__(self, path: str, settings: Dict[str, Any], resume: bool = False):
+        """
+        Otevře žurnál.
+
+        Args:
+            path: Cesta k souboru žurnálu
+            settings: Nastavení importu (velikost chunků a dávek, namespace);
+                při navázání musí odpovídat nastavení uloženému v žurnálu
+            resume: Zda navázat na existující žurnál, jinak se začne znovu
+        """
+        self.path = path
+        self.settings = settings
+        self.completed_files: Set[str] = set()
+        self.completed_batches: Dict[str, Set[int]] = {}
+        self._started = False
+
+        Path(os.path.dirname(path) or ".").mkdir(parents=True, exist_ok=True)
+
+        if resume and os.path.exists(path):
+            self._load()
+        else:
+            # Nový import - začínáme s prázdným žurnálem
+            with open(path, "w", encoding="utf-8"):
+                pass
+
+        if not self._started:
+            self._append({"event": "start", "settings": settings})
+            self._started = True
+
+    def _load(self) -> None:
+        """Načte stav z existujícího žurnálu."""
+        records: List[Dict[str, Any]] = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Poslední řádek mohl zůstat nedopsaný po pádu procesu
+                    print(f"Varování: Poškozený záznam v žurnálu {self.path} byl přeskočen.")
+
+        start = next((r for r in records if r.get("event") == "start"), None)
+        if start and start.get("settings") != self.settings:
+            print("Varování: Nastavení importu se od minulého běhu změnilo, žurnál nelze použít. Začínám znovu.")
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+            return
+
+        self._started = start is not None
+        for record in records:
+            if record.get("event") == "batch":
+                self.completed_batches.setdefault(record["file_hash"], set()).add(record["batch"])
+            elif record.get("event") == "file":
+                self.completed_files.add(record["file_hash"])
+
+        print(f"Navazuji na žurnál {self.path}: {len(self.completed_files)} dokončených souborů, "
+              f"{sum(len(b) for b in self.completed_batches.values())} uložených dávek.")
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Trvale zapíše záznam do žurnálu."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def is_file_done(self, file_hash: str) -> bool:
+        """Vrátí True, pokud byl soubor již celý importován."""
+        return file_hash in self.completed_files
+
+    def is_batch_done(self, file_hash: str, batch_index: int) -> bool:
+        """Vrátí True, pokud byla dávka souboru již uložena."""
+        return batch_index in self.completed_batches.get(file_hash, set())
+
+    def mark_batch(self, file_path: str, file_hash: str, batch_index: int, ids: List[str]) -> None:
+        """Zaznamená uloženou dávku."""
+        self._append({
+            "event": "batch",
+            "file": file_path,
+            "file_hash": file_hash,
+            "batch": batch_index,
+            "ids": ids
+        })
+        self.completed_batches.setdefault(file_hash, set()).add(batch_index)
+
+    def mark_file(self, file_path: str, file_hash: str, chunk_count: int) -> None:
+        """Zaznamená dokončený soubor."""
+        self._append({
+            "event": "file",
+            "file": file_path,
+            "file_hash": file_hash,
+            "chunks": chunk_count
+        })
+        self.completed_files.add(file_hash)
@@ -7,19 +7,20 @@ import sys
 import json
 import argparse
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import docx
 import re
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except ImportError:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from dotenv import load_dotenv
-from langchain_pinecone import PineconeVectorStore
 from langchain_community.document_loaders import (
     PyPDFLoader,
     Docx2txtLoader,
     JSONLoader
 )
-import pinecone
 
 # Přidání podpory pro PDF
 try:
@@ -36,25 +37,42 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from app.utils.vector_store import (
     init_vector_store,
+    get_vector_store,
     add_documents_to_vector_store,
     get_embeddings
 )
+from app.utils.import_journal import (
+    ImportJournal,
+    default_journal_path,
+    file_sha1,
+    make_chunk_id
+)
+from app.utils.pdf_ocr import extract_pdf_pages
+from app.utils.rate_limiter import traffic_priority
 from app.config import get_config
 
 config = get_config()
 
 load_dotenv()
 
-def init_pinecone() -> PineconeVectorStore:
-    """Inicializace Pinecone."""
-    pinecone.init(
-        api_key=os.getenv("PINECONE_API_KEY", ""),
-        environment=os.getenv("PINECONE_ENV", "")
-    )
-    return PineconeVectorStore(
-        index_name=os.getenv("PINECONE_INDEX", "bidmaster"),
-        namespace=os.getenv("PINECONE_NAMESPACE", "proposals")
-    )
+# Parametry chunkingu pro import nabídek
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+# Počet chunků, které se embedují a ukládají v jednom volání
+DEFAULT_BATCH_SIZE = 50
+
+SUPPORTED_EXTENSIONS = ('.docx', '.json', '.pdf')
+
+# Textové sekce strukturované nabídky ve formátu JSON
+PROPOSAL_SECTION_KEYS = (
+    "introduction",
+    "solution_description",
+    "scope_of_work",
+    "timeline",
+    "pricing",
+    "contact_info"
+)
 
 def load_document(file_path: str) -> List[Dict[str, Any]]:
     """
@@ -94,15 +112,9 @@ def process_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: Zpracované dokumenty
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
-        length_function=len
-    )
-    
     processed_docs = []
     for doc in documents:
-        chunks = text_splitter.split_text(doc.page_content)
+        chunks = split_text(doc.page_content)
         for i, chunk in enumerate(chunks):
             processed_docs.append({
                 "page_content": chunk,
@@ -114,31 +126,173 @@ def process_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             })
     return processed_docs
 
-def import_proposals(file_paths: List[str]) -> None:
+def split_text(text: str) -> List[str]:
+    """
+    Rozdělí text na chunky pro import.
+    
+    Args:
+        text: Text k rozdělení
+        
+    Returns:
+        List[str]: Seznam chunků
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len
+    )
+    return text_splitter.split_text(text)
+
+def process_file(file_path: str) -> Optional[Dict[str, Any]]:
     """
-    Importuje návrhy do vektorové databáze.
+    Zpracuje soubor podle jeho typu.
     
     Args:
-        file_paths: Seznam cest k souborům
+        file_path: Cesta k souboru
+        
+    Returns:
+        Optional[Dict[str, Any]]: Slovník s textem a metadaty, nebo None pro nepodporovaný typ
     """
-    vectorstore = init_pinecone()
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.docx':
+        return process_docx_file(file_path)
+    elif suffix == '.json':
+        return process_json_file(file_path)
+    elif suffix == '.pdf':
+        return process_pdf_file(file_path)
+    return None
+
+def collect_files(source: Union[str, List[str]]) -> List[str]:
+    """
+    Vrátí seřazený seznam podporovaných souborů k importu.
     
-    for file_path in file_paths:
-        try:
-            # Načtení dokumentu
-            documents = load_document(file_path)
-            
-            # Zpracování dokumentů
-            processed_docs = process_documents(documents)
+    Args:
+        source: Adresář, soubor nebo seznam souborů
+        
+    Returns:
+        List[str]: Seznam cest k souborům
+    """
+    if isinstance(source, (list, tuple)):
+        return [str(path) for path in source]
+    
+    if os.path.isfile(source):
+        return [source]
+    
+    file_paths = []
+    for root, _, files in os.walk(source):
+        for file in files:
+            if file.startswith('.'):
+                continue
+            if Path(file).suffix.lower() in SUPPORTED_EXTENSIONS:
+                file_paths.append(os.path.join(root, file))
+    
+    # Stabilní pořadí je nutné pro navázání přerušeného importu
+    return sorted(file_paths)
+
+def import_proposals(
+    source: Union[str, List[str]],
+    namespace: Optional[str] = None,
+    resume: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    journal_path: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Importuje nabídky do vektorové databáze po dávkách se žurnálem.
+    
+    Po každé uložené dávce se do žurnálu zapíše záznam, takže přerušený
+    import lze s ``resume=True`` dokončit bez opakovaného placení za
+    embeddings již uložených dávek.
+    
+    Args:
+        source: Adresář, soubor nebo seznam souborů s nabídkami
+        namespace: Namespace pro vektorovou databázi (volitelné)
+        resume: Zda navázat na žurnál předchozího běhu
+        batch_size: Počet chunků v jedné dávce
+        journal_path: Cesta k žurnálu (volitelné)
+        
+    Returns:
+        Dict[str, int]: Statistika importu
+    """
+    if namespace is None:
+        namespace = os.getenv("PINECONE_NAMESPACE", "proposals")
+    
+    if isinstance(source, str) and not os.path.exists(source):
+        print(f"Cesta {source} neexistuje")
+        return {"files": 0, "skipped_files": 0, "batches": 0, "skipped_batches": 0, "chunks": 0}
+    
+    if journal_path is None:
+        journal_key = source if isinstance(source, str) else "|".join(sorted(str(path) for path in source))
+        journal_path = default_journal_path(journal_key, namespace)
+    
+    journal = ImportJournal(
+        journal_path,
+        settings={
+            "namespace": namespace,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "batch_size": batch_size
+        },
+        resume=resume
+    )
+    
+    stats = {"files": 0, "skipped_files": 0, "batches": 0, "skipped_batches": 0, "chunks": 0}
+    vector_store = None
+    
+    for file_path in collect_files(source):
+        file_hash = file_sha1(file_path)
+        if journal.is_file_done(file_hash):
+            stats["skipped_files"] += 1
+            continue
+        
+        doc = process_file(file_path)
+        if not doc or not doc["text"] or doc["metadata"].get("error"):
+            print(f"Soubor {file_path} byl přeskočen.")
+            continue
+        
+        chunks = split_text(doc["text"])
+        documents = [
+            Document(
+                page_content=chunk,
+                metadata={**doc["metadata"], "chunk_id": i, "total_chunks": len(chunks)}
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        ids = [make_chunk_id(file_hash, i) for i in range(len(chunks))]
+        
+        for batch_index, start in enumerate(range(0, len(documents), batch_size)):
+            if journal.is_batch_done(file_hash, batch_index):
+                stats["skipped_batches"] += 1
+                continue
             
-            # Import do Pinecone
-            vectorstore.add_documents(processed_docs)
+            if vector_store is None:
+                vector_store = get_vector_store(namespace=namespace)
             
-            print(f"Úspěšně importován soubor: {file_path}")
+            batch_ids = ids[start:start + batch_size]
+            # Import má před interaktivními relacemi a dávkami nejnižší prioritu
+            with traffic_priority("ingest"):
+                added_ids = add_documents_to_vector_store(
+                    vector_store,
+                    documents=documents[start:start + batch_size],
+                    namespace=namespace,
+                    ids=batch_ids
+                )
+            if len(added_ids) != len(batch_ids):
+                raise RuntimeError(
+                    f"Dávka {batch_index + 1} souboru {file_path} nebyla uložena celá. "
+                    "Import lze dokončit opětovným spuštěním s přepínačem --resume."
+                )
             
-        except Exception as e:
-            print(f"Chyba při importu souboru {file_path}: {e}")
-            raise
+            journal.mark_batch(file_path, file_hash, batch_index, batch_ids)
+            stats["batches"] += 1
+            stats["chunks"] += len(batch_ids)
+        
+        journal.mark_file(file_path, file_hash, len(chunks))
+        stats["files"] += 1
+        print(f"Úspěšně importován soubor: {file_path} ({len(chunks)} chunků)")
+    
+    print(f"Import dokončen: {stats['files']} souborů, {stats['chunks']} chunků, "
+          f"přeskočeno {stats['skipped_files']} souborů a {stats['skipped_batches']} dávek z předchozích běhů.")
+    return stats
 
 def extract_text_from_docx(file_path: str) -> str:
     """
@@ -264,6 +418,9 @@ def extract_text_from_pdf(file_path: str) -> str:
     """
     Extrahuje text z PDF dokumentu.
     
+    Stránky bez textové vrstvy (naskenované dokumenty) se rozpoznají
+    pomocí OCR, viz ``app.utils.pdf_ocr``.
+    
     Args:
         file_path: Cesta k PDF dokumentu
         
@@ -275,26 +432,19 @@ def extract_text_from_pdf(file_path: str) -> str:
         return ""
     
     try:
-        reader = PdfReader(file_path)
-        text_parts = []
-        
-        # Extrakce textu ze všech stránek
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-        
-        return "\n\n".join(text_parts)
+        pages = extract_pdf_pages(file_path)
+        return "\n\n".join(text for text in pages if text)
     except Exception as e:
         print(f"Chyba při extrakci textu z PDF dokumentu {file_path}: {e}")
         return ""
 
-def extract_metadata_from_pdf(file_path: str) -> Dict[str, Any]:
+def extract_metadata_from_pdf(file_path: str, text: Optional[str] = None) -> Dict[str, Any]:
     """
     Extrahuje metadata z PDF dokumentu.
     
     Args:
         file_path: Cesta k PDF dokumentu
+        text: Již extrahovaný text dokumentu (volitelné, ušetří opakovanou extrakci)
         
     Returns:
         Dict[str, Any]: Extrahovaná metadata
@@ -333,7 +483,8 @@ def extract_metadata_from_pdf(file_path: str) -> Dict[str, Any]:
                 metadata["creation_date"] = str(pdf_info.creation_date)
         
         # Extrakce textu pro další analýzu
-        text = extract_text_from_pdf(file_path)
+        if text is None:
+            text = extract_text_from_pdf(file_path)
         
         # Pokus o extrakci názvu klienta
         client_pattern = re.compile(r"pro\s+(.+?)(?:\s+ze\s+dne|\s*$)")
@@ -383,7 +534,7 @@ def process_pdf_file(file_path: str) -> Dict[str, Any]:
         MAX_TEXT_SIZE = 50 * 1024
         
         text = extract_text_from_pdf(file_path)
-        metadata = extract_metadata_from_pdf(file_path)
+        metadata = extract_metadata_from_pdf(file_path, text)
         
         # Přidání cesty k souboru do metadat
         metadata["source"] = file_path
@@ -424,7 +575,20 @@ def process_json_file(file_path: str) -> Dict[str, Any]:
         
         # Kontrola, zda JSON obsahuje požadované klíče
         if "text" not in data:
-            raise ValueError("JSON neobsahuje klíč 'text'")
+            # Strukturovaná nabídka (viz example_proposal.json) - text složíme ze sekcí
+            sections = [data[key] for key in PROPOSAL_SECTION_KEYS if isinstance(data.get(key), str)]
+            if not sections:
+                raise ValueError("JSON neobsahuje klíč 'text' ani sekce nabídky")
+            data = {
+                "text": "\n\n".join(sections),
+                "metadata": {
+                    **data.get("metadata", {}),
+                    "title": os.path.basename(file_path),
+                    "client_name": data.get("client_name", ""),
+                    "date": data.get("date", ""),
+                    "version": data.get("version", "")
+                }
+            }
         
         text = data["text"]
         
@@ -498,10 +662,12 @@ def main():
     parser = argparse.ArgumentParser(description="Import nabídek do vektorové databáze")
     parser.add_argument("directory", help="Cesta k adresáři s nabídkami")
     parser.add_argument("--namespace", help="Namespace pro vektorovou databázi", default=None)
+    parser.add_argument("--resume", action="store_true", help="Navázat na přerušený import podle žurnálu")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Počet chunků v jedné dávce")
     
     args = parser.parse_args()
     
-    import_proposals(args.directory, args.namespace)
+    import_proposals(args.directory, args.namespace, resume=args.resume, batch_size=args.batch_size)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Lokální oprava téměř validního JSON z odpovědí LLM.
+
+Model občas vrátí JSON obalený blokem kódu, s čárkou před koncem objektu,
+s neescapovanými uvozovkami nebo zalomením řádku v textu, nebo odpověď
+utne uprostřed posledního řetězce. ``repair_json`` takové chyby opraví
+jedním průchodem textem bez dalšího volání LLM:
+
+- odstraní značky bloku kódu a text před JSON a za ním,
+- escapuje zalomení řádků a řídicí znaky uvnitř řetězců,
+- uvozovku uvnitř textu escapuje, chybějící čárku mezi položkami doplní,
+- odstraní čárku před ``}`` a ``]`` a opraví nespárované závorky,
+- uzavře useknutý řetězec a otevřené závorky; pokud ani pak JSON nejde
+  načíst, zahodí neúplnou poslední položku.
+"""
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE = re.compile(r"```[A-Za-z]*[ \t]*\n?(.*?)(?:```|$)", re.S)
+_CLOSERS = {"{": "}", "[": "]"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+def _next_non_space(text: str, start: int) -> Optional[int]:
+    """Vrátí index dalšího znaku, který není mezera, nebo None."""
+    for i in range(start, len(text)):
+        if not text[i].isspace():
+            return i
+    return None
+
+def _is_key_ahead(text: str, quote: int) -> bool:
+    """Zda řetězec začínající na indexu ``quote`` je klíč objektu (následuje dvojtečka)."""
+    i = quote + 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == '"':
+            following = _next_non_space(text, i + 1)
+            return following is not None and text[following] == ":"
+        if text[i] == "\n":
+            return False
+        i += 1
+    return False
+
+def _strip_trailing_comma(out: List[str]) -> bool:
+    """Odstraní čárku (a mezery za ní) na konci výstupu; vrátí, zda tam byla."""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+        return True
+    return False
+
+def _extract(text: str, fixes: List[str]) -> str:
+    """Vrátí text od první otevírací závorky, bez značek bloku kódu."""
+    if "```" in text:
+        match = _FENCE.search(text)
+        if match and ("{" in match.group(1) or "[" in match.group(1)):
+            text = match.group(1)
+            fixes.append("fences")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("Odpověď neobsahuje JSON objekt ani pole")
+    start = min(starts)
+    if text[:start].strip():
+        fixes.append("surrounding_text")
+    return text[start:]
+
+def _key_position(out: List[str], stack: List[str]) -> bool:
+    """Zda na konci výstupu může začít klíč objektu (za ``{`` nebo ``,`` uvnitř objektu)."""
+    if stack[-1:] != ["{"]:
+        return False
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    return i >= 0 and out[i] in "{,"
+
+def _scan(text: str, fixes: List[str],
+          split_values: bool = True) -> Tuple[List[str], List[str], List[Tuple[int, List[str]]], bool]:
+    """
+    Projde text a opraví chyby, které lze opravit lokálně.
+
+    Args:
+        text: Text od první otevírací závorky
+        fixes: Seznam, do kterého se zapisují provedené opravy
+        split_values: Uvozovku před dalším klíčem považovat za chybějící čárku
+            (jinak se escapuje jako uvozovka uvnitř textu)
+
+    Returns:
+        Tuple: výstup po znacích, neuzavřené závorky, pozice čárek mezi položkami
+            (se závorkami otevřenými v tu chvíli) a zda text pokračuje za koncem JSON
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    commas: List[Tuple[int, List[str]]] = []
+    in_string = False
+    in_key = False
+    escape = False
+
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                out.append(char)
+                escape = False
+            elif char == "\\":
+                out.append(char)
+                escape = True
+            elif char == '"':
+                following = _next_non_space(text, i + 1)
+                if following is None or text[following] in ",}]" or (text[following] == ":" and in_key):
+                    out.append(char)
+                    in_string = False
+                elif split_values and text[following] == '"' and (stack[-1:] == ["["] or _is_key_ahead(text, following)):
+                    # Chybějící čárka mezi hodnotou a další položkou
+                    out.append(char)
+                    commas.append((len(out), list(stack)))
+                    out.append(",")
+                    in_string = False
+                    fixes.append("missing_comma")
+                else:
+                    # Uvozovka uvnitř textu
+                    out.append('\\"')
+                    fixes.append("inner_quotes")
+            elif char in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[char])
+                fixes.append("control_chars")
+            elif ord(char) < 0x20:
+                fixes.append("control_chars")
+            else:
+                out.append(char)
+            continue
+
+        if char == '"':
+            # Dvojtečka za uvozovkou ukončí jen řetězec na místě klíče
+            in_key = _key_position(out, stack)
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            if _strip_trailing_comma(out):
+                fixes.append("trailing_comma")
+            if not stack:
+                fixes.append("brackets")
+                continue
+            # Nespárovaná závorka uzavře i vnořené otevřené závorky
+            while len(stack) > 1 and _CLOSERS[stack[-1]] != char:
+                out.append(_CLOSERS[stack.pop()])
+                fixes.append("brackets")
+            opener = stack.pop()
+            if _CLOSERS[opener] != char:
+                fixes.append("brackets")
+            out.append(_CLOSERS[opener])
+            if not stack:
+                return out, stack, commas, bool(text[i + 1:].strip())
+        elif char == ",":
+            commas.append((len(out), list(stack)))
+            out.append(char)
+        else:
+            out.append(char)
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    return out, stack, commas, False
+
+def repair_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Načte JSON z odpovědi LLM, případně po lokální opravě.
+
+    Args:
+        text: Odpověď modelu
+
+    Returns:
+        Tuple[Any, List[str]]: Načtená hodnota a seznam provedených oprav
+            (prázdný, pokud byl JSON validní)
+
+    Raises:
+        ValueError: Pokud JSON nejde ani po opravě načíst
+    """
+    try:
+        return json.loads(text), []
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    prefix: List[str] = []
+    body = _extract(text or "", prefix)
+
+    # Pokud oprava s doplněnými čárkami nejde načíst, zkusí se uvozovky před
+    # domnělým klíčem escapovat jako text ("the "key": thing"); celé varianty
+    # mají přednost před zahozením neúplné poslední položky
+    full, partial = [], []
+    for split_values in (True, False):
+        fixes = list(prefix)
+        out, stack, commas, trailing = _scan(body, fixes, split_values)
+        if trailing:
+            fixes.append("surrounding_text")
+        full.append((out, len(out), stack, fixes))
+        if stack:
+            fixes.append("truncated")
+            # Záložní varianty bez neúplné poslední položky (od konce)
+            partial += [(out, end, open_brackets, fixes) for end, open_brackets in reversed(commas)]
+        if "missing_comma" not in fixes:
+            break
+
+    error = None
+    for out, end, open_brackets, fixes in full + partial:
+        chars = out[:end]
+        _strip_trailing_comma(chars)
+        candidate = "".join(chars).rstrip()
+        if candidate.endswith(":"):
+            continue
+        candidate += "".join(_CLOSERS[opener] for opener in reversed(open_brackets))
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = error or e
+            continue
+        # Každý druh opravy jednou, v pořadí výskytu
+        return value, list(dict.fromkeys(fixes))
+    raise ValueError(f"JSON nejde opravit: {error}")
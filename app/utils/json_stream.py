@@ -0,0 +1,171 @@
+"""
+Inkrementální parser JSON objektu ze streamované odpovědi LLM.
+
+Odpověď se parseru předává po částech (``feed``), jak přichází z modelu.
+Jakmile je hodnota některého klíče nejvyšší úrovně kompletní, parser ji
+vrátí, takže rozhraní může zobrazit hotové sekce nabídky a sestavení
+dokumentu může začít dřív, než dorazí konec odpovědi. Text před prvním
+``{`` (úvodní věta, značka bloku kódu) a za koncem objektu se ignoruje.
+
+Parser hlídá jen strukturu nejvyšší úrovně (klíče, dvojtečky, čárky);
+každá hodnota se po dokončení převede přes ``json.loads``. Po chybě
+ve struktuře zůstanou zachované klíče dokončené do té doby.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+class JsonObjectStream:
+    """Postupně parsovaný JSON objekt s hodnotami klíčů nejvyšší úrovně."""
+
+    def __init__(self):
+        # Dokončené klíče nejvyšší úrovně v pořadí, v jakém dorazily
+        self.data: Dict[str, Any] = {}
+        # Popis chyby ve struktuře objektu (parsování se zastaví)
+        self.error: Optional[str] = None
+        self._state = "start"
+        self._buffer: List[str] = []
+        self._key: Optional[str] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._scalar = False
+
+    @property
+    def complete(self) -> bool:
+        """Zda dorazil konec objektu bez chyby."""
+        return self._state == "done"
+
+    @property
+    def pending_key(self) -> Optional[str]:
+        """Klíč, jehož hodnota se právě načítá (nebo None)."""
+        return self._key if self._state == "value" else None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Zpracuje další část odpovědi.
+
+        Args:
+            text: Další část textu odpovědi
+
+        Returns:
+            List[Tuple[str, Any]]: Nově dokončené dvojice (klíč, hodnota)
+        """
+        completed: List[Tuple[str, Any]] = []
+        for char in text:
+            if self._state in ("done", "error"):
+                break
+            self._step(char, completed)
+        return completed
+
+    def _fail(self, message: str) -> None:
+        self.error = message
+        self._state = "error"
+
+    def _finish_value(self, completed: List[Tuple[str, Any]]) -> None:
+        """Převede načtenou hodnotu a zařadí ji mezi dokončené klíče."""
+        raw = "".join(self._buffer)
+        self._buffer = []
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self._fail(f"Neplatná hodnota klíče {self._key}: {e}")
+            return
+        self.data[self._key] = value
+        completed.append((self._key, value))
+        self._key = None
+
+    def _step(self, char: str, completed: List[Tuple[str, Any]]) -> None:
+        """Zpracuje jeden znak podle aktuálního stavu."""
+        state = self._state
+
+        if state == "start":
+            if char == "{":
+                self._state = "key_start"
+            return
+
+        if state in ("key_start", "after_value"):
+            if char.isspace():
+                return
+            if char == "}":
+                self._state = "done"
+            elif state == "after_value" and char == ",":
+                self._state = "key_start"
+            elif state == "key_start" and char == '"':
+                self._buffer = [char]
+                self._escape = False
+                self._state = "key"
+            else:
+                self._fail(f"Neočekávaný znak {char!r} mezi klíči objektu")
+            return
+
+        if state == "key":
+            self._buffer.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                try:
+                    self._key = json.loads("".join(self._buffer))
+                except json.JSONDecodeError as e:
+                    self._fail(f"Neplatný klíč: {e}")
+                    return
+                self._buffer = []
+                self._state = "colon"
+            return
+
+        if state == "colon":
+            if char == ":":
+                self._state = "value_start"
+            elif not char.isspace():
+                self._fail(f"Za klíčem {self._key} chybí dvojtečka")
+            return
+
+        if state == "value_start":
+            if char.isspace():
+                return
+            self._buffer = [char]
+            self._depth = 1 if char in "{[" else 0
+            self._in_string = char == '"'
+            self._escape = False
+            self._scalar = char not in '{["'
+            self._state = "value"
+            return
+
+        # state == "value"
+        if self._scalar:
+            # Číslo, true, false nebo null končí oddělovačem
+            if char in ",}" or char.isspace():
+                self._finish_value(completed)
+                if self._state == "error":
+                    return
+                self._state = "after_value"
+                self._step(char, completed)
+            else:
+                self._buffer.append(char)
+            return
+
+        self._buffer.append(char)
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._finish_value(completed)
+                    if self._state != "error":
+                        self._state = "after_value"
+            return
+
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_value(completed)
+                if self._state != "error":
+                    self._state = "after_value"
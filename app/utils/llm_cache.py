@@ -0,0 +1,419 @@
+"""
+Perzistentní cache odpovědí LLM.
+
+Klíčem je hash modelu, parametrů volání a normalizovaného seznamu zpráv
+(bez rozdílů v odsazení a bílých znacích, které vznikají u víceřádkových
+promptů). Odpovědi se ukládají do SQLite s TTL a omezením počtu záznamů;
+při překročení limitu se mažou nejdéle nepoužité záznamy.
+
+Druhou úrovní je sémantická cache: normalizovaný prompt se převede na
+embedding a vyhledá se v malém lokálním vektorovém indexu. Pokud je
+podobnost nad prahem, vrátí se uložená odpověď. Používá se jen pro kroky,
+které jsou k tomu výslovně označené (např. shrnutí analýzy poptávky).
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.config import get_config
+from app.utils.local_vector_store import LocalVectorStore
+
+config = get_config()
+
+_WHITESPACE = re.compile(r"[ \t]+")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizuje text promptu pro výpočet klíče.
+
+    Args:
+        text: Text zprávy
+
+    Returns:
+        str: Text bez odsazení, koncových mezer a opakovaných mezer
+    """
+    lines = [_WHITESPACE.sub(" ", line).strip() for line in str(text).strip().splitlines()]
+    return "\n".join(lines)
+
+def _message_role(message: Any) -> str:
+    """Vrátí roli zprávy (system, human, ai) pro LangChain zprávy i slovníky."""
+    if isinstance(message, dict):
+        return str(message.get("role", ""))
+    return str(getattr(message, "type", message.__class__.__name__))
+
+def _message_content(message: Any) -> str:
+    """Vrátí text zprávy pro LangChain zprávy i slovníky."""
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(getattr(message, "content", message))
+
+def normalize_messages(messages: List[Any]) -> List[List[str]]:
+    """
+    Převede seznam zpráv na normalizovanou podobu.
+
+    Args:
+        messages: Seznam zpráv
+
+    Returns:
+        List[List[str]]: Dvojice (role, normalizovaný text)
+    """
+    return [[_message_role(m), normalize_text(_message_content(m))] for m in messages]
+
+def make_cache_key(model: str, params: Dict[str, Any], messages: List[Any]) -> str:
+    """
+    Spočítá klíč cache pro volání LLM.
+
+    Args:
+        model: Název modelu
+        params: Parametry volání (teplota apod.)
+        messages: Seznam zpráv
+
+    Returns:
+        str: SHA-256 hash klíče
+    """
+    payload = json.dumps(
+        {"model": model, "params": params, "messages": normalize_messages(messages)},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Cache odpovědí LLM v SQLite s TTL a LRU evikcí."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        """
+        Otevře (případně vytvoří) cache.
+
+        Args:
+            path: Cesta k SQLite databázi
+            ttl_seconds: Doba platnosti záznamu v sekundách
+            max_entries: Maximální počet záznamů
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                latency REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Vrátí uloženou odpověď, pokud existuje a nevypršela.
+
+        Args:
+            key: Klíč cache
+
+        Returns:
+            Optional[Dict[str, Any]]: Záznam s klíči content a latency, nebo None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            content, created, latency = row
+            if now - created > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return {"content": content, "latency": latency}
+
+    def put(self, key: str, model: str, content: str, latency: Optional[float] = None) -> None:
+        """
+        Uloží odpověď.
+
+        Args:
+            key: Klíč cache
+            model: Název modelu
+            content: Text odpovědi
+            latency: Doba trvání původního volání v sekundách
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created, last_access, hits, latency) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (key, model, content, now, now, latency)
+            )
+            self._conn.commit()
+            self._writes += 1
+            # Evikci neprovádíme po každém zápisu
+            if self._writes % 50 == 1:
+                self._evict_locked(now)
+
+    def _evict_locked(self, now: float) -> None:
+        """Smaže vypršelé záznamy a nejdéle nepoužité záznamy nad limit."""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        self._conn.commit()
+
+    def evict(self) -> None:
+        """Provede evikci vypršelých a přebytečných záznamů."""
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def clear(self) -> None:
+        """Smaže všechny záznamy."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí počet záznamů a součet zásahů."""
+        with self._lock:
+            entries, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "hits": hits, "path": self.path}
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """
+    Vrátí sdílenou instanci cache odpovědí.
+
+    Returns:
+        ResponseCache: Cache odpovědí
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                config.llm_cache_path,
+                config.llm_cache_ttl,
+                config.llm_cache_max_entries
+            )
+        return _cache
+
+class SemanticCache:
+    """Sémantická cache odpovědí LLM nad lokálním vektorovým indexem."""
+
+    def __init__(self, path: str, embedding: Any, threshold: float,
+                 ttl_seconds: float, max_entries: int, save_interval: float = 0.0):
+        """
+        Otevře (případně vytvoří) sémantickou cache.
+
+        Args:
+            path: Adresář indexu
+            embedding: Embedding model s metodou ``embed_query``
+            threshold: Minimální kosinová podobnost pro zásah
+            ttl_seconds: Doba platnosti záznamu v sekundách
+            max_entries: Maximální počet záznamů v jednom namespace
+            save_interval: Nejkratší interval mezi zápisy indexu na disk v sekundách
+        """
+        self.path = path
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+        self.store = LocalVectorStore(embedding=embedding, path=path)
+
+    @staticmethod
+    def namespace(scope: str, model: str, params: Dict[str, Any], messages: List[Any]) -> str:
+        """
+        Vrátí namespace pro volání.
+
+        Systémové zprávy jsou u jednoho kroku stejné a v embeddingu by
+        přehlušily rozdíly v poptávce, proto se do namespace promítnou jen
+        jako hash spolu s modelem a parametry.
+
+        Args:
+            scope: Název kroku, pro který je sémantická cache povolená
+            model: Název modelu
+            params: Parametry volání
+            messages: Seznam zpráv
+
+        Returns:
+            str: Název namespace
+        """
+        system = [text for role, text in normalize_messages(messages) if role == "system"]
+        payload = json.dumps([model, params, system], ensure_ascii=False, sort_keys=True, default=str)
+        return f"{scope}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    @staticmethod
+    def prompt_text(messages: List[Any]) -> str:
+        """Vrátí normalizovaný text nesystémových zpráv pro embedding."""
+        return "\n\n".join(text for role, text in normalize_messages(messages) if role != "system")
+
+    def get(self, text: str, namespace: str) -> Tuple[Optional[Dict[str, Any]], List[float]]:
+        """
+        Vyhledá nejpodobnější uložený prompt.
+
+        Args:
+            text: Normalizovaný text promptu
+            namespace: Namespace volání
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], List[float]]: Záznam s klíči content,
+                latency a similarity (nebo None) a embedding promptu pro
+                případné uložení odpovědi
+        """
+        vector = self.embedding.embed_query(text)
+        hits = self.store.query(vector, top_k=1, namespace=namespace)
+        if not hits or hits[0]["score"] < self.threshold:
+            return None, vector
+        metadata = hits[0]["metadata"]
+        if time.time() - metadata.get("created", 0) > self.ttl_seconds:
+            return None, vector
+        return {
+            "content": metadata["content"],
+            "latency": metadata.get("latency"),
+            "similarity": round(float(hits[0]["score"]), 4)
+        }, vector
+
+    def put(self, text: str, namespace: str, content: str, vector: List[float],
+            latency: Optional[float] = None) -> None:
+        """
+        Uloží odpověď; index se zapíše na disk nejdřív po ``save_interval``
+        od posledního zápisu (zbytek zapíše ``flush``).
+
+        Args:
+            text: Normalizovaný text promptu
+            namespace: Namespace volání
+            content: Text odpovědi
+            vector: Embedding promptu
+            latency: Doba trvání původního volání v sekundách
+        """
+        key = hashlib.sha256(f"{namespace}\n{text}".encode("utf-8")).hexdigest()
+        with self._lock:
+            self.store.upsert_vectors(
+                [key], [vector], [text],
+                [{"content": content, "latency": latency, "created": time.time()}],
+                namespace=namespace
+            )
+            ns = self.store.namespaces.get(namespace)
+            if ns is not None and ns.size > self.max_entries:
+                oldest = sorted(range(ns.size), key=lambda row: ns.metadatas[row].get("created", 0))
+                self.store.delete([ns.ids[row] for row in oldest[:ns.size - self.max_entries]], namespace=namespace)
+            self._unsaved = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def _save(self) -> None:
+        """Zapíše změněné namespace indexu na disk (volá se pod zámkem)."""
+        self.store.save()
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        """Zapíše dosud neuložené záznamy na disk."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def clear(self) -> None:
+        """Smaže všechny záznamy."""
+        with self._lock:
+            for name in list(self.store.namespaces):
+                self.store.delete(delete_all=True, namespace=name)
+            self._save()
+
+class CacheStats:
+    """Počítadla zásahů cache za dobu běhu procesu."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.saved_latency = 0.0
+
+    def record(self, kind: Optional[str], saved_latency: Optional[float] = None) -> None:
+        """
+        Zaznamená jedno volání, u kterého se cache konzultovala.
+
+        Args:
+            kind: "exact", "semantic" nebo None (bez zásahu)
+            saved_latency: Ušetřená doba volání v sekundách
+        """
+        with self._lock:
+            self.lookups += 1
+            if kind == "exact":
+                self.exact_hits += 1
+            elif kind == "semantic":
+                self.semantic_hits += 1
+            self.saved_latency += saved_latency or 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vrátí aktuální hodnoty počítadel včetně hit rate."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.lookups - hits,
+                "hit_rate": round(hits / self.lookups, 3) if self.lookups else 0.0,
+                "saved_latency": round(self.saved_latency, 2)
+            }
+
+_semantic_cache: Optional[SemanticCache] = None
+cache_stats = CacheStats()
+
+def get_semantic_cache(embedding: Any) -> SemanticCache:
+    """
+    Vrátí sdílenou instanci sémantické cache.
+
+    Args:
+        embedding: Embedding model (použije se při prvním vytvoření)
+
+    Returns:
+        SemanticCache: Sémantická cache
+    """
+    global _semantic_cache
+    with _cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(
+                config.llm_semantic_cache_path,
+                embedding,
+                config.llm_semantic_cache_threshold,
+                config.llm_cache_ttl,
+                config.llm_semantic_cache_max_entries,
+                config.llm_semantic_cache_save_interval
+            )
+            # Neuložené záznamy se zapíšou při ukončení procesu
+            atexit.register(_semantic_cache.flush)
+        return _semantic_cache
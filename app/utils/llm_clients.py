@@ -0,0 +1,401 @@
+"""
+Sdílené klienty pro OpenAI (chat modely a embeddings).
+
+Každá instance ``ChatOpenAI`` si jinak vytváří vlastní HTTP pool, takže
+každý uzel grafu platí nové TCP a TLS spojení. Tento modul drží jeden
+HTTP klient s omezeným počtem spojení a keep-alive na proces a kešuje
+instance modelů podle (model, teplota, další parametry).
+
+S ``LLM_PROVIDER=fake`` a ``EMBEDDING_PROVIDER=fake`` vrací deterministické
+náhrady z ``app.utils.fake_providers``, které nevolají API.
+
+Volání chat modelů (``invoke_llm``) i embeddings procházejí sdíleným
+limiterem rychlosti (``app.utils.rate_limiter``), který po odpovědi 429
+volání opakuje. Vlastní opakování klienta OpenAI je proto vypnuté; kód,
+který model volá mimo ``invoke_llm``, si jej zapne parametrem
+``max_retries`` (např. ``get_chat_model(max_retries=2)``).
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from app.utils.config import get_config
+from app.utils.fake_providers import FakeChatModel, HashEmbeddings, load_script
+from app.utils.llm_cache import cache_stats, get_response_cache, get_semantic_cache, make_cache_key
+from app.utils.rate_limiter import call_with_retry, get_limiter
+from app.utils.streaming import TokenStream, emit_text, get_token_stream
+from app.utils.tokens import count_tokens
+from app.utils.usage import record_usage
+
+config = get_config()
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_chat_models: Dict[Tuple[str, float, str], Any] = {}
+_embedding_models: Dict[str, "RateLimitedEmbeddings"] = {}
+_llm_slots: Optional[threading.BoundedSemaphore] = None
+
+# Dimenze vektorů embedding modelů OpenAI
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536
+}
+
+def get_http_client() -> httpx.Client:
+    """
+    Vrátí sdílený HTTP klient pro všechna volání OpenAI v procesu.
+
+    Returns:
+        httpx.Client: HTTP klient s omezeným poolem spojení
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.llm_max_connections,
+                    max_keepalive_connections=config.llm_max_keepalive,
+                    keepalive_expiry=config.llm_keepalive_expiry
+                ),
+                timeout=httpx.Timeout(config.llm_timeout, connect=10.0)
+            )
+        return _http_client
+
+def _create_fake_chat_model(model: str, temperature: float, **options: Any) -> FakeChatModel:
+    """Vytvoří náhradní chat model podle konfigurace."""
+    return FakeChatModel(
+        model_name=model,
+        temperature=temperature,
+        latency_ms=config.fake_llm_latency_ms,
+        latency_jitter=config.fake_llm_latency_jitter,
+        seed=config.fake_llm_seed,
+        script=load_script(config.fake_llm_script),
+        # Parametry specifické pro OpenAI náhrada nepotřebuje
+        **{k: v for k, v in options.items() if k in FakeChatModel.model_fields}
+    )
+
+def get_chat_model(temperature: float = 0.2, model: Optional[str] = None, **options: Any) -> ChatOpenAI:
+    """
+    Vrátí sdílenou instanci chat modelu.
+
+    Args:
+        temperature: Teplota modelu
+        model: Název modelu (výchozí z konfigurace)
+        **options: Další parametry pro ``ChatOpenAI`` (např. max_tokens)
+
+    Returns:
+        ChatOpenAI: Instance chat modelu (s LLM_PROVIDER=fake ``FakeChatModel``)
+    """
+    model = model or config.model_name
+    key = (model, float(temperature), json.dumps(options, sort_keys=True, default=str))
+
+    llm = _chat_models.get(key)
+    if llm is not None:
+        return llm
+
+    if config.llm_provider == "fake":
+        with _lock:
+            return _chat_models.setdefault(key, _create_fake_chat_model(model, float(temperature), **options))
+
+    http_client = get_http_client()
+    with _lock:
+        llm = _chat_models.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                openai_api_key=config.openai_api_key,
+                http_client=http_client,
+                **{"max_retries": 0, "stream_usage": True, **options}
+            )
+            _chat_models[key] = llm
+        return llm
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embedding model, jehož volání procházejí sdíleným limiterem rychlosti.
+
+    Ostatní atributy se předávají obalenému modelu.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(count_tokens(text, self.model) for text in texts)
+        return call_with_retry(self.model, lambda: self.embeddings.embed_documents(texts), tokens=tokens)
+
+    def embed_query(self, text: str) -> List[float]:
+        return call_with_retry(self.model, lambda: self.embeddings.embed_query(text),
+                               tokens=count_tokens(text, self.model))
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+def get_embeddings_model(model: Optional[str] = None) -> RateLimitedEmbeddings:
+    """
+    Vrátí sdílenou instanci embedding modelu.
+
+    Args:
+        model: Název embedding modelu (výchozí z konfigurace)
+
+    Returns:
+        RateLimitedEmbeddings: Instance ``OpenAIEmbeddings`` (s EMBEDDING_PROVIDER=fake
+            ``HashEmbeddings``) obalená limiterem rychlosti
+    """
+    model = model or config.embedding_model
+
+    embeddings = _embedding_models.get(model)
+    if embeddings is not None:
+        return embeddings
+
+    if config.embedding_provider == "fake":
+        with _lock:
+            return _embedding_models.setdefault(
+                model, RateLimitedEmbeddings(HashEmbeddings(config.fake_embedding_dimension), model)
+            )
+
+    http_client = get_http_client()
+    with _lock:
+        embeddings = _embedding_models.get(model)
+        if embeddings is None:
+            embeddings = RateLimitedEmbeddings(OpenAIEmbeddings(
+                model=model,
+                openai_api_key=config.openai_api_key,
+                http_client=http_client,
+                max_retries=0
+            ), model)
+            _embedding_models[model] = embeddings
+        return embeddings
+
+def get_embedding_dimension(model: Optional[str] = None) -> int:
+    """
+    Vrátí dimenzi vektorů embedding modelu.
+
+    Args:
+        model: Název embedding modelu (výchozí z konfigurace)
+
+    Returns:
+        int: Dimenze vektorů (s EMBEDDING_PROVIDER=fake FAKE_EMBEDDING_DIMENSION)
+    """
+    if config.embedding_provider == "fake":
+        return config.fake_embedding_dimension
+    return EMBEDDING_DIMENSIONS.get(model or config.embedding_model, 3072)
+
+def _llm_params(llm: Any) -> Tuple[str, Dict[str, Any]]:
+    """Vrátí název modelu a parametry, které ovlivňují odpověď."""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", "") or ""
+    params = {"temperature": getattr(llm, "temperature", None)}
+    for name in ("max_tokens", "top_p", "frequency_penalty", "presence_penalty", "seed", "model_kwargs"):
+        value = getattr(llm, name, None)
+        if value not in (None, {}):
+            params[name] = value
+    return str(model), params
+
+def _stream_llm(llm: Any, messages: List[Any], stream: TokenStream) -> AIMessage:
+    """
+    Zavolá LLM se streamováním a průběžně předává text příjemci.
+
+    ``on_start`` se příjemci předá až s prvním tokenem, takže pokus, který
+    selže dřív, v rozhraní nezanechá stopu a lze jej zopakovat.
+    """
+    full = None
+    started = False
+    try:
+        for chunk in llm.stream(messages):
+            if chunk.content:
+                if not started:
+                    stream.on_start()
+                    started = True
+                stream.on_token(chunk.content)
+            full = chunk if full is None else full + chunk
+    except Exception as e:
+        # Text už předaný příjemci nelze vzít zpět, opakování by jej zdvojilo
+        if started:
+            e.stream_started = True
+        raise
+    finally:
+        if started:
+            stream.on_end()
+    if full is None:
+        return AIMessage(content="")
+    return AIMessage(
+        content=full.content,
+        response_metadata=full.response_metadata,
+        usage_metadata=full.usage_metadata
+    )
+
+def _emit_cached(response: AIMessage, stream: Optional[TokenStream]) -> AIMessage:
+    """Předá odpověď z cache příjemci tokenů najednou."""
+    if stream is not None:
+        emit_text(response.content)
+    return response
+
+def _get_llm_slots() -> Optional[threading.BoundedSemaphore]:
+    """Vrátí semafor omezující souběžná volání LLM v procesu (LLM_MAX_CONCURRENCY)."""
+    global _llm_slots
+    if config.llm_max_concurrency <= 0:
+        return None
+    with _lock:
+        if _llm_slots is None:
+            _llm_slots = threading.BoundedSemaphore(config.llm_max_concurrency)
+        return _llm_slots
+
+def _estimate_tokens(messages: List[Any], params: Dict[str, Any]) -> int:
+    """Odhadne tokeny volání pro limiter (prompt a nejvyšší délka odpovědi)."""
+    return sum(count_tokens(str(getattr(m, "content", m))) for m in messages) + (params.get("max_tokens") or 0)
+
+def invoke_llm(llm: Any, messages: List[Any], cache: Optional[bool] = None,
+               semantic: Optional[str] = None, stream: bool = False) -> AIMessage:
+    """
+    Zavolá LLM, případně s využitím cache odpovědí.
+
+    Cache se používá jen pokud je zapnutá v konfiguraci (``LLM_CACHE``).
+    Ve výchozím stavu (``cache=None``) se kešují volání s nízkou teplotou,
+    ``cache=True`` vynutí kešování i pro vyšší teplotu a ``cache=False``
+    cache pro dané volání obejde.
+
+    Sémantická cache (``LLM_SEMANTIC_CACHE``) se použije jen pro volání
+    s vyplněným parametrem ``semantic``, tedy pro kroky, u kterých je
+    odpověď na téměř stejný prompt přijatelná. Zásah je označen
+    v ``response_metadata["cache"]``.
+
+    S ``stream=True`` se text odpovědi průběžně předává příjemci tokenů
+    nastavenému pro aktuální běh grafu (viz ``app.utils.streaming``).
+    Bez nastaveného příjemce se volá ``llm.invoke`` jako obvykle.
+
+    Souběžných volání modelu je v procesu nejvýše LLM_MAX_CONCURRENCY
+    (0 = bez omezení) a každé volání se započítá do ``app.utils.usage``.
+    Volání prochází limiterem rychlosti modelu (``app.utils.rate_limiter``)
+    s prioritou podle ``traffic_priority`` a po odpovědi 429 nebo dočasné
+    chybě se zopakuje. Streamované volání se neopakuje, pokud už předalo
+    příjemci část textu.
+
+    Args:
+        llm: Chat model
+        messages: Seznam zpráv
+        cache: Zda použít cache (None = podle teploty modelu)
+        semantic: Název kroku, pro který je sémantická cache povolená
+        stream: Zda streamovat text odpovědi příjemci tokenů
+
+    Returns:
+        AIMessage: Odpověď modelu
+    """
+    model, params = _llm_params(llm)
+    if cache is None:
+        cache = (params.get("temperature") or 0.0) <= config.llm_cache_max_temperature
+    use_cache = cache and config.llm_cache_enabled
+    use_semantic = bool(semantic) and cache is not False and config.llm_semantic_cache_enabled
+    token_stream = get_token_stream() if stream else None
+
+    key = None
+    if use_cache:
+        key = make_cache_key(model, params, messages)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            cache_stats.record("exact", cached["latency"])
+            record_usage(messages, None, cached=True)
+            return _emit_cached(AIMessage(
+                content=cached["content"],
+                response_metadata={"cache": "exact", "saved_latency": cached["latency"]}
+            ), token_stream)
+
+    semantic_cache = namespace = text = vector = None
+    if use_semantic:
+        try:
+            semantic_cache = get_semantic_cache(get_embeddings_model())
+            namespace = semantic_cache.namespace(semantic, model, params, messages)
+            text = semantic_cache.prompt_text(messages)
+            cached, vector = semantic_cache.get(text, namespace)
+        except Exception as e:
+            print(f"Chyba při vyhledávání v sémantické cache: {e}")
+            semantic_cache = cached = None
+        if cached is not None:
+            cache_stats.record("semantic", cached["latency"])
+            record_usage(messages, None, cached=True)
+            return _emit_cached(AIMessage(
+                content=cached["content"],
+                response_metadata={
+                    "cache": "semantic",
+                    "similarity": cached["similarity"],
+                    "saved_latency": cached["latency"]
+                }
+            ), token_stream)
+
+    def call() -> Tuple[AIMessage, float]:
+        slots = _get_llm_slots()
+        if slots is not None:
+            slots.acquire()
+        try:
+            start = time.perf_counter()
+            if token_stream is not None:
+                result = _stream_llm(llm, messages, token_stream)
+            else:
+                result = llm.invoke(messages)
+            return result, time.perf_counter() - start
+        finally:
+            if slots is not None:
+                slots.release()
+
+    estimate = _estimate_tokens(messages, params)
+    response, latency = call_with_retry(model, call, tokens=estimate)
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens") is not None:
+        get_limiter(model).adjust(usage["total_tokens"] - estimate)
+    record_usage(messages, response)
+
+    if use_cache or use_semantic:
+        cache_stats.record(None)
+    if use_cache:
+        get_response_cache().put(key, model, response.content, latency)
+    if semantic_cache is not None:
+        try:
+            semantic_cache.put(text, namespace, response.content, vector, latency)
+        except Exception as e:
+            print(f"Chyba při ukládání do sémantické cache: {e}")
+
+    return response
+
+def cache_tag(response: Any) -> Optional[Dict[str, Any]]:
+    """
+    Vrátí označení zásahu cache pro záznam v historii chatu.
+
+    Args:
+        response: Odpověď z ``invoke_llm``
+
+    Returns:
+        Optional[Dict[str, Any]]: Typ zásahu, podobnost a ušetřená doba, nebo None
+    """
+    metadata = getattr(response, "response_metadata", None) or {}
+    if "cache" not in metadata:
+        return None
+    return {k: metadata[k] for k in ("cache", "similarity", "saved_latency") if k in metadata}
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Vrátí statistiku cache odpovědí za dobu běhu procesu.
+
+    Returns:
+        Dict[str, Any]: Počet konzultací, zásahů podle typu, hit rate a ušetřená doba v sekundách
+    """
+    return cache_stats.snapshot()
+
+def close_clients() -> None:
+    """Uzavře sdílený HTTP klient a zahodí kešované modely."""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        _chat_models.clear()
+        _embedding_models.clear()
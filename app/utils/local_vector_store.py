@@ -0,0 +1,379 @@
+"""
+Lokální vektorové úložiště nad NumPy.
+
+Slouží jako náhrada Pinecone pro benchmarky, testování bez připojení
+k síti a jako úložiště pro lokální stand-in služby. Rozhraní odpovídá
+podmnožině ``PineconeVectorStore``, kterou BidMaster používá
+(``add_documents``, ``similarity_search``, ``delete``), a navíc nabízí
+operace nad hotovými vektory (``upsert_vectors``, ``query``).
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+class _Namespace:
+    """Vektory jednoho namespace uložené v souvislém poli."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+
+    def _reserve(self, extra: int) -> None:
+        """Zvětší pole vektorů (zdvojnásobením), aby se vešlo dalších ``extra`` řádků."""
+        needed = self.size + extra
+        if needed <= self.vectors.shape[0]:
+            return
+        capacity = max(needed, 2 * self.vectors.shape[0], 64)
+        grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+        grown[:self.size] = self.vectors[:self.size]
+        self.vectors = grown
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Vloží nebo přepíše vektory podle ID."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        self._reserve(len(ids))
+        for vector_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            row = self.index.get(vector_id)
+            if row is None:
+                row = self.size
+                self.size += 1
+                self.index[vector_id] = row
+                self.ids.append(vector_id)
+                self.texts.append(text)
+                self.metadatas.append(metadata)
+            else:
+                self.texts[row] = text
+                self.metadatas[row] = metadata
+            self.vectors[row] = vector
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Smaže vektory podle ID (prohozením s posledním řádkem)."""
+        deleted = 0
+        for vector_id in ids:
+            row = self.index.pop(vector_id, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = self.ids[last]
+                self.texts[row] = self.texts[last]
+                self.metadatas[row] = self.metadatas[last]
+                self.index[self.ids[row]] = row
+            self.ids.pop()
+            self.texts.pop()
+            self.metadatas.pop()
+            self.size -= 1
+            deleted += 1
+        return deleted
+
+    def query(self, vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Vrátí řádky s nejvyšší kosinovou podobností."""
+        if self.size == 0:
+            return []
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        scores = self.vectors[:self.size] @ vector.astype(np.float32)
+        top_k = min(top_k, self.size)
+        rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows = rows[np.argsort(-scores[rows])]
+        return [(int(row), float(scores[row])) for row in rows]
+
+class LocalVectorStore:
+    """Vektorové úložiště v paměti procesu s volitelným uložením na disk."""
+
+    def __init__(self, embedding: Any = None, dimension: Optional[int] = None,
+                 namespace: Optional[str] = None, path: Optional[str] = None,
+                 autosave: bool = False):
+        """
+        Vytvoří úložiště.
+
+        Args:
+            embedding: Embedding model s metodami ``embed_documents`` a ``embed_query``
+                (pro operace nad texty)
+            dimension: Dimenze vektorů (výchozí podle prvního vloženého vektoru)
+            namespace: Výchozí namespace
+            path: Adresář pro uložení a načtení úložiště (volitelné)
+            autosave: Uložit úložiště na disk po každé změně (vyžaduje ``path``)
+        """
+        self.embedding = embedding
+        self.dimension = dimension
+        self.default_namespace = namespace or ""
+        self.path = path
+        self.autosave = autosave and bool(path)
+        self.namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        # Stav posledního uložení: adresář, soubory namespace a namespace změněné od té doby
+        self._saved_path: Optional[str] = None
+        self._files: Dict[str, Dict[str, str]] = {}
+        self._dirty: set = set()
+
+        if path and os.path.exists(os.path.join(path, "store.json")):
+            self.load(path)
+
+    def _namespace(self, namespace: Optional[str], create: bool = False) -> Optional[_Namespace]:
+        """Vrátí (případně vytvoří) namespace."""
+        name = self.default_namespace if namespace is None else namespace
+        ns = self.namespaces.get(name)
+        if ns is None and create:
+            if self.dimension is None:
+                raise ValueError("Dimenze úložiště není známa")
+            ns = self.namespaces[name] = _Namespace(self.dimension)
+        return ns
+
+    def upsert_vectors(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        texts: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        namespace: Optional[str] = None
+    ) -> List[str]:
+        """
+        Vloží hotové vektory.
+
+        Args:
+            ids: ID vektorů
+            vectors: Hodnoty vektorů
+            texts: Texty k vektorům (volitelné)
+            metadatas: Metadata k vektorům (volitelné)
+            namespace: Namespace (volitelné)
+
+        Returns:
+            List[str]: ID uložených vektorů
+        """
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim != 2 or array.shape[0] != len(ids):
+            raise ValueError("Počet vektorů neodpovídá počtu ID")
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = array.shape[1]
+            if array.shape[1] != self.dimension:
+                raise ValueError(f"Vektory mají dimenzi {array.shape[1]}, úložiště {self.dimension}")
+            ns = self._namespace(namespace, create=True)
+            self._dirty.add(self.default_namespace if namespace is None else namespace)
+            ns.upsert(
+                list(ids),
+                array,
+                texts or [""] * len(ids),
+                [dict(m) for m in metadatas] if metadatas else [{} for _ in ids]
+            )
+            if self.autosave:
+                self.save()
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Spočítá embeddings a vloží texty."""
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in texts]
+        vectors = self.embedding.embed_documents(list(texts))
+        return self.upsert_vectors(ids, vectors, list(texts), metadatas, namespace)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None,
+                      namespace: Optional[str] = None, **kwargs: Any) -> List[str]:
+        """Spočítá embeddings a vloží dokumenty."""
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            ids=ids,
+            namespace=namespace
+        )
+
+    def query(self, vector: List[float], top_k: int = 5,
+              namespace: Optional[str] = None, include_values: bool = False) -> List[Dict[str, Any]]:
+        """
+        Vyhledá nejpodobnější vektory.
+
+        Args:
+            vector: Dotazový vektor
+            top_k: Počet výsledků
+            namespace: Namespace (volitelné)
+            include_values: Přidat k výsledkům hodnoty (normalizovaných) vektorů
+
+        Returns:
+            List[Dict[str, Any]]: Výsledky s klíči id, score, text a metadata
+                (a values, pokud je include_values)
+        """
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns is None:
+                return []
+            hits = ns.query(np.asarray(vector, dtype=np.float32), top_k)
+            results = []
+            for row, score in hits:
+                hit = {"id": ns.ids[row], "score": score, "text": ns.texts[row], "metadata": dict(ns.metadatas[row])}
+                if include_values:
+                    hit["values"] = ns.vectors[row].tolist()
+                results.append(hit)
+            return results
+
+    def similarity_search_with_score(self, query: str, k: int = 5,
+                                     namespace: Optional[str] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Vyhledá dokumenty podobné dotazu včetně skóre."""
+        vector = self.embedding.embed_query(query)
+        return [
+            (Document(page_content=hit["text"], metadata=hit["metadata"]), hit["score"])
+            for hit in self.query(vector, k, namespace)
+        ]
+
+    def similarity_search(self, query: str, k: int = 5,
+                          namespace: Optional[str] = None, **kwargs: Any) -> List[Document]:
+        """Vyhledá dokumenty podobné dotazu."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, namespace)]
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False,
+               namespace: Optional[str] = None, **kwargs: Any) -> int:
+        """
+        Smaže vektory.
+
+        Args:
+            ids: ID vektorů ke smazání
+            delete_all: Smazat celý namespace
+            namespace: Namespace (volitelné)
+
+        Returns:
+            int: Počet smazaných vektorů
+        """
+        with self._lock:
+            name = self.default_namespace if namespace is None else namespace
+            ns = self.namespaces.get(name)
+            if ns is None:
+                return 0
+            if delete_all:
+                del self.namespaces[name]
+                deleted = ns.size
+            else:
+                deleted = ns.delete(ids or [])
+            if deleted:
+                self._dirty.add(name)
+            if self.autosave and deleted:
+                self.save()
+            return deleted
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        """Vrátí statistiku úložiště ve tvaru odpovědi Pinecone."""
+        with self._lock:
+            namespaces = {name: {"vector_count": ns.size} for name, ns in self.namespaces.items()}
+            return {
+                "dimension": self.dimension,
+                "namespaces": namespaces,
+                "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())
+            }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Uloží úložiště do adresáře.
+
+        Každý namespace má vlastní soubory (vektory jako .npy, ID, texty
+        a metadata jako JSON) a zapisují se jen namespace změněné od
+        posledního uložení. Soubory se zapisují pod novým názvem a nakonec
+        se atomicky nahradí ``store.json``, který na ně odkazuje; přerušené
+        uložení proto ponechá předchozí stav úložiště.
+
+        Args:
+            path: Adresář (výchozí ``path`` úložiště); do jiného adresáře
+                se zapíšou všechny namespace
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("Není zadána cesta pro uložení")
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            full = path != self._saved_path
+            files = {} if full else self._files
+            written = dict(files)
+            # Nové názvy souborů při každém uložení, aby se nepřepsaly soubory platného store.json
+            generation = uuid.uuid4().hex[:8]
+            for name, ns in self.namespaces.items():
+                if name in files and "records" in files[name] and name not in self._dirty:
+                    continue
+                stem = f"ns_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}_{generation}"
+                vectors_file, records_file = f"{stem}.npy", f"{stem}.json"
+                _write_atomic(os.path.join(path, vectors_file), "wb",
+                              lambda f, ns=ns: np.save(f, ns.vectors[:ns.size]))
+                records = {"ids": ns.ids, "texts": ns.texts, "metadatas": ns.metadatas}
+                _write_atomic(os.path.join(path, records_file), "w",
+                              lambda f, records=records: json.dump(records, f, ensure_ascii=False))
+                written[name] = {"vectors": vectors_file, "records": records_file}
+            written = {name: entry for name, entry in written.items() if name in self.namespaces}
+
+            manifest = {"dimension": self.dimension, "namespaces": written}
+            _write_atomic(os.path.join(path, "store.json"), "w",
+                          lambda f: json.dump(manifest, f, ensure_ascii=False))
+
+            # Soubory, na které už store.json neodkazuje
+            current = {file for entry in written.values() for file in entry.values()}
+            for entry in files.values():
+                for file in entry.values():
+                    if file not in current:
+                        try:
+                            os.remove(os.path.join(path, file))
+                        except OSError:
+                            pass
+            # Kopie do jiného adresáře stav uložení v ``path`` nemění
+            if not self.path or path == self.path:
+                self._files = written
+                self._saved_path = path
+                self._dirty.clear()
+
+    def load(self, path: str) -> None:
+        """Načte úložiště z adresáře."""
+        with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with self._lock:
+            self.dimension = manifest["dimension"]
+            self.namespaces = {}
+            for name, data in manifest["namespaces"].items():
+                vectors = np.load(os.path.join(path, data["vectors"]))
+                if "records" in data:
+                    with open(os.path.join(path, data["records"]), "r", encoding="utf-8") as f:
+                        records = json.load(f)
+                else:
+                    # Starší formát s ID, texty a metadaty přímo ve store.json
+                    records = data
+                ns = self.namespaces[name] = _Namespace(self.dimension)
+                if len(records["ids"]):
+                    ns.upsert(records["ids"], vectors, records["texts"], records["metadatas"])
+            # Namespace ve starším formátu se při příštím uložení zapíšou znovu
+            self._files = {
+                name: {key: data[key] for key in ("vectors", "records") if key in data}
+                for name, data in manifest["namespaces"].items()
+            }
+            self._saved_path = path
+            self._dirty.clear()
+
+def _write_atomic(path: str, mode: str, write: Callable[[Any], None]) -> None:
+    """Zapíše soubor přes dočasný soubor ve stejném adresáři a ``os.replace``."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,159 @@
+"""
+Extrakce textu z PDF po stránkách s OCR fallbackem pro naskenované stránky.
+
+Stránky s textovou vrstvou se čtou přímo přes pypdf. Stránky bez textu
+(typicky naskenované poptávky) se rasterizují přes pdf2image a rozpoznají
+pomocí pytesseract v poolu procesů. Výsledek OCR se ukládá do cache podle
+(hash souboru, číslo stránky), takže opakovaný import stejnou stránku
+znovu nerozpoznává.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        PdfReader = None
+
+try:
+    import pytesseract
+    from pdf2image import convert_from_path
+except ImportError:
+    pytesseract = None
+    convert_from_path = None
+
+from app.config import get_config
+from app.utils.import_journal import file_sha1
+
+config = get_config()
+
+def ocr_available() -> bool:
+    """Vrátí True, pokud jsou nainstalovány knihovny pro OCR."""
+    return pytesseract is not None and convert_from_path is not None
+
+def _cache_path(cache_dir: str, file_hash: str, page_number: int) -> Path:
+    """Vrátí cestu k souboru s výsledkem OCR pro danou stránku."""
+    return Path(cache_dir) / file_hash[:2] / file_hash / f"{page_number:05d}.txt"
+
+def _read_cached(cache_dir: str, file_hash: str, page_number: int) -> Optional[str]:
+    """Načte výsledek OCR z cache, pokud existuje."""
+    path = _cache_path(cache_dir, file_hash, page_number)
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return None
+
+def _write_cached(cache_dir: str, file_hash: str, page_number: int, text: str) -> None:
+    """Uloží výsledek OCR do cache (atomicky přes dočasný soubor)."""
+    path = _cache_path(cache_dir, file_hash, page_number)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def _ocr_page(args: Tuple[str, int, int, str]) -> Tuple[int, str]:
+    """
+    Rasterizuje a rozpozná jednu stránku PDF. Spouští se v samostatném procesu.
+
+    Args:
+        args: Cesta k PDF, číslo stránky (od 1), DPI a jazyk pro Tesseract
+
+    Returns:
+        Tuple[int, str]: Číslo stránky a rozpoznaný text
+    """
+    file_path, page_number, dpi, lang = args
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    text = "\n".join(pytesseract.image_to_string(image, lang=lang) for image in images)
+    return page_number, text.strip()
+
+def ocr_pages(
+    file_path: str,
+    page_numbers: List[int],
+    workers: Optional[int] = None,
+    dpi: Optional[int] = None,
+    lang: Optional[str] = None
+) -> Dict[int, str]:
+    """
+    Rozpozná vybrané stránky PDF v poolu procesů (bez cache).
+
+    Args:
+        file_path: Cesta k PDF dokumentu
+        page_numbers: Čísla stránek (od 1)
+        workers: Počet procesů (výchozí z konfigurace)
+        dpi: Rozlišení rasterizace (výchozí z konfigurace)
+        lang: Jazyk pro Tesseract (výchozí z konfigurace)
+
+    Returns:
+        Dict[int, str]: Rozpoznaný text podle čísla stránky
+    """
+    workers = workers or config.ocr_workers
+    tasks = [(file_path, n, dpi or config.ocr_dpi, lang or config.ocr_lang) for n in page_numbers]
+
+    if workers <= 1 or len(tasks) <= 1:
+        return dict(_ocr_page(task) for task in tasks)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return dict(executor.map(_ocr_page, tasks))
+
+def extract_pdf_pages(
+    file_path: str,
+    workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    use_ocr: bool = True
+) -> List[str]:
+    """
+    Extrahuje text ze všech stránek PDF, stránky bez textu rozpozná pomocí OCR.
+
+    Args:
+        file_path: Cesta k PDF dokumentu
+        workers: Počet procesů pro OCR (výchozí z konfigurace)
+        cache_dir: Adresář cache pro OCR (výchozí z konfigurace)
+        use_ocr: Zda použít OCR pro stránky bez textové vrstvy
+
+    Returns:
+        List[str]: Text jednotlivých stránek (prázdný řetězec pro nerozpoznané stránky)
+    """
+    if PdfReader is None:
+        print(f"Nelze extrahovat text z PDF dokumentu {file_path}: Knihovna pro práci s PDF není nainstalována.")
+        return []
+
+    reader = PdfReader(file_path)
+    pages = [(page.extract_text() or "").strip() for page in reader.pages]
+
+    missing = [i + 1 for i, text in enumerate(pages) if not text]
+    if not missing or not use_ocr:
+        return pages
+
+    if not ocr_available():
+        print(f"Varování: {len(missing)} stránek v {file_path} nemá textovou vrstvu a OCR není dostupné "
+              "(nainstalujte pytesseract a pdf2image).")
+        return pages
+
+    cache_dir = cache_dir or config.ocr_cache_dir
+    file_hash = file_sha1(file_path)
+
+    to_ocr = []
+    for page_number in missing:
+        cached = _read_cached(cache_dir, file_hash, page_number)
+        if cached is not None:
+            pages[page_number - 1] = cached
+        else:
+            to_ocr.append(page_number)
+
+    if to_ocr:
+        print(f"OCR: rozpoznávám {len(to_ocr)} stránek z {file_path}...")
+        try:
+            recognized = ocr_pages(file_path, to_ocr, workers=workers)
+        except Exception as e:
+            print(f"Chyba při OCR dokumentu {file_path}: {e}")
+            return pages
+
+        for page_number, text in recognized.items():
+            _write_cached(cache_dir, file_hash, page_number, text)
+            pages[page_number - 1] = text
+
+    return pages
@@ -0,0 +1,387 @@
+"""
+Lokální náhrada služby Pinecone (REST API) nad NumPy úložištěm.
+
+Implementuje endpointy, které BidMaster volá přes SDK ``pinecone``:
+control plane (``GET/POST /indexes``, ``GET/DELETE /indexes/{name}``) a data
+plane (``/vectors/upsert``, ``/query``, ``/vectors/delete``,
+``/describe_index_stats``). Každý index má vlastní ``LocalVectorStore``;
+data plane indexu běží na adrese ``/index/{name}``, kterou vrací
+``describe_index``, takže SDK ani ``vector_store.py`` nepotřebují úpravy.
+
+Pro testování dávkování, opakování a záložních cest ve ``vector_store.py``
+lze nastavit simulovanou latenci a podíl chybových odpovědí. Náhrada
+kontroluje i limity služby (počet vektorů v upsertu, velikost požadavku
+a metadat, dimenzi vektorů) a vrací stejné stavové kódy jako Pinecone.
+
+Spuštění:
+    python3 -m app.utils.pinecone_local --port 5080 --latency-ms 50 --error-rate 0.05
+
+Aplikace se k náhradě připojí přes ``PINECONE_CONTROLLER_HOST=http://localhost:5080``
+(``PINECONE_API_KEY`` stačí libovolný neprázdný, pokud náhrada nemá
+nastavený ``--api-key``).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import uvicorn
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.utils.local_vector_store import LocalVectorStore
+
+# Limity služby Pinecone, které náhrada kontroluje
+MAX_UPSERT_VECTORS = 1000
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_METADATA_BYTES = 40 * 1024
+MAX_TOP_K = 10000
+
+# Endpointy náhrady, na které se simulace latence a chyb nevztahuje
+LOCAL_PREFIX = "/_local"
+
+class PineconeLocal:
+    """Stav náhrady: indexy, simulace latence a chyb a statistika požadavků."""
+
+    def __init__(self, path: Optional[str] = None, latency_ms: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0,
+                 api_key: Optional[str] = None):
+        """
+        Vytvoří náhradu.
+
+        Args:
+            path: Adresář pro uložení indexů (volitelné, jinak jen v paměti)
+            latency_ms: Medián simulované latence odpovědi v ms
+            latency_jitter: Rozptyl latence (sigma log-normálního rozdělení, 0 = konstantní)
+            error_rate: Podíl požadavků, které skončí chybou (0-1)
+            error_status: Stavový kód simulované chyby (např. 503 nebo 429)
+            seed: Seed pro latenci a výběr chybových požadavků
+            api_key: Vyžadovaný API klíč (volitelné)
+        """
+        self.path = path
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_key = api_key
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        if path and os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                info_path = os.path.join(path, name, "index.json")
+                if os.path.exists(info_path):
+                    with open(info_path, "r", encoding="utf-8") as f:
+                        info = json.load(f)
+                    self._open_index(name, info["dimension"], info["metric"])
+
+    def _open_index(self, name: str, dimension: int, metric: str) -> Dict[str, Any]:
+        """Otevře (případně načte z disku) úložiště indexu."""
+        index_path = os.path.join(self.path, name) if self.path else None
+        store = LocalVectorStore(dimension=dimension, path=index_path, autosave=bool(index_path))
+        index = self.indexes[name] = {"dimension": dimension, "metric": metric, "store": store}
+        return index
+
+    def create_index(self, name: str, dimension: int, metric: str = "cosine") -> Dict[str, Any]:
+        """
+        Vytvoří index.
+
+        Args:
+            name: Název indexu
+            dimension: Dimenze vektorů
+            metric: Metrika (náhrada počítá vždy kosinovou podobnost)
+
+        Returns:
+            Dict[str, Any]: Index s klíči dimension, metric a store
+        """
+        with self._lock:
+            if name in self.indexes:
+                raise KeyError(name)
+            index = self._open_index(name, dimension, metric)
+            if self.path:
+                os.makedirs(os.path.join(self.path, name), exist_ok=True)
+                with open(os.path.join(self.path, name, "index.json"), "w", encoding="utf-8") as f:
+                    json.dump({"dimension": dimension, "metric": metric}, f)
+            return index
+
+    def delete_index(self, name: str) -> None:
+        """Smaže index (soubory na disku zůstanou)."""
+        with self._lock:
+            del self.indexes[name]
+            if self.path:
+                os.remove(os.path.join(self.path, name, "index.json"))
+
+    def delay(self) -> float:
+        """Vrátí simulovanou latenci dalšího požadavku v sekundách."""
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            factor = self._rng.lognormvariate(0.0, self.latency_jitter) if self.latency_jitter > 0 else 1.0
+        return self.latency_ms * factor / 1000
+
+    def should_fail(self) -> bool:
+        """Rozhodne, zda další požadavek skončí simulovanou chybou."""
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def record(self, route: str, status: int, injected: bool = False) -> None:
+        """Zaznamená požadavek do statistiky."""
+        with self._lock:
+            entry = self.stats.setdefault(route, {"requests": 0, "errors": 0, "injected": 0})
+            entry["requests"] += 1
+            if status >= 400:
+                entry["errors"] += 1
+            if injected:
+                entry["injected"] += 1
+
+def _control_error(status: int, code: str, message: str) -> JSONResponse:
+    """Chybová odpověď control plane ve tvaru Pinecone."""
+    return JSONResponse(status_code=status, content={"error": {"code": code, "message": message}, "status": status})
+
+def _data_error(status: int, code: int, message: str) -> JSONResponse:
+    """Chybová odpověď data plane ve tvaru Pinecone (gRPC kód a zpráva)."""
+    return JSONResponse(status_code=status, content={"code": code, "message": message, "details": []})
+
+def _route_name(request: Request) -> str:
+    """Vrátí název endpointu pro statistiku (bez názvu indexu)."""
+    path = re.sub(r"^/index/[^/]+", "", request.url.path)
+    path = re.sub(r"^/indexes/[^/]+$", "/indexes/{name}", path)
+    return f"{request.method} {path}"
+
+def _index_model(name: str, index: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """Popis indexu ve tvaru odpovědi ``describe_index``."""
+    return {
+        "name": name,
+        "dimension": index["dimension"],
+        "metric": index["metric"],
+        "host": f"{base_url.rstrip('/')}/index/{name}",
+        "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+        "status": {"ready": True, "state": "Ready"},
+        "deletion_protection": "disabled",
+        "vector_type": "dense"
+    }
+
+def create_app(local: PineconeLocal) -> FastAPI:
+    """
+    Vytvoří FastAPI aplikaci náhrady.
+
+    Args:
+        local: Stav náhrady
+
+    Returns:
+        FastAPI: Aplikace s endpointy Pinecone a ``/_local/stats``
+    """
+    app = FastAPI(title="Pinecone local", docs_url=None, redoc_url=None)
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        if request.url.path.startswith(LOCAL_PREFIX):
+            return await call_next(request)
+
+        route = _route_name(request)
+        delay = local.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        if local.api_key and request.headers.get("Api-Key") != local.api_key:
+            local.record(route, 401)
+            return _control_error(401, "UNAUTHENTICATED", "Invalid API Key")
+        if local.should_fail():
+            local.record(route, local.error_status, injected=True)
+            response = _data_error(local.error_status, 14, "Simulovaná chyba lokální náhrady Pinecone")
+            if local.error_status == 429:
+                response.headers["Retry-After"] = "1"
+            return response
+        if int(request.headers.get("content-length") or 0) > MAX_REQUEST_BYTES:
+            local.record(route, 400)
+            return _data_error(400, 3, f"Request size exceeds the maximum supported size of {MAX_REQUEST_BYTES} bytes")
+
+        response = await call_next(request)
+        local.record(route, response.status_code)
+        return response
+
+    def get_index(name: str) -> Tuple[Optional[Dict[str, Any]], Optional[JSONResponse]]:
+        index = local.indexes.get(name)
+        if index is None:
+            return None, _data_error(404, 5, f"Index {name} not found")
+        return index, None
+
+    @app.get("/indexes")
+    def list_indexes(request: Request):
+        base_url = str(request.base_url)
+        return {"indexes": [_index_model(name, index, base_url) for name, index in list(local.indexes.items())]}
+
+    @app.post("/indexes", status_code=201)
+    def create_index(request: Request, body: Dict[str, Any] = Body(...)):
+        name = body.get("name")
+        dimension = body.get("dimension")
+        if not name or not isinstance(dimension, int) or dimension <= 0:
+            return _control_error(400, "INVALID_ARGUMENT", "Index name and positive dimension are required")
+        try:
+            index = local.create_index(name, dimension, body.get("metric") or "cosine")
+        except KeyError:
+            return _control_error(409, "ALREADY_EXISTS", "Resource already exists")
+        return _index_model(name, index, str(request.base_url))
+
+    @app.get("/indexes/{name}")
+    def describe_index(name: str, request: Request):
+        index = local.indexes.get(name)
+        if index is None:
+            return _control_error(404, "NOT_FOUND", f"Resource {name} not found")
+        return _index_model(name, index, str(request.base_url))
+
+    @app.delete("/indexes/{name}", status_code=202)
+    def delete_index(name: str):
+        if name not in local.indexes:
+            return _control_error(404, "NOT_FOUND", f"Resource {name} not found")
+        local.delete_index(name)
+        return None
+
+    @app.post("/index/{name}/vectors/upsert")
+    def upsert(name: str, body: Dict[str, Any] = Body(...)):
+        index, error = get_index(name)
+        if error:
+            return error
+        vectors = body.get("vectors") or []
+        if len(vectors) > MAX_UPSERT_VECTORS:
+            return _data_error(400, 3, f"Upsert of {len(vectors)} vectors exceeds the limit of {MAX_UPSERT_VECTORS}")
+        for vector in vectors:
+            values = vector.get("values") or []
+            if len(values) != index["dimension"]:
+                return _data_error(400, 3, f"Vector dimension {len(values)} does not match "
+                                           f"the dimension of the index {index['dimension']}")
+            metadata_size = len(json.dumps(vector.get("metadata") or {}).encode("utf-8"))
+            if metadata_size > MAX_METADATA_BYTES:
+                return _data_error(400, 3, f"Metadata size is {metadata_size} bytes, which exceeds "
+                                           f"the limit of {MAX_METADATA_BYTES} bytes per vector")
+        if vectors:
+            index["store"].upsert_vectors(
+                [vector["id"] for vector in vectors],
+                [vector["values"] for vector in vectors],
+                metadatas=[vector.get("metadata") or {} for vector in vectors],
+                namespace=body.get("namespace") or ""
+            )
+        return {"upsertedCount": len(vectors)}
+
+    @app.post("/index/{name}/query")
+    def query(name: str, body: Dict[str, Any] = Body(...)):
+        index, error = get_index(name)
+        if error:
+            return error
+        vector = body.get("vector")
+        top_k = body.get("topK") or 10
+        if body.get("filter") or body.get("id") or vector is None:
+            return _data_error(400, 3, "Lokální náhrada podporuje jen dotaz vektorem bez filtru")
+        if len(vector) != index["dimension"]:
+            return _data_error(400, 3, f"Query vector dimension {len(vector)} does not match "
+                                       f"the dimension of the index {index['dimension']}")
+        if top_k > MAX_TOP_K:
+            return _data_error(400, 3, f"topK must be less than or equal to {MAX_TOP_K}")
+
+        namespace = body.get("namespace") or ""
+        hits = index["store"].query(vector, top_k, namespace, include_values=bool(body.get("includeValues")))
+        matches = []
+        for hit in hits:
+            match = {"id": hit["id"], "score": hit["score"], "values": hit.get("values", [])}
+            if body.get("includeMetadata"):
+                match["metadata"] = hit["metadata"]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace, "usage": {"readUnits": 1}}
+
+    @app.post("/index/{name}/vectors/delete")
+    def delete(name: str, body: Dict[str, Any] = Body(...)):
+        index, error = get_index(name)
+        if error:
+            return error
+        if body.get("filter"):
+            return _data_error(400, 3, "Lokální náhrada nepodporuje mazání podle filtru")
+        index["store"].delete(body.get("ids"), delete_all=bool(body.get("deleteAll")),
+                              namespace=body.get("namespace") or "")
+        return {}
+
+    @app.post("/index/{name}/describe_index_stats")
+    def describe_index_stats(name: str):
+        index, error = get_index(name)
+        if error:
+            return error
+        stats = index["store"].describe_index_stats()
+        return {
+            "namespaces": {ns: {"vectorCount": data["vector_count"]} for ns, data in stats["namespaces"].items()},
+            "dimension": index["dimension"],
+            "indexFullness": 0.0,
+            "totalVectorCount": stats["total_vector_count"]
+        }
+
+    @app.get(f"{LOCAL_PREFIX}/stats")
+    def stats():
+        with local._lock:
+            return {route: dict(entry) for route, entry in local.stats.items()}
+
+    return app
+
+def start_in_thread(local: PineconeLocal, host: str = "127.0.0.1",
+                    port: int = 0) -> Tuple[uvicorn.Server, str]:
+    """
+    Spustí náhradu ve vlákně na pozadí (pro benchmarky a testy).
+
+    Args:
+        local: Stav náhrady
+        host: Adresa pro naslouchání
+        port: Port (0 = libovolný volný)
+
+    Returns:
+        Tuple[uvicorn.Server, str]: Server (ukončí se nastavením
+            ``should_exit = True``) a jeho URL pro PINECONE_CONTROLLER_HOST
+    """
+    server = uvicorn.Server(uvicorn.Config(create_app(local), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="pinecone-local", daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("Lokální náhradu Pinecone se nepodařilo spustit")
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://{host}:{port}"
+
+def main():
+    """
+    Spustí náhradu z příkazové řádky.
+    """
+    parser = argparse.ArgumentParser(description="Lokální náhrada služby Pinecone nad NumPy úložištěm")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresa pro naslouchání")
+    parser.add_argument("--port", type=int, default=5080, help="Port")
+    parser.add_argument("--path", help="Adresář pro uložení indexů (jinak jen v paměti)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Medián simulované latence v ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Rozptyl latence (sigma log-normálního rozdělení)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Podíl požadavků se simulovanou chybou (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="Stavový kód simulované chyby")
+    parser.add_argument("--seed", type=int, default=0, help="Seed latence a chyb")
+    parser.add_argument("--api-key", help="Vyžadovaný API klíč (volitelné)")
+    args = parser.parse_args()
+
+    local = PineconeLocal(
+        path=args.path,
+        latency_ms=args.latency_ms,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        api_key=args.api_key
+    )
+    print(f"Lokální náhrada Pinecone na http://{args.host}:{args.port} "
+          f"(PINECONE_CONTROLLER_HOST=http://{args.host}:{args.port})")
+    uvicorn.run(create_app(local), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Sdílené omezení rychlosti volání OpenAI a Pinecone.
+
+Všechna volání v procesu (GUI, CLI, dávkové generování i import nabídek)
+procházejí limitery podle modelu, resp. služby (``pinecone``). Limiter drží
+dva token buckety, požadavky a tokeny za minutu (``RATE_LIMIT_RPM``,
+``RATE_LIMIT_TPM``, pro jednotlivé modely ``RATE_LIMITS``), a čekající
+volání pouští podle priority: interaktivní relace mají přednost před
+dávkovým generováním a to před importem nabídek. Prioritu nastavuje
+``traffic_priority`` pro aktuální kontext (``contextvars``), výchozí je
+interaktivní.
+
+Při odpovědi 429 nebo dočasné chybě serveru ``call_with_retry`` volání
+zopakuje s exponenciálně rostoucím čekáním s náhodným rozptylem. Hlavičku
+``Retry-After`` respektuje a po 429 pozdrží všechna volání stejného
+limiteru, ne jen to, které chybu dostalo. Délku front, dobu čekání
+a počty opakování vrací ``get_rate_limit_stats``.
+"""
+import contextvars
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+import openai
+
+from app.utils.config import get_config
+from app.utils.usage import record_throttle
+
+config = get_config()
+
+T = TypeVar("T")
+
+# Priority provozu (nižší číslo = dřívější obsloužení)
+PRIORITIES = {"interactive": 0, "batch": 1, "ingest": 2}
+
+# Stavové kódy, po kterých má smysl volání zopakovat
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Kratší čekání se do statistiky nezapočítá (jen režie zámku)
+THROTTLE_THRESHOLD = 0.001
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "bidmaster_traffic_priority", default="interactive"
+)
+
+@contextmanager
+def traffic_priority(priority: str) -> Iterator[str]:
+    """
+    Nastaví prioritu volání OpenAI a Pinecone uvnitř bloku ``with``.
+
+    Args:
+        priority: "interactive", "batch" nebo "ingest"
+
+    Yields:
+        str: Nastavená priorita
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Neznámá priorita {priority}, povolené jsou {', '.join(PRIORITIES)}")
+    token = _current_priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _current_priority.reset(token)
+
+def get_traffic_priority() -> str:
+    """Vrátí prioritu nastavenou pro aktuální kontext."""
+    return _current_priority.get()
+
+class TokenBucket:
+    """
+    Kapacita za minutu doplňovaná průběžně (0 = bez omezení).
+
+    Hladina může klesnout pod nulu, pokud se po volání dopočítá skutečná
+    spotřeba tokenů, takže další volání pak počkají déle.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Vrátí počet sekund, za který bude v bucketu ``amount`` jednotek."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        # Požadavek větší než kapacita počká na plný bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float) -> None:
+        """Odebere jednotky (záporné množství je vrátí)."""
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level - amount)
+
+class RateLimiter:
+    """
+    Limiter jednoho modelu nebo služby.
+
+    Volání čekají ve frontě seřazené podle priority a pořadí příchodu;
+    projít může jen první volání ve frontě, a to až ve chvíli, kdy je
+    v obou bucketech dost kapacity a neběží pauza po odpovědi 429.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._blocked_until = 0.0
+        self._stats = {
+            "requests": 0,
+            "throttled": 0,
+            "throttle_seconds": 0.0,
+            "max_queue_depth": 0,
+            "retries": 0,
+            "rate_limited": 0
+        }
+
+    def acquire(self, tokens: int = 0, priority: Optional[str] = None) -> float:
+        """
+        Počká, až volání smí proběhnout, a odebere kapacitu.
+
+        Args:
+            tokens: Odhad tokenů volání
+            priority: Priorita (výchozí podle ``traffic_priority``)
+
+        Returns:
+            float: Doba čekání v sekundách
+        """
+        ticket = (PRIORITIES.get(priority or get_traffic_priority(), 0), next(self._sequence))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+            try:
+                while True:
+                    if self._queue[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    wait = max(
+                        self._blocked_until - now,
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(tokens, now)
+                    )
+                    if wait <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self._stats["requests"] += 1
+            if waited > THROTTLE_THRESHOLD:
+                self._stats["throttled"] += 1
+                self._stats["throttle_seconds"] += waited
+        if waited > THROTTLE_THRESHOLD:
+            record_throttle(waited)
+        return waited
+
+    def adjust(self, tokens: int) -> None:
+        """Dopočítá rozdíl mezi skutečnou a odhadnutou spotřebou tokenů."""
+        with self._cond:
+            self.tokens.take(tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Pozdrží všechna volání limiteru (po odpovědi 429)."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._stats["rate_limited"] += 1
+
+    def record_retry(self) -> None:
+        """Započítá opakované volání."""
+        with self._cond:
+            self._stats["retries"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Vrátí statistiku limiteru.
+
+        Returns:
+            Dict[str, Any]: Nastavené limity, aktuální délka fronty (celkem a podle
+                priority), nejdelší fronta, počet volání, zdržených volání,
+                celková doba čekání, počet opakování a odpovědí 429
+        """
+        with self._cond:
+            by_priority = {name: 0 for name in PRIORITIES}
+            names = {rank: name for name, rank in PRIORITIES.items()}
+            for rank, _ in self._queue:
+                by_priority[names[rank]] += 1
+            return {
+                "rpm": self.requests.capacity,
+                "tpm": self.tokens.capacity,
+                "queue_depth": len(self._queue),
+                "queued": by_priority,
+                **self._stats,
+                "throttle_seconds": round(self._stats["throttle_seconds"], 3)
+            }
+
+_lock = threading.Lock()
+_limiters: Dict[str, RateLimiter] = {}
+
+def _configured_limits(name: str) -> Tuple[float, float]:
+    """Vrátí limity požadavků a tokenů za minutu pro model nebo službu."""
+    overrides = json.loads(config.rate_limits) if config.rate_limits else {}
+    if name in overrides:
+        return float(overrides[name].get("rpm", 0)), float(overrides[name].get("tpm", 0))
+    if name == "pinecone":
+        return 0.0, 0.0
+    return float(config.rate_limit_rpm), float(config.rate_limit_tpm)
+
+def get_limiter(name: str) -> RateLimiter:
+    """
+    Vrátí sdílený limiter modelu nebo služby.
+
+    Args:
+        name: Název modelu OpenAI nebo "pinecone"
+
+    Returns:
+        RateLimiter: Limiter sdílený v rámci procesu
+    """
+    with _lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = RateLimiter(name, *_configured_limits(name))
+        return limiter
+
+def _status(error: Exception) -> Optional[int]:
+    """Vrátí stavový kód HTTP z výjimky OpenAI, Pinecone nebo httpx."""
+    for value in (getattr(error, "status_code", None), getattr(error, "status", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Vrátí dobu čekání z hlaviček odpovědi (``retry-after-ms`` nebo ``Retry-After``).
+
+    Args:
+        error: Výjimka z volání API
+
+    Returns:
+        Optional[float]: Počet sekund, nebo None pokud hlavička chybí
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    headers = {str(key).lower(): value for key, value in headers.items()}
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """Zda má smysl volání po chybě zopakovat (429, dočasná chyba serveru nebo spojení)."""
+    if getattr(error, "stream_started", False):
+        # Streamované volání už předalo část textu, opakování by jej zdvojilo
+        return False
+    status = _status(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError))
+
+def backoff_delay(attempt: int, server_delay: Optional[float] = None) -> float:
+    """
+    Vrátí dobu čekání před dalším pokusem.
+
+    Bez ``Retry-After`` čekání exponenciálně roste (polovina pevně, polovina
+    náhodně), s ním se čeká zadanou dobu plus malý náhodný rozptyl, aby se
+    čekající volání po pauze nevrhla na API všechna najednou.
+
+    Args:
+        attempt: Pořadí opakování (od 0)
+        server_delay: Doba z hlavičky ``Retry-After``
+
+    Returns:
+        float: Počet sekund
+    """
+    if server_delay is not None:
+        return server_delay + random.uniform(0, config.rate_limit_backoff_base)
+    delay = min(config.rate_limit_backoff_max, config.rate_limit_backoff_base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def call_with_retry(name: str, func: Callable[[], T], tokens: int = 0, priority: Optional[str] = None) -> T:
+    """
+    Zavolá funkci přes limiter a po přechodných chybách ji zopakuje.
+
+    Args:
+        name: Název limiteru (model nebo "pinecone")
+        func: Funkce bez parametrů, která provede volání API
+        tokens: Odhad tokenů volání
+        priority: Priorita (výchozí podle ``traffic_priority``)
+
+    Returns:
+        T: Výsledek funkce
+    """
+    limiter = get_limiter(name)
+    attempt = 0
+    while True:
+        limiter.acquire(tokens, priority)
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= config.rate_limit_max_retries or not is_retryable(e):
+                raise
+            status = _status(e)
+            delay = backoff_delay(attempt, retry_after(e))
+            limiter.record_retry()
+            attempt += 1
+            print(f"Volání {name} selhalo ({status or type(e).__name__}), "
+                  f"opakuji za {delay:.1f} s ({attempt}/{config.rate_limit_max_retries})")
+            if status == 429:
+                # Limit je společný pro celý proces, počkat musí všechna volání
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Vrátí statistiku všech limiterů za dobu běhu procesu.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Statistika podle názvu modelu nebo služby
+    """
+    with _lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
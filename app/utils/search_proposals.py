@@ -1,13 +1,17 @@
 """Modul pro vyhledávání v návrzích."""
 from typing import List, Optional
-from langchain.schema import Document
+from langchain_core.documents import Document
 import os
 from dotenv import load_dotenv
 from langchain_pinecone import PineconeVectorStore
 import pinecone
 
+from app.utils.config import get_config
+
 load_dotenv()
 
+config = get_config()
+
 def init_pinecone():
     """Inicializace Pinecone."""
     pinecone.init(
@@ -30,6 +34,11 @@ def search_proposals(query: str, limit: int = 5) -> List[Document]:
     Returns:
         List[Document]: Seznam nalezených dokumentů
     """
+    if config.vector_store == "local":
+        # Lokální úložiště (offline běh), viz app.utils.vector_store
+        from app.utils.vector_store import similarity_search
+        return similarity_search(query, k=limit)
+    
     try:
         vectorstore = init_pinecone()
         results = vectorstore.similarity_search(query, k=limit)
@@ -0,0 +1,143 @@
+"""
+Trvalé úložiště relací (konverzací nad nabídkou).
+
+Po každém kroku konverzace se stav relace uloží jako kompaktní JSON do
+samostatného souboru ``<session_id>.json``. Po restartu procesu lze na
+relaci navázat bez opakování analýzy a sběru informací (CLI přepínač
+``--session-id``, výběr relace v postranním panelu GUI).
+"""
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import get_config
+
+config = get_config()
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+class SessionStore:
+    """Relace uložené jako JSON soubory v jednom adresáři."""
+
+    def __init__(self, directory: str):
+        """
+        Vytvoří úložiště.
+
+        Args:
+            directory: Adresář pro soubory relací
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        """Vrátí cestu k souboru relace."""
+        if not _SAFE_ID.match(session_id):
+            raise ValueError(f"Neplatné ID relace: {session_id}")
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def save(self, session_id: str, state: Dict[str, Any], kind: str = "cli",
+             title: Optional[str] = None) -> None:
+        """
+        Uloží stav relace.
+
+        Soubor se zapisuje přes dočasný soubor a přejmenování, takže pád
+        procesu během zápisu nezanechá poškozenou relaci.
+
+        Args:
+            session_id: ID relace
+            state: Stav relace (serializovatelný do JSON)
+            kind: Typ relace ("cli" nebo "gui"), podle něj se relace filtrují
+            title: Popisek relace pro výběr (např. název klienta)
+        """
+        record = {
+            "session_id": session_id,
+            "kind": kind,
+            "title": title or session_id,
+            "updated": time.time(),
+            "state": state
+        }
+        path = self._path(session_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, separators=(",", ":"), default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Načte relaci.
+
+        Args:
+            session_id: ID relace
+
+        Returns:
+            Optional[Dict[str, Any]]: Záznam s klíči session_id, kind, title,
+                updated a state, nebo None pokud relace neexistuje
+        """
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list_sessions(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Vrátí přehled relací od naposledy změněné.
+
+        Args:
+            kind: Vrátit jen relace daného typu (volitelné)
+
+        Returns:
+            List[Dict[str, Any]]: Relace s klíči session_id, kind, title,
+                updated, current_step a messages (bez celého stavu)
+        """
+        sessions = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Chyba při čtení relace {name}: {e}")
+                continue
+            if kind and record.get("kind") != kind:
+                continue
+            state = record.get("state") or {}
+            sessions.append({
+                "session_id": record["session_id"],
+                "kind": record.get("kind"),
+                "title": record.get("title"),
+                "updated": record.get("updated", 0),
+                "current_step": state.get("current_step"),
+                "messages": len(state.get("chat_history") or [])
+            })
+        sessions.sort(key=lambda s: s["updated"], reverse=True)
+        return sessions
+
+    def delete(self, session_id: str) -> None:
+        """
+        Smaže relaci.
+
+        Args:
+            session_id: ID relace
+        """
+        path = self._path(session_id)
+        if os.path.exists(path):
+            os.unlink(path)
+
+def get_session_store() -> SessionStore:
+    """
+    Vrátí úložiště relací podle konfigurace.
+
+    Returns:
+        SessionStore: Úložiště relací v adresáři SESSION_DIR
+    """
+    return SessionStore(config.session_dir)
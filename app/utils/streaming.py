@@ -0,0 +1,92 @@
+"""
+Streamování tokenů z uzlů grafu do uživatelského rozhraní.
+
+Uzly grafu volají LLM přes ``invoke_llm(..., stream=True)``. Pokud je pro
+aktuální běh grafu nastaven příjemce tokenů (``SimpleStateGraph.invoke(
+state, on_token=...)``), text odpovědi se mu předává průběžně. Příjemce se
+drží v ``contextvars``, takže jej není potřeba předávat přes stav grafu
+a souběžné běhy grafu v různých vláknech se neovlivňují.
+"""
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Union
+
+class TokenStream:
+    """
+    Příjemce tokenů jedné odpovědi asistenta.
+
+    ``on_start`` se volá před prvním tokenem odpovědi, ``on_token`` pro každý
+    úsek textu a ``on_end`` po dokončení odpovědi. Uzly se strukturovaným
+    výstupem (``generate_proposal``) místo textu volají ``on_section`` pro
+    každou dokončenou sekci.
+    """
+
+    def on_start(self) -> None:
+        """Začátek odpovědi."""
+
+    def on_token(self, token: str) -> None:
+        """Další úsek textu odpovědi."""
+
+    def on_end(self) -> None:
+        """Konec odpovědi."""
+
+    def on_section(self, key: str, value: Any) -> None:
+        """Hotová sekce strukturované odpovědi (klíč nejvyšší úrovně JSON objektu)."""
+
+class _CallbackStream(TokenStream):
+    """Obal pro příjemce zadaného jako funkce ``on_token(token)``."""
+
+    def __init__(self, callback: Callable[[str], None]):
+        self.callback = callback
+
+    def on_token(self, token: str) -> None:
+        self.callback(token)
+
+_current_stream: contextvars.ContextVar[Optional[TokenStream]] = contextvars.ContextVar(
+    "bidmaster_token_stream", default=None
+)
+
+@contextmanager
+def token_stream(stream: Union[TokenStream, Callable[[str], None], None]) -> Iterator[Optional[TokenStream]]:
+    """
+    Nastaví příjemce tokenů pro kód uvnitř bloku ``with``.
+
+    Args:
+        stream: Příjemce tokenů (``TokenStream`` nebo funkce ``on_token(token)``)
+
+    Yields:
+        Optional[TokenStream]: Nastavený příjemce
+    """
+    if stream is not None and not isinstance(stream, TokenStream):
+        stream = _CallbackStream(stream)
+    token = _current_stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_stream.reset(token)
+
+def get_token_stream() -> Optional[TokenStream]:
+    """
+    Vrátí příjemce tokenů pro aktuální kontext.
+
+    Returns:
+        Optional[TokenStream]: Příjemce tokenů, nebo None pokud se nestreamuje
+    """
+    return _current_stream.get()
+
+def emit_text(text: str) -> None:
+    """
+    Předá hotový text aktuálnímu příjemci tokenů najednou.
+
+    Používá se pro odpovědi, které nevznikly streamováním (např. z cache
+    nebo ze strukturovaného výstupu), aby je rozhraní zobrazilo stejně.
+
+    Args:
+        text: Text odpovědi
+    """
+    stream = get_token_stream()
+    if stream is None:
+        return
+    stream.on_start()
+    stream.on_token(text)
+    stream.on_end()
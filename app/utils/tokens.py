@@ -0,0 +1,77 @@
+"""
+Počítání tokenů pro rozpočty promptů.
+
+Používá ``tiktoken`` podle názvu modelu. Pokud kódování není k dispozici
+(neznámý model nebo chybějící soubor kódování bez přístupu k síti), počet
+tokenů se odhadne z délky textu.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+from app.utils.config import get_config
+
+config = get_config()
+
+# Průměrný počet znaků na token pro odhad bez tiktoken (česky spíše méně než anglicky)
+CHARS_PER_TOKEN = 3.5
+
+_lock = threading.Lock()
+_encodings: Dict[str, Any] = {}
+
+def _get_encoding(model: str) -> Any:
+    """Vrátí kódování tiktoken pro model, nebo None pokud není k dispozici."""
+    with _lock:
+        if model in _encodings:
+            return _encodings[model]
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"Kódování tokenů pro model {model} není k dispozici, používám odhad: {e}")
+            encoding = None
+        _encodings[model] = encoding
+        return encoding
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Spočítá tokeny textu.
+
+    Args:
+        text: Text
+        model: Název modelu (výchozí z konfigurace)
+
+    Returns:
+        int: Počet tokenů (případně odhad)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model or config.model_name)
+    if encoding is None:
+        return int(len(text) / CHARS_PER_TOKEN) + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Zkrátí text na zadaný počet tokenů.
+
+    Args:
+        text: Text
+        max_tokens: Maximální počet tokenů
+        model: Název modelu (výchozí z konfigurace)
+
+    Returns:
+        str: Zkrácený text (s "..." na konci, pokud byl zkrácen)
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model or config.model_name)
+    if encoding is None:
+        max_chars = int(max_tokens * CHARS_PER_TOKEN)
+        return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]).rstrip() + "..."
@@ -0,0 +1,118 @@
+"""
+Počítání volání LLM a spotřebovaných tokenů.
+
+``invoke_llm`` zaznamená každé volání do počítadla nastaveného pro aktuální
+kontext (``track_usage``). Počítadlo se drží v ``contextvars`` stejně jako
+příjemce tokenů (viz ``app.utils.streaming``), takže souběžně zpracovávané
+poptávky (např. v dávkovém režimu) mají každá vlastní statistiku.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.utils.tokens import count_tokens
+
+class UsageCounter:
+    """Počet volání LLM a tokenů jednoho úseku zpracování."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Model nevrátil usage, počty tokenů jsou odhadnuté z textu
+        self.estimated = False
+        # Doba čekání na limiter rychlosti (viz app.utils.rate_limiter)
+        self.throttle_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, completion_tokens: int, cached: bool = False,
+               estimated: bool = False) -> None:
+        """Přičte jedno volání."""
+        with self._lock:
+            self.calls += 1
+            if cached:
+                self.cached += 1
+                return
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.estimated = self.estimated or estimated
+
+    def record_throttle(self, seconds: float) -> None:
+        """Přičte dobu čekání na limiter rychlosti."""
+        with self._lock:
+            self.throttle_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Vrátí statistiku.
+
+        Returns:
+            Dict[str, Any]: Klíče calls, cached, prompt_tokens, completion_tokens,
+                total_tokens, estimated a throttle_seconds
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "cached": self.cached,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+                "estimated": self.estimated,
+                "throttle_seconds": round(self.throttle_seconds, 3)
+            }
+
+_current_counter: contextvars.ContextVar[Optional[UsageCounter]] = contextvars.ContextVar(
+    "bidmaster_usage_counter", default=None
+)
+
+@contextmanager
+def track_usage() -> Iterator[UsageCounter]:
+    """
+    Počítá volání LLM uvnitř bloku ``with``.
+
+    Yields:
+        UsageCounter: Počítadlo volání a tokenů
+    """
+    counter = UsageCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+def record_usage(messages: List[Any], response: Any, cached: bool = False) -> None:
+    """
+    Zaznamená volání LLM do počítadla aktuálního kontextu (pokud je nastavené).
+
+    Args:
+        messages: Zprávy promptu
+        response: Odpověď modelu
+        cached: Odpověď pochází z cache (tokeny se nepočítají)
+    """
+    counter = _current_counter.get()
+    if counter is None:
+        return
+    if cached:
+        counter.record(0, 0, cached=True)
+        return
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens") is not None:
+        counter.record(usage.get("input_tokens") or 0, usage.get("output_tokens") or 0)
+        return
+    # Bez usage (streamování, náhradní model) se tokeny odhadnou z textu
+    prompt_tokens = sum(count_tokens(str(getattr(m, "content", m))) for m in messages)
+    counter.record(prompt_tokens, count_tokens(str(getattr(response, "content", ""))), estimated=True)
+
+def record_throttle(seconds: float) -> None:
+    """
+    Zaznamená dobu čekání na limiter rychlosti do počítadla aktuálního kontextu.
+
+    Args:
+        seconds: Doba čekání v sekundách
+    """
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record_throttle(seconds)
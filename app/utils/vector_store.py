@@ -1,9 +1,22 @@
 """
 Utilita pro práci s vektorovou databází Pinecone.
+
+S ``VECTOR_STORE=local`` se místo Pinecone používá lokální NumPy úložiště
+uložené na disku (``LOCAL_VECTOR_STORE_PATH``), takže import i vyhledávání
+fungují bez připojení k síti. S ``PINECONE_CONTROLLER_HOST`` se klient
+Pinecone připojí k zadané adrese místo ke cloudové službě, například
+k lokální náhradě z ``app.utils.pinecone_local``.
+
+Datové operace indexu (upsert, query, delete) procházejí sdíleným limiterem
+rychlosti služby "pinecone" (``app.utils.rate_limiter``) s opakováním po
+odpovědi 429.
 """
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
+import contextvars
 import pinecone
 import os
+import threading
 from langchain_openai import OpenAIEmbeddings
 import json
 
@@ -20,13 +33,74 @@ except ImportError:
 from langchain_core.documents import Document
 
 from app.config import get_config
+from app.utils.config import get_config as get_provider_config
+from app.utils.llm_clients import get_embedding_dimension, get_embeddings_model
+from app.utils.local_vector_store import LocalVectorStore
+from app.utils.rate_limiter import call_with_retry
 
 config = get_config()
+# Volba vektorového úložiště a náhradních poskytovatelů je jen v app.utils.config
+provider_config = get_provider_config()
+
+# Sdílené lokální úložiště (VECTOR_STORE=local)
+_local_store: Optional[LocalVectorStore] = None
+
+# Počet vláken pro dávky ukládané s async_req=True
+PINECONE_ASYNC_THREADS = 4
+
+_pool_lock = threading.Lock()
+_async_pool: Optional[ThreadPoolExecutor] = None
+
+class _AsyncResult:
+    """Výsledek operace spuštěné na pozadí s rozhraním ``ApplyResult.get()``."""
+
+    def __init__(self, future: Future):
+        self.future = future
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+class _RateLimitedIndex:
+    """
+    Obal indexu Pinecone, jehož datové operace procházejí sdíleným limiterem.
+    
+    ``PineconeVectorStore`` ukládá dávky s ``async_req=True`` do poolu SDK;
+    obal je místo toho spouští ve vlastním poolu, aby každá dávka prošla
+    limiterem a případným opakováním samostatně.
+    """
+    
+    OPERATIONS = ("upsert", "query", "delete", "fetch", "update", "describe_index_stats")
+    
+    def __init__(self, index: Any):
+        self._index = index
+    
+    def __getattr__(self, name: str) -> Any:
+        if name == "_index":
+            raise AttributeError(name)
+        attr = getattr(self._index, name)
+        if name not in self.OPERATIONS:
+            return attr
+        
+        def operation(*args: Any, async_req: bool = False, **kwargs: Any) -> Any:
+            def run() -> Any:
+                return call_with_retry("pinecone", lambda: attr(*args, **kwargs))
+            if async_req:
+                # Priorita z contextvars se musí přenést do vlákna poolu
+                return _AsyncResult(_get_async_pool().submit(contextvars.copy_context().run, run))
+            return run()
+        return operation
+
+def _get_async_pool() -> ThreadPoolExecutor:
+    """Vrátí sdílený pool pro operace indexu spouštěné s async_req=True."""
+    global _async_pool
+    with _pool_lock:
+        if _async_pool is None:
+            _async_pool = ThreadPoolExecutor(max_workers=PINECONE_ASYNC_THREADS, thread_name_prefix="pinecone")
+        return _async_pool
 
-# Nastavení dimenze vektorů podle použitého modelu
-# text-embedding-3-large má dimenzi 3072
-# text-embedding-3-small má dimenzi 1536
-EMBEDDING_DIMENSION = 3072
+def _client_kwargs() -> Dict[str, Any]:
+    """Vrátí parametry klienta Pinecone (PINECONE_CONTROLLER_HOST místo cloudové služby)."""
+    return {"host": config.pinecone_controller_host} if config.pinecone_controller_host else {}
 
 def init_pinecone() -> None:
     """
@@ -36,15 +110,16 @@ def init_pinecone() -> None:
         # Nový způsob inicializace Pinecone (verze 2.x)
         pc = pinecone.Pinecone(
             api_key=config.pinecone_api_key,
-            environment=config.pinecone_environment
+            environment=config.pinecone_environment,
+            **_client_kwargs()
         )
         
         # Kontrola, zda index existuje, pokud ne, vytvoříme ho
-        index_list = [index.name for index in pc.list_indexes()]
+        index_list = [index.name for index in call_with_retry("pinecone", pc.list_indexes)]
         if config.pinecone_index_name not in index_list:
             pc.create_index(
                 name=config.pinecone_index_name,
-                dimension=EMBEDDING_DIMENSION,  # Používáme správnou dimenzi
+                dimension=get_embedding_dimension(config.embedding_model),
                 metric="cosine",
                 spec=pinecone.ServerlessSpec(
                     cloud="aws",
@@ -65,7 +140,7 @@ def init_pinecone() -> None:
             if config.pinecone_index_name not in pinecone.list_indexes():
                 pinecone.create_index(
                     name=config.pinecone_index_name,
-                    dimension=EMBEDDING_DIMENSION,  # Používáme správnou dimenzi
+                    dimension=get_embedding_dimension(config.embedding_model),
                     metric="cosine"
                 )
         except Exception as e2:
@@ -74,15 +149,36 @@ def init_pinecone() -> None:
 
 def get_embeddings() -> OpenAIEmbeddings:
     """
-    Vrátí instanci OpenAI embeddings.
+    Vrátí sdílenou instanci OpenAI embeddings.
     
     Returns:
         OpenAIEmbeddings: Instance OpenAI embeddings
     """
-    return OpenAIEmbeddings(
-        model=config.embedding_model,
-        openai_api_key=config.openai_api_key
-    )
+    return get_embeddings_model(config.embedding_model)
+
+def get_local_vector_store(namespace: Optional[str] = None) -> LocalVectorStore:
+    """
+    Vrátí lokální vektorové úložiště (VECTOR_STORE=local).
+    
+    Úložiště se načte z LOCAL_VECTOR_STORE_PATH a po každé změně se tam
+    uloží. Je sdílené pro celý proces, namespace se proto předává u operací.
+    
+    Args:
+        namespace: Namespace pro vektorové úložiště (volitelné)
+        
+    Returns:
+        LocalVectorStore: Lokální vektorové úložiště
+    """
+    global _local_store
+    if _local_store is None:
+        print(f"Používám lokální vektorové úložiště: {provider_config.local_vector_store_path}")
+        _local_store = LocalVectorStore(
+            embedding=get_embeddings(),
+            namespace=namespace,
+            path=provider_config.local_vector_store_path,
+            autosave=True
+        )
+    return _local_store
 
 def get_vector_store(namespace: Optional[str] = None) -> PineconeVectorStore:
     """
@@ -94,6 +190,9 @@ def get_vector_store(namespace: Optional[str] = None) -> PineconeVectorStore:
     Returns:
         PineconeVectorStore: Instance vektorového úložiště
     """
+    if provider_config.vector_store == "local":
+        return get_local_vector_store(namespace)
+    
     # Inicializace Pinecone
     init_pinecone()
     
@@ -103,8 +202,8 @@ def get_vector_store(namespace: Optional[str] = None) -> PineconeVectorStore:
     # Vytvoření instance vektorového úložiště
     try:
         # Zkusíme novější způsob inicializace s Pinecone 2.x
-        pc = pinecone.Pinecone(api_key=config.pinecone_api_key)
-        index = pc.Index(config.pinecone_index_name)
+        pc = pinecone.Pinecone(api_key=config.pinecone_api_key, **_client_kwargs())
+        index = _RateLimitedIndex(pc.Index(config.pinecone_index_name))
         
         print(f"Vytvářím vektorové úložiště s novým API. Namespace: {namespace}")
         return PineconeVectorStore(
@@ -132,7 +231,7 @@ def get_vector_store(namespace: Optional[str] = None) -> PineconeVectorStore:
             
             print(f"Vytvářím vektorové úložiště se starším API. Namespace: {namespace}")
             return PineconeVectorStore(
-                index=index,
+                index=_RateLimitedIndex(index),
                 embedding=embeddings,
                 text_key="text",
                 namespace=namespace
@@ -158,8 +257,9 @@ def add_documents_to_vector_store(
     texts: Optional[List[str]] = None,
     metadatas: Optional[List[Dict[str, Any]]] = None,
     namespace: Optional[str] = None,
-    documents: Optional[List[Document]] = None
-) -> None:
+    documents: Optional[List[Document]] = None,
+    ids: Optional[List[str]] = None
+) -> List[str]:
     """
     Přidá dokumenty do vektorové databáze.
     
@@ -169,6 +269,11 @@ def add_documents_to_vector_store(
         metadatas: Seznam metadat k přidání
         namespace: Namespace pro vektorovou databázi
         documents: Seznam dokumentů k přidání (alternativa k texts a metadatas)
+        ids: Deterministická ID vektorů (volitelné); opakovaný upsert se
+            stejnými ID přepíše existující vektory místo vytvoření duplicit
+        
+    Returns:
+        List[str]: ID úspěšně uložených vektorů
     """
     if vector_store is None:
         vector_store = get_vector_store()
@@ -195,19 +300,7 @@ def add_documents_to_vector_store(
                     doc.metadata = minimal_metadata
             
             # Přidání dokumentů do vektorové databáze
-            try:
-                vector_store.add_documents(documents, namespace=namespace)
-            except Exception as e:
-                print(f"Chyba při hromadném přidávání dokumentů: {e}")
-                print("Pokusím se přidat dokumenty jednotlivě...")
-                
-                # Pokud selže hromadné přidání, zkusíme přidat dokumenty jednotlivě
-                for i, doc in enumerate(documents):
-                    try:
-                        vector_store.add_documents([doc], namespace=namespace)
-                        print(f"Dokument {i+1}/{len(documents)} úspěšně přidán.")
-                    except Exception as e2:
-                        print(f"Chyba při přidávání dokumentu {i+1}/{len(documents)}: {e2}")
+            return _add_documents_with_fallback(vector_store, documents, namespace, ids)
         
         elif texts and metadatas:
             # Kontrola velikosti metadat pro každý dokument
@@ -231,19 +324,7 @@ def add_documents_to_vector_store(
                    for text, metadata in zip(texts, metadatas)]
             
             # Přidání dokumentů do vektorové databáze
-            try:
-                vector_store.add_documents(docs, namespace=namespace)
-            except Exception as e:
-                print(f"Chyba při hromadném přidávání dokumentů: {e}")
-                print("Pokusím se přidat dokumenty jednotlivě...")
-                
-                # Pokud selže hromadné přidání, zkusíme přidat dokumenty jednotlivě
-                for i, doc in enumerate(docs):
-                    try:
-                        vector_store.add_documents([doc], namespace=namespace)
-                        print(f"Dokument {i+1}/{len(docs)} úspěšně přidán.")
-                    except Exception as e2:
-                        print(f"Chyba při přidávání dokumentu {i+1}/{len(docs)}: {e2}")
+            return _add_documents_with_fallback(vector_store, docs, namespace, ids)
         
         else:
             raise ValueError("Je třeba poskytnout buď documents nebo texts a metadatas")
@@ -252,6 +333,48 @@ def add_documents_to_vector_store(
         print(f"Chyba při přidávání dokumentů do vektorové databáze: {e}")
         raise
 
+def _add_documents_with_fallback(
+    vector_store: PineconeVectorStore,
+    documents: List[Document],
+    namespace: Optional[str],
+    ids: Optional[List[str]]
+) -> List[str]:
+    """
+    Přidá dokumenty hromadně, při chybě zkusí přidat dokumenty jednotlivě.
+    
+    Args:
+        vector_store: Instance vektorové databáze
+        documents: Seznam dokumentů k přidání
+        namespace: Namespace pro vektorovou databázi
+        ids: Deterministická ID vektorů (volitelné)
+        
+    Returns:
+        List[str]: ID úspěšně uložených vektorů
+    """
+    kwargs = {"namespace": namespace}
+    if ids is not None:
+        kwargs["ids"] = ids
+    
+    try:
+        return list(vector_store.add_documents(documents, **kwargs) or ids or [])
+    except Exception as e:
+        print(f"Chyba při hromadném přidávání dokumentů: {e}")
+        print("Pokusím se přidat dokumenty jednotlivě...")
+    
+    # Pokud selže hromadné přidání, zkusíme přidat dokumenty jednotlivě
+    added_ids = []
+    for i, doc in enumerate(documents):
+        single_kwargs = {"namespace": namespace}
+        if ids is not None:
+            single_kwargs["ids"] = [ids[i]]
+        try:
+            added_ids.extend(vector_store.add_documents([doc], **single_kwargs) or single_kwargs.get("ids", []))
+            print(f"Dokument {i+1}/{len(documents)} úspěšně přidán.")
+        except Exception as e2:
+            print(f"Chyba při přidávání dokumentu {i+1}/{len(documents)}: {e2}")
+    
+    return added_ids
+
 def similarity_search(query: str, k: int = 5, namespace: Optional[str] = None) -> List[Document]:
     """
     Provede vyhledávání podobných dokumentů.
@@ -277,7 +400,7 @@ def similarity_search(query: str, k: int = 5, namespace: Optional[str] = None) -
     print(f"Namespace: {namespace}")
     
     try:
-        results = vector_store.similarity_search(query, k=k)
+        results = vector_store.similarity_search(query, k=k, namespace=namespace)
         print(f"Nalezeno {len(results)} výsledků.")
         return results
     except Exception as e:
@@ -295,8 +418,8 @@ def delete_all_vectors() -> None:
         # Získání instance indexu
         try:
             # Zkusíme novější způsob inicializace s Pinecone 2.x
-            pc = pinecone.Pinecone(api_key=config.pinecone_api_key)
-            index = pc.Index(config.pinecone_index_name)
+            pc = pinecone.Pinecone(api_key=config.pinecone_api_key, **_client_kwargs())
+            index = _RateLimitedIndex(pc.Index(config.pinecone_index_name))
             
             # Smazání všech vektorů
             index.delete(delete_all=True)
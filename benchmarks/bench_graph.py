@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark celého toku generování nabídky bez přístupu k síti.
+
+Spustí graf stejně jako CLI (analýza poptávky, několik odpovědí uživatele,
+generování nabídky a vytvoření DOCX) s deterministickými náhradami LLM
+a embeddings (``LLM_PROVIDER=fake``, ``EMBEDDING_PROVIDER=fake``) a lokálním
+vektorovým úložištěm (``VECTOR_STORE=local``). Simulovaná latence LLM se
+nastavuje parametry ``--latency-ms`` a ``--jitter``; se stejným ``--seed``
+jsou odpovědi i latence mezi běhy shodné. Report obsahuje dobu běhu
+jednotlivých uzlů grafu a lze jej porovnávat mezi commity.
+
+Použití:
+    python3 benchmarks/bench_graph.py --runs 20 --output graph_report.json
+    python3 benchmarks/bench_graph.py --runs 20 --latency-ms 300 --jitter 0.3 --baseline graph_report.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Přidání kořenového adresáře do cesty pro import
+sys.path.insert(0, str(ROOT))
+
+# Moduly aplikace (včetně bench_ingest) se importují až po nastavení
+# proměnných prostředí, konfigurace se načítá při importu
+
+DEFAULT_REQUEST = ROOT / "data" / "proposals" / "poptavka_vzor.txt"
+
+# Odpovědi uživatele při sběru informací; poslední spustí generování nabídky
+USER_TURNS = [
+    "Jde o přibližně 3000 zaměstnanců a 500 externistů.",
+    "Integrovat potřebujeme Active Directory, SAP HR a Office 365.",
+    "Implementaci potřebujeme dokončit do konce příštího roku, rozpočet je 2 mil. Kč.",
+    "vytvoř nabídku"
+]
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Nastaví náhradní poskytovatele; musí proběhnout před importem aplikace."""
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "EMBEDDING_PROVIDER": "fake",
+        "VECTOR_STORE": "local",
+        "LOCAL_VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_LATENCY_JITTER": str(args.jitter),
+        "FAKE_LLM_SEED": str(args.seed),
+        "CHECKPOINT_STORE": "memory",
+        "LLM_CACHE": "False",
+        "LLM_SEMANTIC_CACHE": "False",
+        "GATHER_MODE": args.gather_mode
+    })
+
+def percentile(values: List[float], q: float) -> float:
+    """Vrátí percentil hodnot (nejbližší pořadí)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def run_benchmark(args: argparse.Namespace, client_request: str) -> Dict[str, Any]:
+    """
+    Spustí benchmark grafu.
+
+    Args:
+        args: Parametry benchmarku
+        client_request: Text poptávky
+
+    Returns:
+        Dict[str, Any]: Report benchmarku
+    """
+    from app.chains.proposal_graph import Step, create_proposal_graph, init_proposal_state, process_user_input
+    from app.utils.import_proposals import import_proposals
+    from bench_ingest import peak_rss_mb
+
+    if args.corpus:
+        # Naplnění lokálního úložiště, aby se měřilo i vyhledávání kontextu
+        import_proposals(args.corpus)
+
+    graph = create_proposal_graph()
+    node_timings: Dict[str, List[float]] = {}
+    totals = []
+    documents = 0
+
+    for run in range(args.runs):
+        start = time.perf_counter()
+        # Název klienta se liší, aby se mezi běhy nesdílel přehled poptávky
+        state = init_proposal_state(client_request, f"Klient {run}", session_id=f"bench{run}")
+        timings: List[Dict[str, float]] = []
+        state = graph.invoke(state)
+        timings.append(dict(graph.last_timings))
+        for index, turn in enumerate(USER_TURNS):
+            state = process_user_input(state, turn)
+            state = graph.invoke(state)
+            timings.append(dict(graph.last_timings))
+            # Běžná odpověď nesmí spustit generování, jinak by se měřil jiný tok
+            if index < len(USER_TURNS) - 1 and state["current_step"] != Step.GATHER_INFORMATION:
+                raise RuntimeError(f"Odpověď {turn!r} ukončila sběr informací (krok {state['current_step']})")
+        totals.append(time.perf_counter() - start)
+        if state.get("document_path") and os.path.exists(state["document_path"]):
+            documents += 1
+        for step_timings in timings:
+            for node, seconds in step_timings.items():
+                node_timings.setdefault(node, []).append(seconds)
+
+    nodes = {
+        node: {
+            "calls": len(values),
+            "mean": round(statistics.mean(values), 4),
+            "p50": round(percentile(values, 0.5), 4),
+            "p95": round(percentile(values, 0.95), 4)
+        }
+        for node, values in node_timings.items()
+    }
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "runs": args.runs,
+            "latency_ms": args.latency_ms,
+            "jitter": args.jitter,
+            "seed": args.seed,
+            "gather_mode": args.gather_mode,
+            "corpus": os.path.abspath(args.corpus) if args.corpus else None
+        },
+        "documents": documents,
+        "nodes": nodes,
+        "total": {
+            "mean": round(statistics.mean(totals), 4),
+            "p50": round(percentile(totals, 0.5), 4),
+            "p95": round(percentile(totals, 0.95), 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }
+    }
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    """Vypíše report, případně s rozdílem proti baseline."""
+    params = report["params"]
+    print(f"Běhy: {params['runs']}, latence LLM {params['latency_ms']} ms (jitter {params['jitter']}), "
+          f"dokumenty: {report['documents']}")
+    print(f"{'uzel':<20} {'volání':>7} {'průměr s':>10} {'p50 s':>8} {'p95 s':>8}")
+    rows = list(report["nodes"].items()) + [("celý tok", {**report["total"], "calls": params["runs"]})]
+    for name, row in rows:
+        line = f"{name:<20} {row['calls']:>7} {row['mean']:>10.4f} {row['p50']:>8.4f} {row['p95']:>8.4f}"
+        if baseline:
+            base = baseline["total"] if name == "celý tok" else baseline["nodes"].get(name)
+            if base and base["mean"]:
+                line += f"  ({(row['mean'] - base['mean']) / base['mean'] * 100:+.1f} % času)"
+        print(line)
+
+def main():
+    """
+    Hlavní funkce benchmarku.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark toku generování nabídky bez přístupu k síti")
+    parser.add_argument("--request", default=str(DEFAULT_REQUEST), help="Soubor s poptávkou klienta")
+    parser.add_argument("--corpus", help="Adresář s nabídkami pro naplnění lokálního úložiště (volitelné)")
+    parser.add_argument("--runs", type=int, default=10, help="Počet běhů celého toku")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Medián simulované latence LLM v ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Rozptyl latence (sigma log-normálního rozdělení)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed odpovědí a latence")
+    parser.add_argument("--gather-mode", default="parallel", choices=["parallel", "structured", "sequential"])
+    parser.add_argument("--output", "-o", help="Cesta pro uložení JSON reportu")
+    parser.add_argument("--baseline", "-b", help="JSON report předchozího běhu pro porovnání")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Nepotlačovat výpisy aplikace")
+    args = parser.parse_args()
+
+    with open(args.request, "r", encoding="utf-8") as f:
+        client_request = f.read()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    if args.corpus:
+        args.corpus = os.path.abspath(args.corpus)
+
+    with tempfile.TemporaryDirectory(prefix="bidmaster_bench_") as workdir:
+        configure_environment(args, workdir)
+        from bench_ingest import git_revision
+        revision = git_revision()
+        # Dokumenty a lokální úložiště vznikají v dočasném adresáři
+        os.chdir(workdir)
+        if args.verbose:
+            report = run_benchmark(args, client_request)
+        else:
+            with open(os.devnull, "w") as devnull:
+                stdout = sys.stdout
+                sys.stdout = devnull
+                try:
+                    report = run_benchmark(args, client_request)
+                finally:
+                    sys.stdout = stdout
+        report["revision"] = revision
+
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Porovnání s {baseline_path} (revize {baseline.get('revision')})")
+    print_report(report, baseline)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Report uložen do {output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
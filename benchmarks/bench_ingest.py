@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark ingestu nabídek po jednotlivých fázích.
+
+Měří fáze parse (extrakce textu a metadat), chunk (rozdělení na chunky),
+embed (stub embedding model bez volání API) a upsert (uložení do lokálního
+NumPy úložiště). Výsledkem je JSON report s propustností (dokumenty/s,
+chunky/s) a špičkovou pamětí procesu, který lze porovnávat mezi commity.
+
+Použití:
+    python3 benchmarks/generate_corpus.py --count 100 --output benchmarks/corpus
+    python3 benchmarks/bench_ingest.py benchmarks/corpus --output report.json
+    python3 benchmarks/bench_ingest.py benchmarks/corpus --baseline report.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Přidání kořenového adresáře do cesty pro import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.import_journal import make_chunk_id, file_sha1
+from app.utils.import_proposals import collect_files, process_file, split_text
+from app.utils.local_vector_store import LocalVectorStore
+from app.utils.fake_providers import HashEmbeddings
+
+def peak_rss_mb() -> float:
+    """Vrátí špičkovou paměť procesu v MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux vrací kB, macOS bajty
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def git_revision() -> str:
+    """Vrátí aktuální commit, pokud je dostupný."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def run_benchmark(corpus_dir: str, batch_size: int, dimension: int) -> Dict[str, Any]:
+    """
+    Spustí benchmark nad korpusem.
+
+    Args:
+        corpus_dir: Adresář s korpusem
+        batch_size: Velikost dávky pro embed a upsert
+        dimension: Dimenze stub embeddingů
+
+    Returns:
+        Dict[str, Any]: Report benchmarku
+    """
+    files = collect_files(corpus_dir)
+    stages: Dict[str, Dict[str, float]] = {}
+
+    def record(stage: str, seconds: float, docs: int, chunks: int) -> None:
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "docs_per_second": round(docs / seconds, 2) if seconds else None,
+            "chunks_per_second": round(chunks / seconds, 2) if seconds else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }
+
+    # Fáze 1: parse
+    start = time.perf_counter()
+    parsed = []
+    for file_path in files:
+        doc = process_file(file_path)
+        if doc and doc["text"] and not doc["metadata"].get("error"):
+            parsed.append((file_path, doc))
+    parse_seconds = time.perf_counter() - start
+
+    # Fáze 2: chunk
+    start = time.perf_counter()
+    chunks: List[Dict[str, Any]] = []
+    for file_path, doc in parsed:
+        file_hash = file_sha1(file_path)
+        pieces = split_text(doc["text"])
+        for i, piece in enumerate(pieces):
+            chunks.append({
+                "id": make_chunk_id(file_hash, i),
+                "text": piece,
+                "metadata": {**doc["metadata"], "chunk_id": i, "total_chunks": len(pieces)}
+            })
+    chunk_seconds = time.perf_counter() - start
+
+    docs_count = len(parsed)
+    chunks_count = len(chunks)
+    record("parse", parse_seconds, docs_count, chunks_count)
+    record("chunk", chunk_seconds, docs_count, chunks_count)
+
+    # Fáze 3: embed
+    embeddings = HashEmbeddings(dimension)
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, chunks_count, batch_size):
+        vectors.extend(embeddings.embed_documents([c["text"] for c in chunks[i:i + batch_size]]))
+    record("embed", time.perf_counter() - start, docs_count, chunks_count)
+
+    # Fáze 4: upsert
+    store = LocalVectorStore(embedding=embeddings, namespace="proposals")
+    start = time.perf_counter()
+    for i in range(0, chunks_count, batch_size):
+        batch = chunks[i:i + batch_size]
+        store.upsert_vectors(
+            [c["id"] for c in batch],
+            vectors[i:i + batch_size],
+            [c["text"] for c in batch],
+            [c["metadata"] for c in batch]
+        )
+    record("upsert", time.perf_counter() - start, docs_count, chunks_count)
+
+    total = sum(stage["seconds"] for stage in stages.values())
+    by_format: Dict[str, int] = {}
+    for file_path, _ in parsed:
+        suffix = Path(file_path).suffix.lower().lstrip(".")
+        by_format[suffix] = by_format.get(suffix, 0) + 1
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": os.path.abspath(corpus_dir),
+        "params": {"batch_size": batch_size, "dimension": dimension},
+        "files": len(files),
+        "documents": docs_count,
+        "documents_by_format": by_format,
+        "chunks": chunks_count,
+        "stages": stages,
+        "total": {
+            "seconds": round(total, 4),
+            "docs_per_second": round(docs_count / total, 2) if total else None,
+            "chunks_per_second": round(chunks_count / total, 2) if total else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        },
+        "index_stats": store.describe_index_stats()
+    }
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    """Vypíše report, případně s rozdílem proti baseline."""
+    print(f"Dokumenty: {report['documents']} ({report['documents_by_format']}), chunky: {report['chunks']}")
+    print(f"{'fáze':<8} {'s':>9} {'dok/s':>10} {'chunk/s':>11} {'RSS MB':>8}")
+    rows = list(report["stages"].items()) + [("celkem", report["total"])]
+    for name, stage in rows:
+        line = (f"{name:<8} {stage['seconds']:>9.3f} {stage['docs_per_second'] or 0:>10.1f} "
+                f"{stage['chunks_per_second'] or 0:>11.1f} {stage['peak_rss_mb']:>8.1f}")
+        if baseline:
+            base = baseline["total"] if name == "celkem" else baseline["stages"].get(name)
+            if base and base["seconds"]:
+                line += f"  ({(stage['seconds'] - base['seconds']) / base['seconds'] * 100:+.1f} % času)"
+        print(line)
+
+def main():
+    """
+    Hlavní funkce benchmarku.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark ingestu nabídek")
+    parser.add_argument("corpus", help="Adresář s korpusem (viz generate_corpus.py)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Velikost dávky pro embed a upsert")
+    parser.add_argument("--dimension", type=int, default=256, help="Dimenze stub embeddingů")
+    parser.add_argument("--output", "-o", help="Cesta pro uložení JSON reportu")
+    parser.add_argument("--baseline", "-b", help="JSON report předchozího běhu pro porovnání")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.corpus, args.batch_size, args.dimension)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Porovnání s {args.baseline} (revize {baseline.get('revision')})")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Report uložen do {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
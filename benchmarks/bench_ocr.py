@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark OCR fallbacku pro naskenované PDF.
+
+Pro každý počet procesů rozpozná všechny stránky zadaného PDF (bez cache)
+a vypíše propustnost v stránkách za sekundu. Nakonec ověří, že druhý
+průchod se zapnutou cache žádnou stránku znovu nerozpoznává.
+
+Použití:
+    python3 benchmarks/bench_ocr.py data/proposals/sken.pdf --workers 1,2,4,8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Přidání kořenového adresáře do cesty pro import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.pdf_ocr import PdfReader, extract_pdf_pages, ocr_available, ocr_pages
+
+def main():
+    """
+    Hlavní funkce benchmarku.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark OCR naskenovaných PDF")
+    parser.add_argument("pdf", help="Cesta k naskenovanému PDF")
+    parser.add_argument("--workers", default="1,2,4", help="Seznam počtů procesů oddělený čárkou")
+    parser.add_argument("--output", help="Cesta pro uložení JSON reportu (volitelné)")
+    args = parser.parse_args()
+
+    if PdfReader is None or not ocr_available():
+        print("Chyba: Pro benchmark je potřeba pypdf, pytesseract a pdf2image (a nainstalovaný Tesseract a Poppler).")
+        return 1
+
+    page_count = len(PdfReader(args.pdf).pages)
+    page_numbers = list(range(1, page_count + 1))
+    print(f"Dokument: {args.pdf} ({page_count} stránek), CPU: {os.cpu_count()}")
+
+    results = []
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        start = time.perf_counter()
+        ocr_pages(args.pdf, page_numbers, workers=workers)
+        elapsed = time.perf_counter() - start
+        pages_per_second = page_count / elapsed if elapsed else 0.0
+        results.append({
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(pages_per_second, 3),
+            "pages_per_second_per_worker": round(pages_per_second / workers, 3)
+        })
+        print(f"  {workers:>2} procesů: {elapsed:7.2f} s, {pages_per_second:6.2f} stránek/s "
+              f"({pages_per_second / workers:.2f} na proces)")
+
+    # Ověření cache - druhý průchod nesmí spouštět OCR
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        extract_pdf_pages(args.pdf, cache_dir=cache_dir)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        extract_pdf_pages(args.pdf, cache_dir=cache_dir)
+        warm = time.perf_counter() - start
+    print(f"Extrakce s cache: první průchod {cold:.2f} s, opakovaný průchod {warm:.2f} s")
+
+    report = {
+        "pdf": args.pdf,
+        "pages": page_count,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+        "cache": {"cold_seconds": round(cold, 3), "warm_seconds": round(warm, 3)}
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report uložen do {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
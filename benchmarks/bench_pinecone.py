@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Zátěžový test ``vector_store.py`` přes skutečné SDK Pinecone proti lokální náhradě.
+
+Spustí ``app.utils.pinecone_local`` ve vlákně na pozadí a nasměruje na ni
+aplikaci (``PINECONE_CONTROLLER_HOST``). Embeddings nahrazuje ``HashEmbeddings``
+(``EMBEDDING_PROVIDER=fake``), takže se měří jen cesta aplikace a SDK
+(dávkování, opakování po chybách, záložní cesty) bez volání externích
+služeb. Souběžně ukládá syntetické chunky přes
+``add_documents_to_vector_store`` a pak souběžně vyhledává přes
+``similarity_search``. Report obsahuje propustnost, p50/p95 latence
+operací, počet chybějících vektorů a statistiku požadavků na náhradě
+(včetně simulovaných chyb, které SDK zopakovalo).
+
+Použití:
+    python3 benchmarks/bench_pinecone.py --chunks 2000 --latency-ms 20 --error-rate 0.05 --output pinecone_report.json
+    python3 benchmarks/bench_pinecone.py --chunks 2000 --latency-ms 20 --error-rate 0.05 --baseline pinecone_report.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Přidání kořenového adresáře do cesty pro import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.pinecone_local import PineconeLocal, start_in_thread
+
+# Moduly aplikace se importují až po nastavení proměnných prostředí,
+# konfigurace se načítá při importu
+
+NAMESPACE = "bench"
+
+def configure_environment(host: str, index_name: str) -> None:
+    """Nasměruje aplikaci na lokální náhradu; musí proběhnout před importem aplikace."""
+    os.environ.update({
+        "PINECONE_CONTROLLER_HOST": host,
+        "PINECONE_API_KEY": "pclocal",
+        "PINECONE_INDEX_NAME": index_name,
+        "VECTOR_STORE": "pinecone",
+        "EMBEDDING_PROVIDER": "fake"
+    })
+
+def percentile(values: List[float], q: float) -> float:
+    """Vrátí percentil hodnot (nejbližší pořadí)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def summarize(latencies: List[float], elapsed: float, operations: int) -> Dict[str, Any]:
+    """Vrátí souhrn latencí a propustnosti jedné fáze."""
+    return {
+        "operations": operations,
+        "seconds": round(elapsed, 4),
+        "ops_per_second": round(operations / elapsed, 2) if elapsed else None,
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p95": round(percentile(latencies, 0.95), 4)
+    }
+
+def run_benchmark(args: argparse.Namespace, local: PineconeLocal) -> Dict[str, Any]:
+    """
+    Spustí zátěžový test proti běžící náhradě.
+
+    Args:
+        args: Parametry benchmarku
+        local: Stav náhrady (pro statistiku požadavků)
+
+    Returns:
+        Dict[str, Any]: Report benchmarku
+    """
+    from langchain_core.documents import Document
+    from app.utils.vector_store import add_documents_to_vector_store, get_vector_store, similarity_search
+    from generate_corpus import paragraph
+
+    rng = random.Random(args.seed)
+    documents = [
+        Document(page_content=paragraph(rng, 4), metadata={"source": f"bench_{i // 10}.docx", "chunk_id": i % 10})
+        for i in range(args.chunks)
+    ]
+    ids = [f"bench_{i}" for i in range(args.chunks)]
+    batches = [
+        (documents[start:start + args.batch_size], ids[start:start + args.batch_size])
+        for start in range(0, len(documents), args.batch_size)
+    ]
+
+    vector_store = get_vector_store(namespace=NAMESPACE)
+
+    def add_batch(batch: Tuple[List[Document], List[str]]) -> Tuple[int, float]:
+        start = time.perf_counter()
+        try:
+            stored = add_documents_to_vector_store(vector_store, documents=batch[0], namespace=NAMESPACE, ids=batch[1])
+        except Exception:
+            stored = []
+        return len(stored), time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(add_batch, batches))
+    upsert_elapsed = time.perf_counter() - start
+    stored = sum(count for count, _ in results)
+
+    queries = [paragraph(rng, 1) for _ in range(args.queries)]
+
+    def search(query: str) -> Tuple[int, float]:
+        start = time.perf_counter()
+        found = similarity_search(query, k=args.k, namespace=NAMESPACE)
+        return len(found), time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        search_results = list(executor.map(search, queries))
+    search_elapsed = time.perf_counter() - start
+
+    # Počet vektorů přímo v úložišti náhrady (nezávisle na odpovědích SDK)
+    index_stats = local.indexes["bench"]["store"].describe_index_stats()
+    with local._lock:
+        server_stats = {route: dict(entry) for route, entry in local.stats.items()}
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "chunks": args.chunks,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "queries": args.queries,
+            "k": args.k,
+            "latency_ms": args.latency_ms,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "error_status": args.error_status,
+            "seed": args.seed
+        },
+        "upsert": {
+            **summarize([latency for _, latency in results], upsert_elapsed, len(batches)),
+            "chunks_per_second": round(stored / upsert_elapsed, 2) if upsert_elapsed else None,
+            "stored": stored,
+            "missing": args.chunks - index_stats["namespaces"].get(NAMESPACE, {}).get("vector_count", 0)
+        },
+        "search": {
+            **summarize([latency for _, latency in search_results], search_elapsed, len(queries)),
+            "empty": sum(1 for count, _ in search_results if count == 0)
+        },
+        "server": server_stats
+    }
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    """Vypíše report, případně s rozdílem proti baseline."""
+    params = report["params"]
+    print(f"Chunky: {params['chunks']} po {params['batch_size']}, vlákna: {params['workers']}, "
+          f"latence {params['latency_ms']} ms (jitter {params['jitter']}), "
+          f"chyby {params['error_rate'] * 100:.1f} % (HTTP {params['error_status']})")
+    print(f"{'fáze':<8} {'operace':>8} {'s':>9} {'op/s':>9} {'p50 s':>8} {'p95 s':>8}")
+    for name in ("upsert", "search"):
+        row = report[name]
+        line = (f"{name:<8} {row['operations']:>8} {row['seconds']:>9.3f} {row['ops_per_second'] or 0:>9.1f} "
+                f"{row['p50']:>8.4f} {row['p95']:>8.4f}")
+        base = baseline.get(name) if baseline else None
+        if base and base["seconds"]:
+            line += f"  ({(row['seconds'] - base['seconds']) / base['seconds'] * 100:+.1f} % času)"
+        print(line)
+    print(f"Uloženo {report['upsert']['stored']} chunků, v indexu chybí {report['upsert']['missing']}, "
+          f"prázdných vyhledávání {report['search']['empty']}")
+    print("Požadavky na náhradě (požadavky / chyby / simulované chyby):")
+    for route, entry in sorted(report["server"].items()):
+        print(f"  {route:<32} {entry['requests']:>6} {entry['errors']:>6} {entry['injected']:>6}")
+
+def main():
+    """
+    Hlavní funkce benchmarku.
+    """
+    parser = argparse.ArgumentParser(description="Zátěžový test vektorového úložiště proti lokální náhradě Pinecone")
+    parser.add_argument("--chunks", type=int, default=1000, help="Počet ukládaných chunků")
+    parser.add_argument("--batch-size", type=int, default=100, help="Počet chunků v jednom volání add_documents_to_vector_store")
+    parser.add_argument("--workers", type=int, default=4, help="Počet souběžných vláken")
+    parser.add_argument("--queries", type=int, default=200, help="Počet vyhledávání")
+    parser.add_argument("--k", type=int, default=5, help="Počet výsledků vyhledávání")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Medián simulované latence náhrady v ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Rozptyl latence (sigma log-normálního rozdělení)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Podíl požadavků se simulovanou chybou (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="Stavový kód simulované chyby")
+    parser.add_argument("--seed", type=int, default=0, help="Seed dat, latence a chyb")
+    parser.add_argument("--output", "-o", help="Cesta pro uložení JSON reportu")
+    parser.add_argument("--baseline", "-b", help="JSON report předchozího běhu pro porovnání")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Nepotlačovat výpisy aplikace")
+    args = parser.parse_args()
+
+    local = PineconeLocal(
+        latency_ms=args.latency_ms,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+    server, host = start_in_thread(local)
+    configure_environment(host, "bench")
+    from bench_ingest import git_revision
+
+    try:
+        if args.verbose:
+            report = run_benchmark(args, local)
+        else:
+            with open(os.devnull, "w") as devnull:
+                stdout = sys.stdout
+                sys.stdout = devnull
+                try:
+                    report = run_benchmark(args, local)
+                finally:
+                    sys.stdout = stdout
+    finally:
+        server.should_exit = True
+    report["revision"] = git_revision()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Porovnání s {args.baseline} (revize {baseline.get('revision')})")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Report uložen do {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
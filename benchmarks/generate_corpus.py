@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Generátor syntetického korpusu nabídek pro benchmarky ingestu.
+
+Vytvoří N nabídek s česky vypadajícím textem ve třech formátech:
+DOCX (přes ``docx_generator.create_proposal_document``), PDF a JSON ve tvaru
+``data/proposals/json/example_proposal.json``. Generátor je deterministický
+(řízený parametrem ``--seed``), takže stejné parametry dávají stejný korpus
+a výsledky benchmarků lze porovnávat mezi commity.
+
+Použití:
+    python3 benchmarks/generate_corpus.py --count 100 --output benchmarks/corpus
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import textwrap
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Přidání kořenového adresáře do cesty pro import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECTS = [
+    "Implementace MidPoint", "Správa identit", "Řízení přístupů", "Integrace s Active Directory",
+    "Schvalovací workflow", "Samoobslužný portál", "Rekonciliace účtů", "Auditní záznamy",
+    "Řízení rolí", "Zřizování účtů", "Dodavatel", "Projektový tým", "Zákazník"
+]
+VERBS = [
+    "zajistí", "zahrnuje", "umožní", "podporuje", "automatizuje", "propojí", "zjednoduší",
+    "zkrátí", "sjednotí", "zpřehlední", "nahradí", "rozšíří"
+]
+OBJECTS = [
+    "centrální správu uživatelských účtů", "životní cyklus identit", "přidělování oprávnění",
+    "integraci s personálním systémem", "napojení na Microsoft 365", "synchronizaci s SAP",
+    "reporting pro bezpečnostní oddělení", "schvalování žádostí o přístup", "pravidelnou recertifikaci",
+    "školení administrátorů", "migraci stávajících dat", "monitoring a podporu provozu"
+]
+TAILS = [
+    "v souladu s požadavky zákazníka", "během první fáze projektu", "bez dopadu na běžný provoz",
+    "s důrazem na bezpečnost", "podle osvědčené metodiky", "v termínu do konce čtvrtletí",
+    "pro všechny pobočky společnosti", "včetně dokumentace a předávacího protokolu"
+]
+COMPANIES = [
+    "ABC Finance", "Krajská nemocnice", "Městský úřad", "Energetika Morava", "Logistika Praha",
+    "Pojišťovna Jistota", "Technické služby", "Univerzita Severní Čechy", "Strojírny Brno"
+]
+LEGAL_FORMS = ["a.s.", "s.r.o.", "p.o.", "s.p."]
+
+def sentence(rng: random.Random) -> str:
+    """Vytvoří jednu větu."""
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(TAILS)}."
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    """Vytvoří odstavec o zadaném počtu vět."""
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+def numbered_list(rng: random.Random, items: int, suffix: str = "") -> str:
+    """Vytvoří číslovaný seznam."""
+    return "\n".join(f"{i}. {rng.choice(OBJECTS).capitalize()}{suffix}" for i in range(1, items + 1))
+
+def make_proposal(index: int, rng: random.Random, size: int) -> Dict[str, Any]:
+    """
+    Vytvoří data jedné nabídky ve tvaru example_proposal.json.
+
+    Args:
+        index: Pořadí nabídky
+        rng: Generátor náhodných čísel
+        size: Násobek délky textu (1 = přibližně velikost vzorové nabídky)
+
+    Returns:
+        Dict[str, Any]: Data nabídky
+    """
+    client_name = f"{rng.choice(COMPANIES)} {index}, {rng.choice(LEGAL_FORMS)}"
+    phases = rng.randint(4, 8)
+    return {
+        "client_name": client_name,
+        "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "version": "1.0",
+        "introduction": paragraph(rng, 3 * size),
+        "solution_description": "\n\n".join(paragraph(rng, 4) for _ in range(3 * size)),
+        "scope_of_work": "Implementace zahrnuje následující práce:\n" + numbered_list(rng, 6 * size),
+        "timeline": "Implementace bude probíhat v následujících fázích:\n"
+                    + numbered_list(rng, phases, f" ({rng.randint(1, 6)} týdny)")
+                    + f"\n\nCelková doba implementace: {phases * 3} týdnů",
+        "pricing": "Celková cena implementace je uvedena bez DPH:\n\n"
+                   + "\n".join(f"{i}. {rng.choice(OBJECTS).capitalize()}: {rng.randint(5, 90) * 10000} Kč"
+                               for i in range(1, 6)),
+        "contact_info": "Pro další informace nás kontaktujte na info@example.com nebo na telefonu +420 123 456 789."
+    }
+
+def proposal_text(data: Dict[str, Any]) -> str:
+    """Složí text nabídky pro PDF."""
+    return "\n\n".join([
+        f"Nabídka implementace MidPoint pro {data['client_name']}",
+        f"Datum: {data['date']}",
+        f"Verze: {data['version']}",
+        data["introduction"],
+        data["solution_description"],
+        data["scope_of_work"],
+        data["timeline"],
+        data["pricing"],
+        data["contact_info"]
+    ])
+
+def _pdf_escape(line: str) -> str:
+    """Převede řádek na ASCII a escapuje jej pro PDF řetězec."""
+    ascii_line = unicodedata.normalize("NFKD", line).encode("ascii", "ignore").decode("ascii")
+    return ascii_line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, text: str, lines_per_page: int = 50) -> None:
+    """
+    Zapíše jednoduché textové PDF bez externích závislostí.
+
+    Standardní font Helvetica nepokrývá českou diakritiku, proto se text
+    v PDF ukládá bez diakritiky. Pro měření extrakce to nevadí.
+
+    Args:
+        path: Cesta k výslednému PDF
+        text: Text dokumentu
+        lines_per_page: Počet řádků na stránku
+    """
+    lines: List[str] = []
+    for block in text.split("\n"):
+        lines.extend(textwrap.wrap(block, 90) or [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for page_lines in pages:
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in page_lines) + " ET"
+        content = stream.encode("ascii")
+        page_id = 4 + len(objects) - 3
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(output)
+
+def generate_corpus(output_dir: str, count: int, seed: int = 42, size: int = 1,
+                    formats: tuple = ("docx", "pdf", "json")) -> Dict[str, int]:
+    """
+    Vygeneruje korpus nabídek.
+
+    Args:
+        output_dir: Výstupní adresář (vzniknou podadresáře docx, pdf a json)
+        count: Počet nabídek v každém formátu
+        seed: Seed generátoru
+        size: Násobek délky textu
+        formats: Formáty, které se mají vygenerovat
+
+    Returns:
+        Dict[str, int]: Počet vytvořených souborů podle formátu
+    """
+    rng = random.Random(seed)
+    created = {fmt: 0 for fmt in formats}
+    for fmt in formats:
+        os.makedirs(os.path.join(output_dir, fmt), exist_ok=True)
+
+    if "docx" in formats:
+        from app.utils.docx_generator import create_proposal_document
+
+    for i in range(count):
+        data = make_proposal(i, rng, size)
+        name = f"nabidka_{i:05d}"
+        if "json" in formats:
+            with open(os.path.join(output_dir, "json", f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            created["json"] += 1
+        if "pdf" in formats:
+            write_pdf(os.path.join(output_dir, "pdf", f"{name}.pdf"), proposal_text(data))
+            created["pdf"] += 1
+        if "docx" in formats:
+            create_proposal_document(data, output_path=os.path.join(output_dir, "docx", f"{name}.docx"))
+            created["docx"] += 1
+
+    return created
+
+def main():
+    """
+    Hlavní funkce generátoru.
+    """
+    parser = argparse.ArgumentParser(description="Generátor syntetického korpusu nabídek")
+    parser.add_argument("--count", "-n", type=int, default=50, help="Počet nabídek v každém formátu")
+    parser.add_argument("--output", "-o", default="benchmarks/corpus", help="Výstupní adresář")
+    parser.add_argument("--seed", type=int, default=42, help="Seed generátoru")
+    parser.add_argument("--size", type=int, default=1, help="Násobek délky textu nabídky")
+    parser.add_argument("--formats", default="docx,pdf,json", help="Formáty oddělené čárkou")
+    args = parser.parse_args()
+
+    formats = tuple(fmt.strip() for fmt in args.formats.split(",") if fmt.strip())
+    created = generate_corpus(args.output, args.count, args.seed, args.size, formats)
+    print(f"Korpus vygenerován do {args.output}: " + ", ".join(f"{n} {fmt}" for fmt, n in created.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
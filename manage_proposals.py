@@ -10,7 +10,7 @@ from pathlib import Path
 # Přidání kořenového adresáře do cesty pro import
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from app.utils.import_proposals import import_proposals
+from app.utils.import_proposals import import_proposals, DEFAULT_BATCH_SIZE
 from app.utils.vector_store import delete_all_vectors, similarity_search, get_embeddings
 from app.config import get_config
 
@@ -23,7 +23,12 @@ def import_cmd(args):
     Args:
         args: Argumenty příkazové řádky
     """
-    import_proposals(args.directory, args.namespace)
+    import_proposals(
+        args.directory,
+        args.namespace,
+        resume=args.resume,
+        batch_size=args.batch_size
+    )
 
 def delete_cmd(args):
     """
@@ -88,6 +93,8 @@ def main():
     import_parser = subparsers.add_parser("import", help="Import nabídek do vektorové databáze")
     import_parser.add_argument("directory", help="Cesta k adresáři s nabídkami")
     import_parser.add_argument("--namespace", help="Namespace pro vektorovou databázi", default=None)
+    import_parser.add_argument("--resume", action="store_true", help="Navázat na přerušený import od poslední uložené dávky")
+    import_parser.add_argument("--batch-size", help="Počet chunků v jedné dávce", type=int, default=DEFAULT_BATCH_SIZE)
     
     # Příkaz pro smazání všech vektorů
     delete_parser = subparsers.add_parser("delete", help="Smazání všech vektorů z vektorové databáze")